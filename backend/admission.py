@@ -0,0 +1,196 @@
+"""
+Admission control for the LLM-bound endpoints.
+
+Every request reserves tokens (one per LLM call it will make: tasks the cache
+or templates answer are free, and invalid input is rejected before any
+charge) from two buckets:
+
+- a per-user bucket (ADMISSION_USER_PER_MINUTE, burst ADMISSION_USER_BURST).
+  A user over their share is turned away at once and does not queue.
+  A rate of 0 switches a bucket off.
+- the global bucket, sized to the Groq quota (GROQ_REQUESTS_PER_MINUTE,
+  burst ADMISSION_BURST). Requests that find it empty wait in FIFO order
+  for their slot, but at most ADMISSION_MAX_QUEUE of them, and only if the
+  slot is within ADMISSION_MAX_WAIT_SECONDS. Anything else gets an
+  immediate 429 with Retry-After.
+
+The buckets reserve slots in time (GCRA). A request knows on arrival exactly
+when it will run, so it is either admitted with a bounded wait or rejected
+straight away. It is never accepted and then left to time out. Batch jobs
+and the cache warmer draw from the same global bucket through wait(), as do
+the interactive planner's retries, so all Groq traffic in the worker shares
+one quota. A batch is charged to its
+caller's bucket up front (admit_batch) and is only started if its last LLM
+call fits within ADMISSION_BATCH_MAX_WAIT_SECONDS. Limits apply per worker
+process; divide them by the number of gunicorn workers.
+"""
+import asyncio
+import math
+import os
+import threading
+import time
+from typing import Dict
+
+from fastapi import HTTPException
+
+from backend.metrics import ADMISSION_QUEUE_DEPTH, ADMISSION_WAIT_SECONDS, ADMISSION_REJECTIONS
+
+GLOBAL_PER_MINUTE = float(os.getenv("GROQ_REQUESTS_PER_MINUTE", "30"))
+GLOBAL_BURST = float(os.getenv("ADMISSION_BURST", "6"))
+USER_PER_MINUTE = float(os.getenv("ADMISSION_USER_PER_MINUTE", "10"))
+USER_BURST = float(os.getenv("ADMISSION_USER_BURST", "6"))
+MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "50"))
+MAX_WAIT_SECONDS = float(os.getenv("ADMISSION_MAX_WAIT_SECONDS", "10"))
+BATCH_MAX_WAIT_SECONDS = float(os.getenv("ADMISSION_BATCH_MAX_WAIT_SECONDS", "300"))
+# Idle per-user buckets are dropped once there are this many
+MAX_TRACKED_USERS = 10000
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(f"Rejected ({reason}), retry after {retry_after:.1f}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def too_many_requests(error: AdmissionRejected) -> HTTPException:
+    return HTTPException(
+        status_code=429,
+        detail="Too many requests right now. Please try again shortly.",
+        headers={"Retry-After": str(math.ceil(error.retry_after))}
+    )
+
+
+class TokenBucket:
+    """`per_minute` tokens refill continuously, up to `burst` saved; slots are reserved in time"""
+
+    def __init__(self, per_minute: float, burst: float):
+        self.interval = 60.0 / per_minute if per_minute > 0 else 0.0
+        self.burst = burst
+        # Time at which the bucket is full again (theoretical arrival time)
+        self._tat = 0.0
+        self.lock = threading.Lock()
+
+    def delay(self, cost: float, now: float) -> float:
+        """Seconds until `cost` tokens are available; caller holds `lock`"""
+        if not self.interval:
+            return 0.0
+        return max(0.0, max(self._tat, now) + (cost - self.burst) * self.interval - now)
+
+    def span(self, cost: float) -> float:
+        """Seconds `cost` tokens take to come through, starting from a full bucket"""
+        return max(0.0, (cost - self.burst) * self.interval)
+
+    def take(self, cost: float, now: float):
+        """Reserve `cost` tokens (possibly in the future); caller holds `lock`"""
+        self._tat = max(self._tat, now) + cost * self.interval
+
+    def idle(self, now: float) -> bool:
+        return self._tat <= now
+
+    # For PlanGenerator(rate_limiter=...): blocks the calling (worker) thread
+    def wait(self, cost: float = 1, max_wait: float = None) -> bool:
+        """Take `cost` tokens, sleeping until they are due; False (nothing taken) if that is over `max_wait`"""
+        with self.lock:
+            now = time.monotonic()
+            delay = self.delay(cost, now)
+            if max_wait is not None and delay > max_wait:
+                return False
+            self.take(cost, now)
+        if delay > 0:
+            time.sleep(delay)
+        return True
+
+    def backoff(self, seconds: float):
+        """Upstream said slow down: nobody gets a token for `seconds`"""
+        with self.lock:
+            floor = time.monotonic() + seconds + (self.burst - 1) * self.interval
+            self._tat = max(self._tat, floor)
+
+
+class AdmissionController:
+    def __init__(self, per_minute: float = GLOBAL_PER_MINUTE, burst: float = GLOBAL_BURST,
+                 user_per_minute: float = USER_PER_MINUTE, user_burst: float = USER_BURST,
+                 max_queue: int = MAX_QUEUE, max_wait: float = MAX_WAIT_SECONDS):
+        self.bucket = TokenBucket(per_minute, burst)
+        self.user_per_minute = user_per_minute
+        self.user_burst = user_burst
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.waiting = 0
+        ADMISSION_QUEUE_DEPTH.set(0)
+        self._users: Dict[str, TokenBucket] = {}
+
+    def _user_bucket(self, user: str, now: float) -> TokenBucket:
+        bucket = self._users.get(user)
+        if bucket is None:
+            if len(self._users) >= MAX_TRACKED_USERS:
+                self._users = {u: b for u, b in self._users.items() if not b.idle(now)}
+            bucket = self._users[user] = TokenBucket(self.user_per_minute, self.user_burst)
+        return bucket
+
+    def _reject(self, reason: str, retry_after: float):
+        ADMISSION_REJECTIONS.inc(reason=reason)
+        raise AdmissionRejected(reason, max(retry_after, 1.0))
+
+    async def admit(self, user: str, cost: float = 1, max_wait: float = None):
+        """
+        Wait for this request's slot, or raise AdmissionRejected straight away.
+        `max_wait` can only tighten the controller's limit (e.g. a request deadline).
+        """
+        limit = self.max_wait if max_wait is None else min(self.max_wait, max_wait)
+        with self.bucket.lock:
+            now = time.monotonic()
+            user_bucket = self._user_bucket(user, now)
+            user_delay = user_bucket.delay(cost, now)
+            if user_delay > 0:
+                self._reject("user_quota", user_delay)
+            delay = self.bucket.delay(cost, now)
+            if delay > 0 and self.waiting >= self.max_queue:
+                self._reject("queue_full", delay)
+            if delay > limit:
+                self._reject("max_wait", delay)
+            user_bucket.take(cost, now)
+            self.bucket.take(cost, now)
+            if delay > 0:
+                self.waiting += 1
+                ADMISSION_QUEUE_DEPTH.set(self.waiting)
+
+        ADMISSION_WAIT_SECONDS.observe(delay)
+        if delay > 0:
+            try:
+                await asyncio.sleep(delay)
+            finally:
+                with self.bucket.lock:
+                    self.waiting -= 1
+                    ADMISSION_QUEUE_DEPTH.set(self.waiting)
+
+    async def admit_http(self, user: str, cost: float = 1, max_wait: float = None):
+        """admit() for endpoints: rejections become 429 with Retry-After"""
+        try:
+            await self.admit(user, cost, max_wait)
+        except AdmissionRejected as e:
+            raise too_many_requests(e)
+
+    def admit_batch(self, user: str, cost: float, max_wait: float = BATCH_MAX_WAIT_SECONDS) -> float:
+        """
+        Charge a whole batch to `user`'s bucket, or raise AdmissionRejected.
+        The batch's LLM calls still take their global tokens one by one through
+        wait(); it is only admitted if the last of them is due within `max_wait`
+        seconds for both the user's share and the global quota. Returns that wait.
+        ValueError if the batch would not fit even with both buckets full.
+        """
+        with self.bucket.lock:
+            now = time.monotonic()
+            user_bucket = self._user_bucket(user, now)
+            if max(self.bucket.span(cost), user_bucket.span(cost)) > max_wait:
+                raise ValueError(f"Batch needs {cost:g} LLM calls, more than fit in {max_wait:g}s")
+            if user_bucket.delay(1, now) > 0:
+                self._reject("user_quota", user_bucket.delay(1, now))
+            if self.bucket.delay(1, now) > 0 and self.waiting >= self.max_queue:
+                self._reject("queue_full", self.bucket.delay(1, now))
+            delay = max(user_bucket.delay(cost, now), self.bucket.delay(cost, now))
+            if delay > max_wait:
+                self._reject("max_wait", delay - max_wait)
+            user_bucket.take(cost, now)
+        return delay
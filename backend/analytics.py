@@ -1,80 +1,72 @@
-import json
-import os
-import pandas as pd
-from datetime import datetime
-from backend.history import HISTORY_FILE
+import numpy as np
+from backend.columnar import ENERGY_LEVELS
+from backend.history import TaskHistory
 
-class SmartAnalytics:
-    def __init__(self):
-        self.history_file = HISTORY_FILE
+PERIODS = ("Morning", "Afternoon", "Evening", "Night")
+# Hour of day -> index into PERIODS (Morning 5-12, Afternoon 12-17, Evening 17-22)
+PERIOD_OF_HOUR = np.array([3] * 5 + [0] * 7 + [1] * 5 + [2] * 5 + [3] * 2)
+# Rows per pass over the memory-mapped columns; bounds the temporary arrays
+CHUNK_ROWS = 1 << 20
 
-    def _load_data(self):
-        if not os.path.exists(self.history_file):
-            return []
-        try:
-            with open(self.history_file, "r") as f:
-                return json.load(f)
-        except:
-            return []
+class SmartAnalytics:
+    def __init__(self, history: TaskHistory = None):
+        # Reads the history's memory-mapped columns, never the JSON entries
+        self.history = history or TaskHistory()
+        self._cached_version = None
+        self._cached_insights = None
 
     def get_insights(self):
-        data = self._load_data()
-        if not data:
+        columns = self.history.columns.read()
+        version = self.history.columns.version
+        if version == self._cached_version:
+            return self._cached_insights
+
+        self._cached_insights = self._compute_insights(columns)
+        self._cached_version = version
+        return self._cached_insights
+
+    def _compute_insights(self, columns):
+        total = len(columns["id"])
+        if not total:
             return {"message": "Not enough data yet."}
 
-        # Convert to DataFrame
-        df = pd.DataFrame(data)
-        
-        # Ensure timestamp is datetime
-        df['timestamp'] = pd.to_datetime(df['timestamp'])
-        
+        sessions_by_hour = np.zeros(24, dtype=np.int64)
+        sessions_by_energy = np.zeros(len(ENERGY_LEVELS), dtype=np.int64)
+        completed_by_energy = np.zeros(len(ENERGY_LEVELS), dtype=np.int64)
+        for start in range(0, total, CHUNK_ROWS):
+            hours = columns["hour"][start:start + CHUNK_ROWS]
+            energy = columns["energy"][start:start + CHUNK_ROWS]
+            completed = columns["completed"][start:start + CHUNK_ROWS]
+            sessions_by_hour += np.bincount(hours, minlength=24)
+            sessions_by_energy += np.bincount(energy, minlength=len(ENERGY_LEVELS))
+            completed_by_energy += np.bincount(energy[completed], minlength=len(ENERGY_LEVELS))
+
         # 1. Best Time of Day
-        # Extract hour
-        df['hour'] = df['timestamp'].dt.hour
-        
-        def get_time_of_day(hour):
-            if 5 <= hour < 12: return 'Morning'
-            elif 12 <= hour < 17: return 'Afternoon'
-            elif 17 <= hour < 22: return 'Evening'
-            else: return 'Night'
-            
-        df['period'] = df['hour'].apply(get_time_of_day)
-        
-        # Count tasks per period
-        period_counts = df['period'].value_counts()
-        if not period_counts.empty:
-            best_period = period_counts.idxmax()
-            best_period_count = period_counts.max()
-        else:
-            best_period = "Unknown"
-            best_period_count = 0
+        period_counts = np.bincount(PERIOD_OF_HOUR, weights=sessions_by_hour, minlength=len(PERIODS))
+        best_period = PERIODS[int(period_counts.argmax())]
+        best_period_count = int(period_counts.max())
 
-        # 2. Success by Energy Level (Completion Rate)
-        # Note: We track 'completed' boolean in history
-        if 'completed' in df.columns and 'energy_level' in df.columns:
-            energy_success = df.groupby('energy_level')['completed'].mean()
-            # Find energy level with highest completion rate
-            if not energy_success.empty:
-                best_energy = energy_success.idxmax()
-                best_energy_rate = energy_success.max() * 100
-            else:
-                best_energy = "Unknown"
-                best_energy_rate = 0
+        # 2. Success by Energy Level (Completion Rate), known levels only
+        known = slice(0, ENERGY_LEVELS.index("other"))
+        logged = sessions_by_energy[known]
+        if logged.any():
+            rates = np.where(logged > 0, completed_by_energy[known] / np.maximum(logged, 1), -1.0)
+            best_energy = ENERGY_LEVELS[int(rates.argmax())]
+            best_energy_rate = float(rates.max()) * 100
         else:
             best_energy = "Unknown"
             best_energy_rate = 0
 
         # 3. Generate Insight Text
         insights = []
-        
-        if best_period != "Unknown":
-            insights.append(f"🧠 You are most active in the **{best_period}** ({best_period_count} sessions).")
-            
+
+        insights.append(f"🧠 You are most active in the **{best_period}** ({best_period_count} sessions).")
+
         if best_energy != "Unknown" and best_energy_rate > 0:
             insights.append(f"⚡ You have a {best_energy_rate:.0f}% success rate when your energy is **{best_energy}**.")
-            
-        if len(df) > 5:
-             insights.append(f"📊 You've logged {len(df)} total sessions. Consistent tracking builds data accuracy!")
+
+        if total > 5:
+             insights.append(f"📊 You've logged {total} total sessions. Consistent tracking builds data accuracy!")
         else:
              insights.append("💡 Keep logging tasks to unlock deeper insights.")
 
@@ -82,5 +74,5 @@ class SmartAnalytics:
             "insights": insights,
             "best_period": best_period,
             "best_energy": best_energy,
-            "total_sessions": len(df)
+            "total_sessions": total
         }
@@ -1,39 +1,87 @@
+import json
 import os
+import time
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException, Body
-from fastapi.staticfiles import StaticFiles
+from fastapi import FastAPI, HTTPException, Body, Depends, Query, Request, WebSocket
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
+from typing import Optional
+from datetime import date, timedelta
 from groq import Groq
 
 # Relative imports assuming running as a module or with PYTHONPATH setup correctly, 
 # but for simplicity in this setup we'll assume running from root or backend dir
 # and we might need to adjust path.
 # However, standard practice: running `uvicorn backend.app:app --reload` from root.
-from backend.input_validator import is_valid_input
-from backend.output_validator import is_valid_output
-from backend.task_utils import split_tasks, prioritize_tasks
-from backend.rag_patterns import get_task_pattern
-from backend.scheduler import EnergyScheduler
-from backend.gamification import GamificationSystem
+from backend import auth
+from backend.scheduler import EnergyScheduler, DEFAULT_SLOT_CAPACITY
+from backend.energy_profile import EnergyProfiles, DEFAULT_USER
+from backend.gamification import GamificationSystem, MAX_XP_PER_EVENT
+from backend.leaderboard import Leaderboard, METRICS as LEADERBOARD_METRICS, MAX_LIMIT as LEADERBOARD_MAX_LIMIT
 from backend.history import TaskHistory
+from backend.partitions import HistoryPartitions, UserPartition
 from backend.empathy import EmpathyEngine
-from backend.analytics import SmartAnalytics
+from backend.rollups import BUCKETS, MAX_POINTS as TIMESERIES_MAX_POINTS, bucket_count
+from backend import metrics, profiling
+from backend.metrics import PLAN_STAGE_SECONDS, HTTP_REQUEST_SECONDS
+from backend.planner import PlanGenerator, InvalidInputError
+from backend.plan_cache import PlanCache
+from backend.step_templates import StepTemplates
+from backend.cache_warmer import CacheWarmer
+from backend.sessions import PlanSessionStore, COMPLETION_MESSAGE
+from backend.realtime import RealtimeHub
+from backend.static_assets import PrecompressedStaticFiles, accepts_encoding
+from backend import export
+from backend.batch import (
+    generate_plans_batch, MAX_BATCH_ITEMS, MAX_CONCURRENCY, DEFAULT_CONCURRENCY,
+)
+from backend.admission import AdmissionController, AdmissionRejected, BATCH_MAX_WAIT_SECONDS, too_many_requests
+from backend.deadline import Deadline, DEFAULT_TIMEOUT, TIMEOUT_HEADER, cancel_on_disconnect
+from starlette.concurrency import run_in_threadpool
 
 # -------------------- SETUP --------------------
 load_dotenv()
 
-# Graceful degradation if no API Key (for testing UI)
+# Without an API key plans come from the offline templates (or the generic fallback)
 api_key = os.getenv("GROQ_API_KEY")
 client = Groq(api_key=api_key) if api_key else None
 
 app = FastAPI(title="PS-1 Smart Companion")
 
 # Initialize Systems
-scheduler = EnergyScheduler()
-gamification = GamificationSystem()
+# XP / streak ranks across logged-in users, updated on every XP change
+leaderboard = Leaderboard()
+gamification = GamificationSystem(leaderboard=leaderboard)
+leaderboard.backfill(gamification.user_totals())
+# Plans from anonymous requests; logged-in users get their own partition below
 history = TaskHistory()
+# One history per authenticated user, with its own daily / weekly rollups and analytics
+partitions = HistoryPartitions()
+# Energy profiles learn from every new / completed history entry; a user's
+# profile is backfilled from their partition the first time it is opened
+energy_profiles = EnergyProfiles()
+energy_profiles.backfill(history.history)
+history.add_listener(energy_profiles)
+partitions.add_listener(energy_profiles)
+partitions.add_backfill(energy_profiles.backfill)
+scheduler = EnergyScheduler(energy_profiles)
 empathy = EmpathyEngine()
-analytics = SmartAnalytics()
+plan_cache = PlanCache()
+# Offline steps for common task types; PLAN_TIERS decides when they beat the cache / LLM
+step_templates = StepTemplates()
+# One Groq quota for everything: interactive requests queue for it in admission,
+# batch jobs, cache warming and interactive retries draw from the same bucket per LLM call
+admission = AdmissionController()
+# Admission pays for each task's first call up front; retries wait on the bucket
+planner = PlanGenerator(client, empathy, rate_limiter=admission.bucket, cache=plan_cache,
+                        templates=step_templates, prepaid_first_call=True)
+batch_planner = PlanGenerator(client, empathy, rate_limiter=admission.bucket, cache=plan_cache,
+                              templates=step_templates)
+cache_warmer = CacheWarmer(history, batch_planner, plan_cache, partitions=partitions)
+cache_warmer.start()
+# Finishing every task of a plan marks its history entry done
+plan_sessions = PlanSessionStore(on_plan_complete=history.mark_completed)
+realtime = RealtimeHub(plan_sessions, gamification, identify=lambda token: auth.email_for_token(token) or DEFAULT_USER)
 
 # -------------------- MODELS --------------------
 class TaskRequest(BaseModel):
@@ -46,132 +94,181 @@ class StartResponse(BaseModel):
     next_step_index: int
     total_steps: int
     all_steps: list[str]
+    session_id: Optional[str] = None
 
 class PlanResponse(BaseModel):
     plan: list[StartResponse]
     mood: str
+    # True when the time budget ran out and some tasks got fallback steps
+    partial: bool = False
+
+class BatchPlanRequest(BaseModel):
+    items: list[TaskRequest]
+    concurrency: int = DEFAULT_CONCURRENCY
 
 class ContinueRequest(BaseModel):
-    task: str
-    steps: list[str]
+    # Either a session id from /generate-plan, or the legacy task + steps
+    session_id: Optional[str] = None
+    task: Optional[str] = None
+    steps: Optional[list[str]] = None
     step_index: int
 
 class StepResponse(BaseModel):
-    task: str
+    task: Optional[str] = None
     current_step: str
     next_step_index: int
     total_steps: int
 
+class ScheduleTask(BaseModel):
+    task: str
+    difficulty: str = "medium"
+
+class ScheduleRequest(BaseModel):
+    tasks: list[ScheduleTask]
+    capacity: int = DEFAULT_SLOT_CAPACITY
+
+# -------------------- AUTH --------------------
+app.include_router(auth.router)
+
+def user_partition(current_user: auth.User = Depends(auth.get_current_user)) -> UserPartition:
+    """The caller's own history partition; 401 without a valid token"""
+    return partitions.get(current_user.email)
+
+def history_for(current_user: Optional[auth.User]) -> TaskHistory:
+    """Where a plan is saved: the user's partition, or the shared anonymous history"""
+    return partitions.get(current_user.email).history if current_user else history
+
+def current_user_id(current_user: Optional[auth.User] = Depends(auth.get_optional_user)) -> str:
+    """Key for per-user state (stats, energy profile); DEFAULT_USER when anonymous"""
+    return current_user.email if current_user else DEFAULT_USER
+
+def energy_user_id(user_id: str = Depends(current_user_id)) -> str:
+    """current_user_id, with the user's partition open so their energy profile is backfilled"""
+    if user_id != DEFAULT_USER:
+        partitions.get(user_id)
+    return user_id
+
+# -------------------- METRICS --------------------
+
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Label by route template (/api/history/{entry_id}), not the raw URL
+        route = request.scope.get("route")
+        path = getattr(route, "path", None) or ("/" if route else "unmatched")
+        HTTP_REQUEST_SECONDS.observe(
+            time.perf_counter() - start,
+            method=request.method, path=path, status=status
+        )
+
+# Zero-cost unless PROFILE_ADMIN_TOKEN is set
+profiling.install_profiling(app)
+app.include_router(profiling.router)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Prometheus scrape endpoint"""
+    return PlainTextResponse(
+        metrics.registry.render(),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
 # -------------------- API ENDPOINTS --------------------
 
 @app.get("/api/gamification/stats")
-def get_stats():
-    return gamification.get_stats()
+def get_stats(user_id: str = Depends(current_user_id)):
+    return gamification.get_stats(user_id)
 
 @app.post("/api/gamification/xp")
-def add_xp(amount: int = Body(..., embed=True)):
-    return gamification.add_xp(amount)
+def add_xp(amount: int = Body(..., embed=True, ge=1, le=MAX_XP_PER_EVENT),
+           user_id: str = Depends(current_user_id)):
+    """XP the client reports for a finished task; at most one task's worth per call"""
+    return gamification.add_xp(amount, user_id)
+
+def _leaderboard_metric(metric: str) -> str:
+    if metric not in LEADERBOARD_METRICS:
+        raise HTTPException(status_code=400, detail=f"metric must be one of: {', '.join(LEADERBOARD_METRICS)}")
+    return metric
+
+@app.get("/api/leaderboard")
+def get_leaderboard(metric: str = "xp", limit: int = 10):
+    """Top users by XP or streak"""
+    _leaderboard_metric(metric)
+    if not 1 <= limit <= LEADERBOARD_MAX_LIMIT:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {LEADERBOARD_MAX_LIMIT}.")
+    top = leaderboard.top(metric, limit)
+    return {"metric": metric, "total": len(leaderboard), "top": top}
+
+@app.get("/api/leaderboard/me")
+def get_my_rank(metric: str = "xp", radius: int = 5,
+                current_user: auth.User = Depends(auth.get_current_user)):
+    """The caller's rank and the users just above and below them"""
+    _leaderboard_metric(metric)
+    if not 0 <= radius <= LEADERBOARD_MAX_LIMIT // 2:
+        raise HTTPException(status_code=400, detail=f"radius must be between 0 and {LEADERBOARD_MAX_LIMIT // 2}.")
+    around = leaderboard.around(current_user.email, metric, radius)
+    return {
+        "metric": metric,
+        "rank": leaderboard.rank(current_user.email, metric),
+        "total": len(leaderboard),
+        "around": around
+    }
 
 @app.post("/generate-plan", response_model=PlanResponse)
-def generate_plan(request: TaskRequest):
+async def generate_plan(request: TaskRequest, http_request: Request,
+                        current_user: Optional[auth.User] = Depends(auth.get_optional_user)):
+    # Overall budget for this request (X-Request-Timeout: seconds), shared by every stage
+    deadline = Deadline.from_header(http_request.headers.get(TIMEOUT_HEADER))
+    # One token per LLM call the plan will make; waits here (not on a worker thread) or gets a 429
+    try:
+        cost = await run_in_threadpool(planner.llm_calls, request.tasks)
+    except InvalidInputError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if cost:
+        if current_user:
+            user_key = current_user.email
+        else:
+            user_key = http_request.client.host if http_request.client else "unknown"
+        await admission.admit_http(user_key, cost, max_wait=deadline.remaining())
+    return await cancel_on_disconnect(
+        http_request, deadline, run_in_threadpool(_generate_plan, request, deadline, current_user)
+    )
+
+def _generate_plan(request: TaskRequest, deadline: Deadline, current_user: Optional[auth.User] = None):
     try:
-        if not client:
-             # Mock response for testing without API key
-             return {
-                 "plan": [{
-                     "task": "Mock Task (No API Key)",
-                     "current_step": "Check .env file",
-                     "next_step_index": 1,
-                     "total_steps": 3,
-                     "all_steps": ["Check .env file", "Add GROQ_API_KEY", "Restart Server"]
-                 }],
-                 "mood": "neutral"
-             }
-
         user_input = request.tasks.strip()
 
-        if not is_valid_input(user_input):
-            raise HTTPException(
-                status_code=400,
-                detail="Invalid input. Please provide simple actionable tasks."
-            )
-
-        # Logic
-        tasks = split_tasks(user_input)
-        tasks = tasks[:3]  # anti-overwhelm
-
-        # Empathy Check
-        sentiment = empathy.analyze_sentiment(user_input)
-        
-        # Process tasks
-        prioritized_tasks = prioritize_tasks(tasks)
-        
-        results = []
-        
-        for task in prioritized_tasks:
-            pattern = get_task_pattern(task)
-            
-            # Inject Mood Instruction
-            system_prompt = (
-                "You are an executive-function assistant for neurodivergent users.\n\n"
-                f"User Mood Context: {sentiment['instruction']}\n\n"
-                f"{pattern}\n\n"
-                "Rules:\n"
-                "- Output ONLY a numbered list\n"
-                "- Maximum 6 steps\n" 
-                "- One action per line\n"
-                "- Each sentence under 12 words\n"
-                "- No explanations\n"
-                "- No emojis\n"
-                "- No extra text"
-            )
+        try:
+            result = planner.plan(user_input, deadline)
+        except InvalidInputError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        results = result["plan"]
 
-            steps = None
-
-            for _ in range(3):
-                try:
-                    if not client:
-                        raise Exception("No API Key")
-
-                    response = client.chat.completions.create(
-                        model="llama-3.1-8b-instant",
-                        messages=[
-                            {"role": "system", "content": system_prompt},
-                            {"role": "user", "content": task},
-                        ],
-                        temperature=0.2,
-                        max_tokens=120
-                    )
-                    output = response.choices[0].message.content
-                    if is_valid_output(output):
-                        steps = [line.split(". ", 1)[1] for line in output.split("\n") if ". " in line]
-                        if steps: break
-                except Exception as e:
-                    print(f"LLM Error: {e}")
-                    break
-
-            if not steps:
-                steps = ["Break task into smaller parts.", "Start with the first part."]
-
-            results.append({
-                "task": task,
-                "current_step": steps[0],
-                "next_step_index": 1,
-                "total_steps": len(steps),
-                "all_steps": steps
-            })
+        if deadline.cancelled:
+            # Client went away: nobody will read this plan, so don't store it
+            return result
 
         # Save to history
-        history.add_entry(
-            user_query=user_input,
-            generated_plan=results,
-            energy_level=request.energy_level
-        )
+        with PLAN_STAGE_SECONDS.time(stage="history_add"):
+            target = history_for(current_user)
+            entry = target.add_entry(
+                user_query=user_input,
+                generated_plan=results,
+                energy_level=request.energy_level,
+                mood=result["mood"]
+            )
 
-        return {
-            "plan": results,
-            "mood": sentiment['mood']
-        }
+        # Copies, so session ids don't leak into the stored history entry
+        result["plan"] = [dict(item) for item in results]
+        plan_sessions.create_plan(result["plan"], entry_id=entry["id"], on_complete=target.mark_completed)
+
+        return result
     except HTTPException:
         # Re-raise HTTP exceptions as-is
         raise
@@ -186,12 +283,71 @@ def generate_plan(request: TaskRequest):
         )
 
 
-@app.post("/next-step", response_model=StepResponse)
+def _llm_calls_or_zero(tasks: str) -> int:
+    # Invalid items come back as per-item errors and never reach Groq
+    try:
+        return batch_planner.llm_calls(tasks)
+    except InvalidInputError:
+        return 0
+
+
+@app.post("/generate-plan/batch")
+def generate_plan_batch(request: BatchPlanRequest,
+                        current_user: auth.User = Depends(auth.get_current_user)):
+    """Plan many inputs at once; streams one NDJSON line per finished plan"""
+    if len(request.items) > MAX_BATCH_ITEMS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many items. Maximum is {MAX_BATCH_ITEMS} per batch."
+        )
+    if not 1 <= request.concurrency <= MAX_CONCURRENCY:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Concurrency must be between 1 and {MAX_CONCURRENCY}."
+        )
+    # The whole batch comes out of the caller's share, and its last LLM call
+    # must be due within BATCH_MAX_WAIT_SECONDS; anything after that falls back
+    cost = sum(_llm_calls_or_zero(item.tasks) for item in request.items)
+    if cost:
+        try:
+            admission.admit_batch(current_user.email, cost)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"{e}. Split the batch.")
+        except AdmissionRejected as e:
+            raise too_many_requests(e)
+
+    results = generate_plans_batch(
+        batch_planner,
+        history_for(current_user),
+        [item.model_dump() for item in request.items],
+        concurrency=request.concurrency,
+        deadline=Deadline(BATCH_MAX_WAIT_SECONDS + DEFAULT_TIMEOUT),
+    )
+    return StreamingResponse(
+        (json.dumps(result, ensure_ascii=False) + "\n" for result in results),
+        media_type="application/x-ndjson"
+    )
+
+
+@app.post("/next-step", response_model=StepResponse, response_model_exclude_none=True)
 def next_step(request: ContinueRequest):
+    if request.session_id:
+        # O(1) server-side advance; the client already knows the task text
+        step = plan_sessions.advance(request.session_id, request.step_index)
+        if step is None:
+            raise HTTPException(
+                status_code=404,
+                detail="Plan session expired. Send task and steps instead."
+            )
+        return step
+
+    if request.task is None or request.steps is None:
+        raise HTTPException(status_code=400, detail="Provide session_id, or task and steps.")
+
     if request.step_index >= len(request.steps):
         return {
             "task": request.task,
-            "current_step": "🎉 Task completed. Take a short break.",
+            "current_step": COMPLETION_MESSAGE,
             "next_step_index": request.step_index,
             "total_steps": len(request.steps)
         }
@@ -203,50 +359,136 @@ def next_step(request: ContinueRequest):
         "total_steps": len(request.steps)
     }
 
+@app.websocket("/ws")
+async def realtime_channel(websocket: WebSocket):
+    """Step advances, XP and pushed stats over one connection (see backend/realtime.py)"""
+    await realtime.handle(websocket)
+
+# -------------------- SCHEDULER ENDPOINTS --------------------
+
+@app.get("/api/schedule/suggest")
+def suggest_time(difficulty: str = "medium", user_id: str = Depends(energy_user_id)):
+    """Next good slot for a single task"""
+    return scheduler.suggest_time_for_task(difficulty, user_id=user_id)
+
+@app.get("/api/schedule/profile")
+def get_energy_profile(user_id: str = Depends(energy_user_id)):
+    """Learned completion rate per hour, once there is enough history"""
+    return energy_profiles.summary(user_id)
+
+@app.post("/api/schedule")
+def schedule_tasks(request: ScheduleRequest, user_id: str = Depends(energy_user_id)):
+    """Place a whole day's tasks into energy-matched hourly slots"""
+    if request.capacity < 1:
+        raise HTTPException(status_code=400, detail="capacity must be at least 1.")
+    return scheduler.schedule_many(
+        [t.model_dump() for t in request.tasks], capacity=request.capacity, user_id=user_id
+    )
+
 # -------------------- HISTORY ENDPOINTS --------------------
+# All scoped to the caller's own partition (see backend/partitions.py)
 
 @app.get("/api/history")
-def get_history(limit: int = None):
+def get_history(limit: int = None, partition: UserPartition = Depends(user_partition)):
     """Get all task history"""
-    return history.get_all_history(limit=limit)
+    return partition.history.get_all_history(limit=limit)
+
+@app.get("/api/history/export")
+def export_history(
+    request: Request,
+    fmt: str = Query("ndjson", alias="format"),
+    from_: Optional[date] = Query(None, alias="from"),
+    to: Optional[date] = None,
+    partition: UserPartition = Depends(user_partition)
+):
+    """Stream all history (archive included) as NDJSON or CSV, gzipped when accepted"""
+    if fmt not in export.FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(export.FORMATS)}")
+    entries = partition.history.iter_entries(
+        start=from_.isoformat() if from_ else None,
+        end=(to + timedelta(days=1)).isoformat() if to else None
+    )
+    use_gzip = accepts_encoding(request.headers.get("accept-encoding", ""), "gzip")
+    headers = {"Content-Disposition": f'attachment; filename="task_history.{fmt}"'}
+    if use_gzip:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(
+        export.export_chunks(entries, fmt, gzip=use_gzip),
+        media_type=export.FORMATS[fmt],
+        headers=headers
+    )
+
+@app.get("/api/history/search")
+def search_history(q: str, partition: UserPartition = Depends(user_partition)):
+    """Search history by query text"""
+    return partition.history.search_history(q)
+
+@app.get("/api/history/recent/{days}")
+def get_recent_history(days: int = 7, partition: UserPartition = Depends(user_partition)):
+    """Get recent history from last N days"""
+    return partition.history.get_recent_queries(days)
 
 @app.get("/api/history/{entry_id}")
-def get_history_entry(entry_id: int):
+def get_history_entry(entry_id: int, partition: UserPartition = Depends(user_partition)):
     """Get a specific history entry"""
-    entry = history.get_entry_by_id(entry_id)
+    entry = partition.history.get_entry_by_id(entry_id)
     if not entry:
         raise HTTPException(status_code=404, detail="History entry not found")
     return entry
 
 @app.post("/api/history/{entry_id}/complete")
-def mark_history_complete(entry_id: int):
+def mark_history_complete(entry_id: int, partition: UserPartition = Depends(user_partition)):
     """Mark a history entry as completed"""
-    success = history.mark_completed(entry_id)
+    success = partition.history.mark_completed(entry_id)
     if not success:
         raise HTTPException(status_code=404, detail="History entry not found")
     return {"success": True, "message": "Entry marked as completed"}
 
-@app.get("/api/history/search")
-def search_history(q: str):
-    """Search history by query text"""
-    return history.search_history(q)
-
-@app.get("/api/history/recent/{days}")
-def get_recent_history(days: int = 7):
-    """Get recent history from last N days"""
-    return history.get_recent_queries(days)
-
 @app.delete("/api/history")
-def clear_history():
+def clear_history(partition: UserPartition = Depends(user_partition)):
     """Clear all history"""
-    history.clear_history()
+    partition.history.clear_history()
     return {"success": True, "message": "History cleared"}
 
+@app.get("/api/cache/stats")
+def get_cache_stats():
+    """Plan cache size, last warm-up report and coverage of recent requests"""
+    return cache_warmer.status()
+
 @app.get("/api/analytics/insights")
-def get_analytics():
+def get_analytics(partition: UserPartition = Depends(user_partition)):
     """Get smart time analytics"""
-    return analytics.get_insights()
+    return partition.analytics.get_insights()
+
+@app.get("/api/analytics/timeseries")
+def get_analytics_timeseries(
+    from_: Optional[date] = Query(None, alias="from"),
+    to: Optional[date] = None,
+    bucket: str = "day",
+    partition: UserPartition = Depends(user_partition)
+):
+    """Sessions, completions and mood mix per day or week, from the rollups"""
+    if bucket not in BUCKETS:
+        raise HTTPException(status_code=400, detail=f"bucket must be one of: {', '.join(BUCKETS)}")
+    to = to or date.today()
+    from_ = from_ or to - timedelta(days=29 if bucket == "day" else 7 * 11)
+    if from_ > to:
+        raise HTTPException(status_code=400, detail="'from' must not be after 'to'.")
+    if bucket_count(from_, to, bucket) > TIMESERIES_MAX_POINTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Range too long: at most {TIMESERIES_MAX_POINTS} {bucket}s per request."
+        )
+    return {
+        "bucket": bucket,
+        "from": from_.isoformat(),
+        "to": to.isoformat(),
+        "series": partition.rollups.timeseries(from_, to, bucket)
+    }
 
 # -------------------- STATIC FILES --------------------
 # Mount frontend
-app.mount("/", StaticFiles(directory="frontend", html=True), name="static")
+# Hashed + gzip/brotli variants built once; versioned URLs are cached for a year
+static_files = PrecompressedStaticFiles(directory="frontend", html=True)
+static_files.precompress()
+app.mount("/", static_files, name="static")
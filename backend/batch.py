@@ -0,0 +1,75 @@
+"""
+Batch plan generation for pre-generating recurring routines.
+
+LLM calls run on a bounded thread pool and take their tokens from the
+planner's rate limiter (the global admission bucket), which also backs off
+on Groq's Retry-After. An optional Deadline
+caps the whole batch: plans that would start their LLM call after it get the
+fallback steps. Results are yielded as soon as each plan finishes; the
+history write happens once, at the end.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Iterable, Iterator
+
+from backend.deadline import Deadline
+from backend.history import TaskHistory
+from backend.planner import PlanGenerator, InvalidInputError
+
+MAX_BATCH_ITEMS = 1000
+MAX_CONCURRENCY = 16
+DEFAULT_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+
+
+def generate_plans_batch(
+    planner: PlanGenerator,
+    history: TaskHistory,
+    items: Iterable[dict],
+    concurrency: int = DEFAULT_CONCURRENCY,
+    deadline: Deadline = None,
+) -> Iterator[dict]:
+    """
+    Plan many `{"tasks": ..., "energy_level": ...}` items concurrently.
+
+    Yields one result per item in completion order (`index` refers back to
+    the input), then a final summary once all plans are saved to history
+    in a single write.
+    """
+    items = list(items)
+    concurrency = max(1, min(concurrency, MAX_CONCURRENCY))
+    to_save = []
+
+    pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="batch-plan")
+    try:
+        futures = {
+            pool.submit(planner.plan, item["tasks"], deadline): index
+            for index, item in enumerate(items)
+        }
+        for future in as_completed(futures):
+            index = futures[future]
+            item = items[index]
+            try:
+                result = future.result()
+            except InvalidInputError as e:
+                yield {"index": index, "status": "error", "detail": str(e)}
+                continue
+            except Exception as e:
+                print(f"Batch item {index} failed: {e}")
+                yield {"index": index, "status": "error", "detail": f"Internal server error: {str(e)}"}
+                continue
+
+            to_save.append({
+                "user_query": item["tasks"].strip(),
+                "generated_plan": result["plan"],
+                "energy_level": item.get("energy_level", "medium"),
+                "mood": result["mood"],
+            })
+            yield {"index": index, "status": "ok", **result}
+    finally:
+        # Client went away: stop queued LLM calls but keep what finished
+        pool.shutdown(wait=False, cancel_futures=True)
+        if deadline is not None:
+            deadline.cancel()
+        saved = history.add_entries(to_save) if to_save else []
+
+    yield {"status": "done", "total": len(items), "saved": len(saved)}
@@ -0,0 +1,196 @@
+"""
+Off-peak plan cache warming.
+
+Mines task history (the anonymous history plus every user's partition) for
+the most frequent normalized tasks per
+(get_task_category, mood) and pre-generates their plans into the PlanCache
+during a quiet window, so the day's first users don't pay cold LLM latency.
+
+Enable the background job with CACHE_WARM_WINDOW="02:00-05:00", or run once:
+
+    python -m backend.cache_warmer
+"""
+import os
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional
+
+from backend.empathy import EmpathyEngine
+from backend.history import TaskHistory
+from backend.partitions import HistoryPartitions
+from backend.plan_cache import PlanCache, normalize_task
+from backend.planner import PlanGenerator
+from backend.rag_patterns import get_task_category
+from backend.shared_state import SharedJSONFile
+
+WARM_STATE_FILE = "plan_cache_warm.json"
+WARM_WINDOW = os.getenv("CACHE_WARM_WINDOW")  # e.g. "02:00-05:00"
+WARM_TOP_N = int(os.getenv("CACHE_WARM_TOP_N", "20"))
+COVERAGE_DAYS = 7
+
+
+def parse_window(window: str):
+    """'02:00-05:00' -> (time(2, 0), time(5, 0))"""
+    start, end = window.split("-")
+    return (datetime.strptime(start.strip(), "%H:%M").time(),
+            datetime.strptime(end.strip(), "%H:%M").time())
+
+
+def in_window(now: datetime, window) -> bool:
+    start, end = window
+    current = now.time()
+    if start <= end:
+        return start <= current < end
+    return current >= start or current < end  # wraps midnight
+
+
+class CacheWarmer:
+    def __init__(self, history: TaskHistory, planner: PlanGenerator, cache: PlanCache,
+                 top_n: int = WARM_TOP_N, window: Optional[str] = WARM_WINDOW,
+                 state_path: str = WARM_STATE_FILE, partitions: Optional[HistoryPartitions] = None):
+        self.history = history
+        self.partitions = partitions
+        self.planner = planner
+        self.cache = cache
+        self.top_n = top_n
+        self.window = parse_window(window) if window else None
+        self.state = SharedJSONFile(state_path, dict)
+        self._moods = {}
+
+    def _mood(self, entry: Dict) -> str:
+        # Entries written before moods were stored: derive it like generate_plan did
+        if entry.get("mood"):
+            return entry["mood"]
+        query = entry["user_query"]
+        if query not in self._moods:
+            self._moods[query] = self.planner.empathy.analyze_sentiment(query)["mood"]
+        return self._moods[query]
+
+    def _entries(self, since: datetime = None) -> Iterator[Dict]:
+        """Hot-window entries of the anonymous history and every user's partition"""
+        if since is None:
+            yield from self.history.history
+        else:
+            yield from self.history.iter_entries(start=since.isoformat())
+        if self.partitions is not None:
+            yield from self.partitions.iter_hot_entries(since.isoformat() if since else None)
+
+    def _entry_keys(self, entry: Dict) -> List[tuple]:
+        mood = self._mood(entry)
+        return [(normalize_task(item["task"]), mood) for item in entry.get("generated_plan", [])]
+
+    def top_tasks(self) -> List[Dict]:
+        """Top-N (task, mood) pairs per category, most frequent first"""
+        counts = Counter()
+        for entry in self._entries():
+            counts.update(self._entry_keys(entry))
+
+        per_group = {}
+        for (task, mood), count in counts.most_common():
+            group = (get_task_category(task), mood)
+            bucket = per_group.setdefault(group, [])
+            if len(bucket) < self.top_n:
+                bucket.append({"task": task, "mood": mood, "category": group[0], "count": count})
+        return [item for bucket in per_group.values() for item in bucket]
+
+    def coverage(self, days: int = COVERAGE_DAYS) -> Dict:
+        """Share of recent requests whose every task is already in the cache"""
+        requests = served = tasks = tasks_served = 0
+        for entry in self._entries(since=datetime.now() - timedelta(days=days)):
+            keys = self._entry_keys(entry)
+            if not keys:
+                continue
+            hits = sum(1 for task, mood in keys if PlanCache.key(task, mood) in self.cache)
+            requests += 1
+            served += hits == len(keys)
+            tasks += len(keys)
+            tasks_served += hits
+        return {
+            "days": days,
+            "requests": requests,
+            "request_coverage": round(served / requests, 3) if requests else 0.0,
+            "task_coverage": round(tasks_served / tasks, 3) if tasks else 0.0,
+        }
+
+    def warm(self) -> Dict:
+        """Generate plans for top tasks that aren't cached yet"""
+        started = time.perf_counter()
+        warmed = already_cached = templated = failed = 0
+        for item in self.top_tasks():
+            if PlanCache.key(item["task"], item["mood"]) in self.cache:
+                already_cached += 1
+                continue
+            if self.planner.routes_to_template(item["task"]):
+                # Answered offline before the cache is even needed
+                templated += 1
+                continue
+            # planner.rate_limiter paces these calls; generate_steps fills the cache
+            sentiment = self.planner.empathy.sentiment_for_mood(item["mood"])
+            self.planner.generate_steps(item["task"].capitalize(), sentiment)
+            if PlanCache.key(item["task"], item["mood"]) in self.cache:
+                warmed += 1
+            else:
+                failed += 1
+
+        return {
+            "warmed": warmed,
+            "already_cached": already_cached,
+            "templated": templated,
+            "failed": failed,
+            "seconds": round(time.perf_counter() - started, 2),
+            "coverage": self.coverage(),
+        }
+
+    def status(self) -> Dict:
+        """Cheap enough for every request: coverage is the one measured by the last warm-up"""
+        self.state.refresh()
+        report = self.state.data.get("last_report") or {}
+        return {
+            "entries": len(self.cache),
+            "last_warm": self.state.data.get("last_warm"),
+            "last_report": report or None,
+            "coverage": report.get("coverage"),
+        }
+
+    def _claim_today(self, now: datetime) -> bool:
+        """Only one worker warms per day"""
+        today = now.strftime("%Y-%m-%d")
+        with self.state.transaction() as state:
+            if state.get("last_warm") == today:
+                return False
+            state["last_warm"] = today
+        return True
+
+    def run_forever(self, poll_seconds: int = 60):
+        while True:
+            now = datetime.now()
+            if in_window(now, self.window) and self._claim_today(now):
+                try:
+                    report = self.warm()
+                    print(f"Plan cache warmed: {report}")
+                    with self.state.transaction() as state:
+                        state["last_report"] = report
+                except Exception as e:
+                    print(f"Cache warming failed: {e}")
+            time.sleep(poll_seconds)
+
+    def start(self):
+        """Start the off-peak background job if a window is configured"""
+        if not self.window:
+            return
+        threading.Thread(target=self.run_forever, name="cache-warmer", daemon=True).start()
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    from groq import Groq
+    from backend.admission import TokenBucket, GLOBAL_PER_MINUTE, GLOBAL_BURST
+
+    load_dotenv()
+    api_key = os.getenv("GROQ_API_KEY")
+    cache = PlanCache()
+    planner = PlanGenerator(Groq(api_key=api_key) if api_key else None, EmpathyEngine(),
+                            rate_limiter=TokenBucket(GLOBAL_PER_MINUTE, GLOBAL_BURST), cache=cache)
+    print(CacheWarmer(TaskHistory(), planner, cache, partitions=HistoryPartitions()).warm())
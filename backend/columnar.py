@@ -0,0 +1,240 @@
+"""
+Columnar, memory-mapped copy of the task history for analytics.
+
+TaskHistory appends every entry here as well as to its JSON file. The
+columns are plain .npy files in `<history>.columns/`, named
+`<column>.<capacity>.npy` and opened with mmap:
+
+    id         int64    entry id (ascending)
+    ts         float64  start time, epoch seconds
+    hour       int8     local hour of day, 0-23
+    energy     int8     index into ENERGY_LEVELS ("other" for anything else)
+    completed  bool
+    steps      int32    total steps across the plan's tasks
+
+Each file is preallocated and doubles in size when full, so appends are
+amortized O(1). Growing writes new files for the new capacity instead of
+replacing mapped ones (Windows refuses to replace or delete a mapped file);
+old sizes are removed once meta.bin points past them and nobody maps them.
+`meta.bin` (row count, capacity, write generation) is updated in place
+after the rows, so readers never see a half-appended row and a refresh
+costs one small read. Analytics work on slices of the
+mapped files in fixed-size chunks, so memory stays flat however long the
+history gets. For ad-hoc reports:
+
+    cols = history.columns.read()
+    np.bincount(cols["hour"], minlength=24)
+"""
+import glob
+import os
+import struct
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterable, List
+
+import numpy as np
+
+from backend.shared_state import file_lock
+
+COLUMNS = {
+    "id": np.int64,
+    "ts": np.float64,
+    "hour": np.int8,
+    "energy": np.int8,
+    "completed": np.bool_,
+    "steps": np.int32,
+}
+ENERGY_LEVELS = ("low", "medium", "high", "other")
+_ENERGY_CODES = {name: code for code, name in enumerate(ENERGY_LEVELS)}
+INITIAL_CAPACITY = 1024
+SYNC_BATCH = 10000
+_META = struct.Struct("<qqq")  # count, capacity, generation
+
+
+def entries_to_rows(entries: List[Dict]) -> Dict[str, np.ndarray]:
+    """Column arrays for a list of history entries"""
+    starts = [datetime.fromisoformat(e["timestamp"]) for e in entries]
+    return {
+        "id": np.array([e["id"] for e in entries], dtype=np.int64),
+        "ts": np.array([t.timestamp() for t in starts], dtype=np.float64),
+        "hour": np.array([t.hour for t in starts], dtype=np.int8),
+        "energy": np.array([_ENERGY_CODES.get(e.get("energy_level"), _ENERGY_CODES["other"])
+                            for e in entries], dtype=np.int8),
+        "completed": np.array([bool(e.get("completed")) for e in entries], dtype=np.bool_),
+        "steps": np.array([sum(len(item.get("all_steps", ())) for item in e.get("generated_plan") or ())
+                           for e in entries], dtype=np.int32),
+    }
+
+
+class HistoryColumns:
+    def __init__(self, history_path: str):
+        self.directory = os.path.splitext(history_path)[0] + ".columns"
+        self.meta_path = os.path.join(self.directory, "meta.bin")
+        self.count = 0
+        self.capacity = 0
+        self.generation = 0
+        self.version = 0
+        self._arrays: Dict[str, np.memmap] = {}
+        self._meta = None
+        self._lock = threading.RLock()
+        os.makedirs(self.directory, exist_ok=True)
+        self.refresh()
+
+    def _path(self, name: str, capacity: int) -> str:
+        return os.path.join(self.directory, f"{name}.{capacity}.npy")
+
+    def _read_meta(self):
+        try:
+            with open(self.meta_path, "rb") as f:
+                raw = f.read(_META.size)
+        except FileNotFoundError:
+            return None
+        return _META.unpack(raw) if len(raw) == _META.size else None
+
+    @property
+    def exists(self) -> bool:
+        return self._meta is not None
+
+    def refresh(self) -> bool:
+        """Re-map the columns if another worker changed them; True when it did"""
+        with self._lock:
+            meta = self._read_meta()
+            if meta == self._meta:
+                return False
+            self._meta = meta
+            self.version += 1
+            count, capacity, self.generation = meta or (0, 0, 0)
+            if not capacity:
+                self._arrays = {}
+            elif capacity != self.capacity or not self._arrays:
+                try:
+                    arrays = {name: np.load(self._path(name, capacity), mmap_mode="r+") for name in COLUMNS}
+                except FileNotFoundError:
+                    # Older layout or deleted files (the next sync rebuilds them), or a
+                    # grow that landed since meta.bin was read: try again next time
+                    self._meta = None
+                    return True
+                self._arrays = arrays
+            self.count, self.capacity = count, capacity
+            return True
+
+    def _write_meta(self):
+        # Fixed-size record rewritten in place: no rename on every append
+        self.generation += 1
+        self._meta = (self.count, self.capacity, self.generation)
+        # Not truncated first, so a concurrent reader never sees an empty file
+        fd = os.open(self.meta_path, os.O_WRONLY | os.O_CREAT | getattr(os, "O_BINARY", 0), 0o644)
+        try:
+            os.lseek(fd, 0, os.SEEK_SET)
+            os.write(fd, _META.pack(*self._meta))
+        finally:
+            os.close(fd)
+        self.version += 1
+
+    def _grow(self, needed: int):
+        capacity = max(self.capacity, INITIAL_CAPACITY)
+        while capacity < needed:
+            capacity *= 2
+        arrays = {}
+        for name, dtype in COLUMNS.items():
+            # Not referenced by meta.bin until _write_meta, so no reader has it mapped
+            grown = np.lib.format.open_memmap(self._path(name, capacity), mode="w+", dtype=dtype,
+                                              shape=(capacity,))
+            if self.count:
+                grown[:self.count] = self._arrays[name][:self.count]
+            arrays[name] = grown
+        # Drop our maps of the old files; they are deleted once meta.bin points past them
+        self._arrays, self.capacity = arrays, capacity
+
+    def _remove_stale(self):
+        """Delete column files of other capacities; ones still mapped elsewhere stay for next time"""
+        for path in glob.glob(os.path.join(self.directory, "*.npy")):
+            if not path.endswith(f".{self.capacity}.npy"):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    @contextmanager
+    def _writing(self):
+        # Callers hold the history file lock, so workers append in history order
+        with self._lock, file_lock(self.meta_path):
+            self.refresh()
+            capacity = self.capacity
+            yield
+            for array in self._arrays.values():
+                array.flush()
+            self._write_meta()
+            if self.capacity != capacity:
+                self._remove_stale()
+
+    # -------------------- WRITES (called by TaskHistory) --------------------
+    def append_rows(self, rows: Dict[str, np.ndarray]):
+        added = len(rows["id"])
+        if not added:
+            return
+        with self._writing():
+            if self.count + added > self.capacity:
+                self._grow(self.count + added)
+            for name in COLUMNS:
+                self._arrays[name][self.count:self.count + added] = rows[name]
+            self.count += added
+
+    def append(self, entries: List[Dict]):
+        self.append_rows(entries_to_rows(entries))
+
+    def set_completed(self, entry_id: int):
+        with self._writing():
+            ids = self._arrays["id"][:self.count] if self.count else np.empty(0, dtype=np.int64)
+            row = int(np.searchsorted(ids, entry_id))
+            if row < self.count and ids[row] == entry_id:
+                self._arrays["completed"][row] = True
+
+    def clear(self):
+        with self._writing():
+            self.count = 0
+
+    def drop_through(self, last_id: int):
+        """Forget the leading rows with id <= last_id (archive segments that were deleted)"""
+        with self._writing():
+            if not self.count:
+                return
+            dropped = int(np.searchsorted(self._arrays["id"][:self.count], last_id, side="right"))
+            if not dropped:
+                return
+            kept = self.count - dropped
+            for array in self._arrays.values():
+                array[:kept] = array[dropped:self.count]
+            self.count = kept
+
+    def sync(self, entries: Iterable[Dict], total: int):
+        """Rebuild from `entries` if the columns are missing or don't hold `total` rows"""
+        with self._lock:
+            self.refresh()
+            if self.exists and self.count == total:
+                return
+            with self._writing():
+                self.count = 0
+            batch = []
+            for entry in entries:
+                batch.append(entry)
+                if len(batch) == SYNC_BATCH:
+                    self.append(batch)
+                    batch = []
+            if batch:
+                self.append(batch)
+
+    # -------------------- READS --------------------
+    def read(self) -> Dict[str, np.ndarray]:
+        """Read-only memory-mapped views of the current rows, no copying"""
+        with self._lock:
+            self.refresh()
+            if not self.count:
+                return {name: np.empty(0, dtype=dtype) for name, dtype in COLUMNS.items()}
+            views = {}
+            for name, array in self._arrays.items():
+                view = array[:self.count]
+                view.flags.writeable = False
+                views[name] = view
+            return views
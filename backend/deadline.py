@@ -0,0 +1,74 @@
+"""
+Per-request time budget for /generate-plan.
+
+A Deadline is created when the request arrives (PLAN_REQUEST_TIMEOUT_SECONDS,
+or the client's X-Request-Timeout header in seconds, capped at
+PLAN_REQUEST_MAX_TIMEOUT_SECONDS). It is passed down the whole pipeline:
+admission will not queue past it, every LLM call gets the remaining time as
+its timeout, retries stop when too little is left, and a client disconnect
+cancels it. Tasks that did not get steps in time get the fallback steps, and
+the response is flagged `partial`.
+"""
+import asyncio
+import os
+import threading
+import time
+
+from starlette.requests import Request
+
+DEFAULT_TIMEOUT = float(os.getenv("PLAN_REQUEST_TIMEOUT_SECONDS", "20"))
+MAX_TIMEOUT = float(os.getenv("PLAN_REQUEST_MAX_TIMEOUT_SECONDS", "60"))
+TIMEOUT_HEADER = "X-Request-Timeout"
+# Not worth starting an LLM call with less than this left
+MIN_LLM_SECONDS = 1.0
+DISCONNECT_POLL_SECONDS = 0.25
+
+
+class Deadline:
+    __slots__ = ("expires_at", "_cancelled")
+
+    def __init__(self, seconds: float = DEFAULT_TIMEOUT):
+        self.expires_at = time.monotonic() + seconds
+        self._cancelled = threading.Event()
+
+    @classmethod
+    def from_header(cls, value: str = None) -> "Deadline":
+        """Budget from X-Request-Timeout if it is a sane number of seconds"""
+        try:
+            seconds = float(value) if value else DEFAULT_TIMEOUT
+        except ValueError:
+            seconds = DEFAULT_TIMEOUT
+        if not 0 < seconds < float("inf"):
+            seconds = DEFAULT_TIMEOUT
+        return cls(min(seconds, MAX_TIMEOUT))
+
+    def remaining(self) -> float:
+        if self._cancelled.is_set():
+            return 0.0
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def allows_llm_call(self) -> bool:
+        return self.remaining() >= MIN_LLM_SECONDS
+
+    def cancel(self):
+        self._cancelled.set()
+
+
+async def cancel_on_disconnect(request: Request, deadline: Deadline, work):
+    """Await `work`, cancelling the deadline if the client goes away meanwhile"""
+    work = asyncio.ensure_future(work)
+    while True:
+        done, _ = await asyncio.wait({work}, timeout=DISCONNECT_POLL_SECONDS)
+        if done:
+            return work.result()
+        if not deadline.cancelled and await request.is_disconnected():
+            # The worker thread notices between stages / LLM calls and wraps up
+            deadline.cancel()
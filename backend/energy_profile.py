@@ -0,0 +1,258 @@
+"""
+Per-user energy profiles learned from task history.
+
+Each user has two weekday x hour (7x24) histograms: sessions started, and
+sessions later completed, both under an exponential decay so recent weeks
+count most. Updates are O(1): instead of decaying all 168 cells on every
+event, an event at time t is added with weight exp(rate * (t - t0)), and the
+arrays are scaled by exp(-rate * (now - t0)) only when read. When the weights
+grow large, the arrays are rebased onto a new t0 once, which is cheap.
+
+Each profile is one small .npy file (about 2.7 KB per user). The file is
+rewritten under the shared file lock, so every worker sees the same numbers.
+
+EnergyScheduler turns a profile into a high/medium/low hour table: the
+completion rate of each hour is compared with the user's own average. Hours
+the user rarely works in keep the default pattern.
+"""
+import math
+import os
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from backend.shared_state import file_lock, user_file_name
+
+PROFILE_DIR = os.getenv("ENERGY_PROFILE_DIR", "energy_profiles")
+HALF_LIFE_DAYS = float(os.getenv("ENERGY_PROFILE_HALF_LIFE_DAYS", "14"))
+# Decayed sessions a user needs before their profile replaces the defaults
+MIN_SESSIONS = float(os.getenv("ENERGY_PROFILE_MIN_SESSIONS", "20"))
+# ...and an hour needs before its own rate is trusted
+MIN_HOUR_SESSIONS = 2.0
+# Pseudo-sessions pulling sparse cells towards the hour's / the user's average
+PRIOR_WEIGHT = 3.0
+HIGH_RATIO = 1.15
+LOW_RATIO = 0.85
+DEFAULT_USER = "default"
+# Rebase before exp() weights get anywhere near float64 limits
+MAX_EXPONENT = 50.0
+
+_CELLS = 7 * 24
+
+
+def _epoch(timestamp) -> float:
+    if isinstance(timestamp, (int, float)):
+        return float(timestamp)
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp)
+    return timestamp.timestamp()
+
+
+def _cell(t: float) -> int:
+    moment = datetime.fromtimestamp(t)
+    return moment.weekday() * 24 + moment.hour
+
+
+class EnergyProfile:
+    """Decayed session/completion counts for one user (flat 168-cell arrays)"""
+    __slots__ = ("t0", "sessions", "completions", "signature")
+
+    def __init__(self, t0: float, sessions: np.ndarray = None, completions: np.ndarray = None):
+        self.t0 = t0
+        self.sessions = np.zeros(_CELLS) if sessions is None else sessions
+        self.completions = np.zeros(_CELLS) if completions is None else completions
+        self.signature = None
+
+    def weight(self, t: float, rate: float) -> float:
+        exponent = rate * (t - self.t0)
+        if exponent > MAX_EXPONENT:
+            self.rebase(t, rate)
+            exponent = 0.0
+        return math.exp(exponent)
+
+    def rebase(self, t: float, rate: float):
+        factor = math.exp(-rate * (t - self.t0))
+        self.sessions *= factor
+        self.completions *= factor
+        self.t0 = t
+
+    def decayed(self, now: float, rate: float):
+        """(sessions, completions) as 7x24 arrays, in events-as-of-now units"""
+        factor = math.exp(-rate * (now - self.t0))
+        return (self.sessions * factor).reshape(7, 24), (self.completions * factor).reshape(7, 24)
+
+    def to_array(self) -> np.ndarray:
+        return np.concatenate(([self.t0], self.sessions, self.completions))
+
+    @classmethod
+    def from_array(cls, array: np.ndarray) -> "EnergyProfile":
+        return cls(float(array[0]), array[1:1 + _CELLS].copy(), array[1 + _CELLS:].copy())
+
+
+class EnergyProfiles:
+    """
+    Store of per-user profiles. Register it on TaskHistory with
+    add_listener(); it then learns from every new and completed entry.
+    """
+
+    def __init__(self, directory: str = PROFILE_DIR, half_life_days: float = HALF_LIFE_DAYS,
+                 min_sessions: float = MIN_SESSIONS):
+        self.directory = directory
+        self.rate = math.log(2) / (half_life_days * 86400)
+        self.min_sessions = min_sessions
+        self._profiles: Dict[str, EnergyProfile] = {}
+        self._lock = threading.RLock()
+        os.makedirs(directory, exist_ok=True)
+
+    # -------------------- STORAGE --------------------
+    def _path(self, user_id: str) -> str:
+        return os.path.join(self.directory, user_file_name(user_id) + ".npy")
+
+    def _load(self, user_id: str) -> Optional[EnergyProfile]:
+        """Cached profile, re-read only if another worker replaced the file"""
+        path = self._path(user_id)
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            self._profiles.pop(user_id, None)
+            return None
+        signature = (st.st_mtime_ns, st.st_size, st.st_ino)
+        profile = self._profiles.get(user_id)
+        if profile is None or profile.signature != signature:
+            try:
+                profile = EnergyProfile.from_array(np.load(path))
+            except (OSError, ValueError):
+                return None
+            profile.signature = signature
+            self._profiles[user_id] = profile
+        return profile
+
+    def _save(self, user_id: str, profile: EnergyProfile):
+        path = self._path(user_id)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, profile.to_array())
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        st = os.stat(path)
+        profile.signature = (st.st_mtime_ns, st.st_size, st.st_ino)
+        self._profiles[user_id] = profile
+
+    @contextmanager
+    def _update(self, user_id: str, first_event: float):
+        path = self._path(user_id)
+        with self._lock, file_lock(path):
+            profile = self._load(user_id) or EnergyProfile(first_event)
+            yield profile
+            self._save(user_id, profile)
+
+    # -------------------- LEARNING --------------------
+    def record(self, timestamps: Iterable, completed: bool = False, user_id: str = DEFAULT_USER):
+        """
+        Count sessions started at `timestamps`; with completed=True count them
+        as completed instead. Completions use the session's start time, so the
+        rate per hour is "completed / started" for sessions started then.
+        """
+        times = [_epoch(t) for t in timestamps]
+        if not times:
+            return
+        with self._update(user_id, times[0]) as profile:
+            target = profile.completions if completed else profile.sessions
+            for t in times:
+                target[_cell(t)] += profile.weight(t, self.rate)
+
+    def entries_added(self, entries: List[Dict]):
+        """TaskHistory listener hook"""
+        by_user = defaultdict(list)
+        for entry in entries:
+            by_user[entry.get("user_id", DEFAULT_USER)].append(entry["timestamp"])
+        for user_id, timestamps in by_user.items():
+            self.record(timestamps, user_id=user_id)
+
+    def entry_completed(self, entry: Dict):
+        """TaskHistory listener hook"""
+        self.record([entry["timestamp"]], completed=True, user_id=entry.get("user_id", DEFAULT_USER))
+
+    def backfill(self, entries: List[Dict], user_id: str = DEFAULT_USER) -> bool:
+        """Build a profile from existing history, once; False if one already exists"""
+        with self._lock, file_lock(self._path(user_id)):
+            if os.path.exists(self._path(user_id)):
+                return False
+            entries = [e for e in entries if e.get("user_id", DEFAULT_USER) == user_id]
+            if not entries:
+                return False
+            times = np.array([_epoch(e["timestamp"]) for e in entries])
+            completed = np.array([bool(e.get("completed")) for e in entries])
+            cells = np.array([_cell(t) for t in times])
+
+            profile = EnergyProfile(float(times.max()))
+            weights = np.exp(self.rate * (times - profile.t0))
+            np.add.at(profile.sessions, cells, weights)
+            np.add.at(profile.completions, cells[completed], weights[completed])
+            self._save(user_id, profile)
+        return True
+
+    # -------------------- READING --------------------
+    def completion_rates(self, user_id: str = DEFAULT_USER, now: float = None):
+        """
+        (rates 7x24, sessions per hour 24, overall rate) with sparse cells
+        smoothed towards the hour's rate, and hours towards the overall rate.
+        None until the user has MIN_SESSIONS (decayed) sessions.
+        """
+        with self._lock:
+            profile = self._load(user_id)
+            if profile is None:
+                return None
+            sessions, completions = profile.decayed(time.time() if now is None else now, self.rate)
+
+        total = sessions.sum()
+        if total < self.min_sessions or completions.sum() <= 0:
+            return None
+        overall = completions.sum() / total
+        hour_sessions = sessions.sum(axis=0)
+        hour_rate = (completions.sum(axis=0) + PRIOR_WEIGHT * overall) / (hour_sessions + PRIOR_WEIGHT)
+        rates = (completions + PRIOR_WEIGHT * hour_rate) / (sessions + PRIOR_WEIGHT)
+        return rates, hour_sessions, overall
+
+    def energy_table(self, user_id: str, weekday: int, default: List[str],
+                     now: float = None) -> Optional[List[str]]:
+        """Learned hour -> high/medium/low for `weekday`; None to use `default`"""
+        learned = self.completion_rates(user_id, now)
+        if learned is None:
+            return None
+        rates, hour_sessions, overall = learned
+        ratio = rates[weekday] / overall
+        table = []
+        for hour in range(24):
+            if hour_sessions[hour] < MIN_HOUR_SESSIONS:
+                table.append(default[hour])
+            elif ratio[hour] >= HIGH_RATIO:
+                table.append("high")
+            elif ratio[hour] <= LOW_RATIO:
+                table.append("low")
+            else:
+                table.append("medium")
+        return table
+
+    def summary(self, user_id: str = DEFAULT_USER) -> Dict:
+        """Completion rate per hour (all weekdays pooled), for the API"""
+        learned = self.completion_rates(user_id)
+        if learned is None:
+            return {"learned": False}
+        rates, hour_sessions, overall = learned
+        return {
+            "learned": True,
+            "overall_completion_rate": round(float(overall), 3),
+            "sessions_by_hour": [round(float(s), 2) for s in hour_sessions],
+            "completion_rate_by_hour": [round(float(r), 3) for r in rates.mean(axis=0)],
+        }
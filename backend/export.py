@@ -0,0 +1,66 @@
+"""
+Streaming history export (NDJSON or CSV).
+
+Entries come from TaskHistory.iter_entries(), which streams archived
+segments. Output is batched into chunks of about CHUNK_BYTES and can be
+gzipped on the fly, so server memory stays constant whatever the history
+size.
+"""
+import csv
+import io
+import json
+import zlib
+from typing import Dict, Iterable, Iterator
+
+FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+CSV_FIELDS = ["id", "timestamp", "user_query", "energy_level", "mood", "completed", "completed_at",
+              "generated_plan"]
+CHUNK_BYTES = 64 * 1024
+
+
+def _batched(lines: Iterable[str]) -> Iterator[bytes]:
+    buffer, size = [], 0
+    for line in lines:
+        buffer.append(line)
+        size += len(line)
+        if size >= CHUNK_BYTES:
+            yield "".join(buffer).encode("utf-8")
+            buffer, size = [], 0
+    if buffer:
+        yield "".join(buffer).encode("utf-8")
+
+
+def ndjson_lines(entries: Iterable[Dict]) -> Iterator[str]:
+    for entry in entries:
+        yield json.dumps(entry, ensure_ascii=False) + "\n"
+
+
+def csv_lines(entries: Iterable[Dict]) -> Iterator[str]:
+    row = io.StringIO()
+    writer = csv.DictWriter(row, fieldnames=CSV_FIELDS, extrasaction="ignore")
+    writer.writeheader()
+    for entry in entries:
+        writer.writerow({**entry, "generated_plan": json.dumps(entry.get("generated_plan"), ensure_ascii=False)})
+        yield row.getvalue()
+        row.seek(0)
+        row.truncate()
+    yield row.getvalue()
+
+
+def gzip_chunks(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31: gzip container
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def export_chunks(entries: Iterable[Dict], fmt: str = "ndjson", gzip: bool = False) -> Iterator[bytes]:
+    """Encoded export body as a stream of byte chunks"""
+    lines = csv_lines(entries) if fmt == "csv" else ndjson_lines(entries)
+    chunks = _batched(lines)
+    return gzip_chunks(chunks) if gzip else chunks
@@ -1,60 +1,135 @@
-import json
+import glob
+import hashlib
 import os
+import re
+import threading
+from collections import OrderedDict
 from datetime import datetime
 
+from backend.energy_profile import DEFAULT_USER
+from backend.leaderboard import live_streak
+from backend.shared_state import SharedJSONFile, file_lock, user_file_name
+
 DATA_FILE = "gamification_data.json"
+# Logged-in users get one small file each; anonymous stats stay in DATA_FILE
+USER_DIR = os.getenv("GAMIFICATION_DIR", "gamification")
+MAX_OPEN_USERS = 1024
+# XP for finishing one task. Clients report XP themselves (POST /api/gamification/xp,
+# the WebSocket "xp" message), so no single report may be worth more than a task
+TASK_XP = 50
+MAX_XP_PER_EVENT = TASK_XP
+
+# Files used to be named by the email itself; see _adopt_legacy
+_LEGACY_NAME = re.compile(r"[A-Za-z0-9_.@+-]{1,64}")
+
+
+def _legacy_name(user_id: str) -> str:
+    if _LEGACY_NAME.fullmatch(user_id) and not user_id.startswith("."):
+        return user_id
+    return hashlib.sha1(user_id.encode()).hexdigest()[:16]
+
+def _default_data():
+    return {"xp": 0, "level": 1, "streak": 0, "last_active": None}
 
 class GamificationSystem:
-    def __init__(self):
-        self.data = self._load_data()
-
-    def _load_data(self):
-        if os.path.exists(DATA_FILE):
-            try:
-                with open(DATA_FILE, "r") as f:
-                    return json.load(f)
-            except:
-                pass
-        return {"xp": 0, "level": 1, "streak": 0, "last_active": None}
-
-    def _save_data(self):
-        with open(DATA_FILE, "w") as f:
-            json.dump(self.data, f)
-
-    def add_xp(self, amount: int):
-        self.data["xp"] += amount
-        # Level up logic: Level = sqrt(XP) or simple threshold (e.g. every 100 XP)
-        new_level = 1 + (self.data["xp"] // 100)
-        leveled_up = new_level > self.data["level"]
-        self.data["level"] = new_level
-        
-        self.check_streak()
-        self._save_data()
-        
+    def __init__(self, path: str = DATA_FILE, directory: str = USER_DIR, leaderboard=None):
+        self.store = SharedJSONFile(path, _default_data)
+        self.directory = directory
+        # Optional Leaderboard, kept up to date from add_xp / check_streak
+        self.leaderboard = leaderboard
+        self._stores = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _store(self, user_id: str) -> SharedJSONFile:
+        if user_id == DEFAULT_USER:
+            return self.store
+        with self._lock:
+            store = self._stores.get(user_id)
+            if store is None:
+                path = os.path.join(self.directory, user_file_name(user_id) + ".json")
+                self._adopt_legacy(user_id, path)
+                store = self._stores[user_id] = SharedJSONFile(path, _default_data)
+                while len(self._stores) > MAX_OPEN_USERS:
+                    self._stores.popitem(last=False)
+            else:
+                self._stores.move_to_end(user_id)
+            return store
+
+    def _adopt_legacy(self, user_id: str, path: str):
+        """Rename the user's file from the old email-named layout, if it is theirs"""
+        legacy = os.path.join(self.directory, _legacy_name(user_id) + ".json")
+        if os.path.exists(path) or not os.path.exists(legacy):
+            return
+        with file_lock(legacy):
+            legacy_data = SharedJSONFile(legacy, dict).data
+            if legacy_data.get("user_id") == user_id and not os.path.exists(path):
+                os.replace(legacy, path)
+
+    @property
+    def data(self):
+        self.store.refresh()
+        return self.store.data
+
+    def _publish(self, user_id: str, data):
+        # Inside the user's transaction, so the leaderboard sees updates in order
+        if user_id == DEFAULT_USER:
+            return
+        data["user_id"] = user_id
+        if self.leaderboard is not None:
+            self.leaderboard.update(user_id, data["xp"], data["streak"], data["last_active"])
+
+    def add_xp(self, amount: int, user_id: str = DEFAULT_USER):
+        if not 1 <= amount <= MAX_XP_PER_EVENT:
+            raise ValueError(f"XP amount must be between 1 and {MAX_XP_PER_EVENT}")
+        with self._store(user_id).transaction() as data:
+            data["xp"] += amount
+            # Level up logic: Level = sqrt(XP) or simple threshold (e.g. every 100 XP)
+            new_level = 1 + (data["xp"] // 100)
+            leveled_up = new_level > data["level"]
+            data["level"] = new_level
+
+            self._update_streak(data)
+            self._publish(user_id, data)
+
         return {
-            "xp": self.data["xp"],
-            "level": self.data["level"],
+            "xp": data["xp"],
+            "level": data["level"],
             "leveled_up": leveled_up
         }
 
-    def check_streak(self):
+    def check_streak(self, user_id: str = DEFAULT_USER):
+        with self._store(user_id).transaction() as data:
+            self._update_streak(data)
+            self._publish(user_id, data)
+
+    def _update_streak(self, data):
         today = datetime.now().strftime("%Y-%m-%d")
-        last = self.data.get("last_active")
-        
+        last = data.get("last_active")
+
         if last != today:
             # Check if consecutive
             if last:
                 last_date = datetime.strptime(last, "%Y-%m-%d")
                 delta = (datetime.now() - last_date).days
                 if delta == 1:
-                    self.data["streak"] += 1
+                    data["streak"] += 1
                 elif delta > 1:
-                    self.data["streak"] = 1 # Reset
+                    data["streak"] = 1 # Reset
             else:
-                self.data["streak"] = 1
-                
-            self.data["last_active"] = today
-            self._save_data()
+                data["streak"] = 1
+
+            data["last_active"] = today
+
+    def get_stats(self, user_id: str = DEFAULT_USER):
+        store = self._store(user_id)
+        store.refresh()
+        # The stored streak only changes on activity; one that lapsed since reads as 0
+        return {**store.data, "streak": live_streak(store.data["streak"], store.data.get("last_active"))}
 
-    def get_stats(self):
-        return self.data
+    def user_totals(self):
+        """(user_id, xp, streak, last_active) of every logged-in user, for Leaderboard.backfill"""
+        for path in glob.glob(os.path.join(self.directory, "*.json")):
+            data = SharedJSONFile(path, _default_data).data
+            if data.get("user_id"):
+                yield data["user_id"], data["xp"], data["streak"], data.get("last_active")
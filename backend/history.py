@@ -1,91 +1,205 @@
-import json
+import itertools
 import os
-from datetime import datetime
-from typing import List, Dict
+from datetime import datetime, timedelta
+from typing import Iterator, List, Dict
+
+from backend.columnar import HistoryColumns
+from backend.history_records import (HistoryEntry, StringTable, datetime_to_micros, json_default,
+                                     timestamp_to_micros)
+from backend.retention import SegmentArchive, HOT_DAYS, ARCHIVE_EVERY_DAYS
+from backend.shared_state import SharedJSONFile
 
 HISTORY_FILE = "task_history.json"
 
 class TaskHistory:
-    def __init__(self):
-        self.history = self._load_history()
+    def __init__(self, path: str = HISTORY_FILE, hot_days: float = HOT_DAYS, user_id: str = None):
+        # Only the last `hot_days` live in the JSON file; older entries are archived segments
+        self.user_id = user_id
+        # Held as compact HistoryEntry records; dicts only at the API boundary
+        self.strings = StringTable()
+        self.store = SharedJSONFile(path, list, decode=self._decode, encode=json_default,
+                                    indent=2, ensure_ascii=False)
+        self.hot_days = hot_days
+        self.archive = SegmentArchive(os.path.splitext(path)[0] + ".archive", on_remove=self._archive_pruned)
+        # Memory-mapped columns of all entries (archived too), for analytics
+        self.columns = HistoryColumns(path)
+        with self.store.locked() as history:
+            self.columns.sync(itertools.chain(self.archive.iter_entries(), (e.to_dict() for e in history)),
+                              self.archive.count + len(history))
+        self.listeners = []
+        self.archive_old()
+
+    def _archive_pruned(self, segments: List[Dict]):
+        # Analytics must stop counting entries the retention policy deleted
+        self.columns.drop_through(max(segment["last_id"] for segment in segments))
+
+    def add_listener(self, listener):
+        """
+        Call listener.entries_added(entries) / entry_completed(entry) /
+        history_cleared() after each write; listeners may skip any of them.
+        """
+        self.listeners.append(listener)
 
-    def _load_history(self) -> List[Dict]:
-        """Load history from file"""
-        if os.path.exists(HISTORY_FILE):
+    def _notify(self, method: str, *args):
+        # Runs after the history lock is released; a failing listener never loses an entry
+        for listener in self.listeners:
+            handler = getattr(listener, method, None)
+            if handler is None:
+                continue
             try:
-                with open(HISTORY_FILE, "r", encoding="utf-8") as f:
-                    return json.load(f)
-            except:
-                pass
-        return []
-
-    def _save_history(self):
-        """Save history to file"""
-        with open(HISTORY_FILE, "w", encoding="utf-8") as f:
-            json.dump(self.history, f, indent=2, ensure_ascii=False)
-
-    def add_entry(self, user_query: str, generated_plan: List[Dict], energy_level: str = "medium"):
-        """Add a new history entry"""
+                handler(*args)
+            except Exception as e:
+                print(f"History listener {type(listener).__name__}.{method} failed: {e}")
+
+    def _decode(self, entries: List) -> List[HistoryEntry]:
+        return [e if isinstance(e, HistoryEntry) else HistoryEntry.from_dict(e, self.strings)
+                for e in entries]
+
+    @property
+    def entries(self) -> List[HistoryEntry]:
+        """Hot-window records, refreshed if another worker wrote since the last read"""
+        self.store.refresh()
+        return self.store.data
+
+    @property
+    def history(self) -> List[Dict]:
+        """Hot-window entries as dicts (copies: changing them changes nothing)"""
+        return [entry.to_dict() for entry in self.entries]
+
+    def _new_entry(self, history: List[HistoryEntry], user_query: str, generated_plan: List[Dict],
+                   energy_level: str = "medium", mood: str = None) -> Dict:
+        # Ids keep counting past archived entries
+        next_id = history[-1].id + 1 if history else self.archive.last_id + 1
         entry = {
-            "id": len(self.history) + 1,
+            "id": next_id,
             "timestamp": datetime.now().isoformat(),
             "user_query": user_query,
             "energy_level": energy_level,
+            "mood": mood,
             "generated_plan": generated_plan,
             "completed": False
         }
-        
-        self.history.append(entry)
-        self._save_history()
-        
+        if self.user_id is not None:
+            # Lets shared listeners (energy profiles) tell partitions apart
+            entry["user_id"] = self.user_id
+        return entry
+
+    def add_entry(self, user_query: str, generated_plan: List[Dict], energy_level: str = "medium",
+                  mood: str = None):
+        """Add a new history entry"""
+        with self.store.transaction() as history:
+            entry = self._new_entry(history, user_query, generated_plan, energy_level, mood)
+            history.append(HistoryEntry.from_dict(entry, self.strings))
+            self.columns.append([entry])
+
+        self._notify("entries_added", [entry])
+        self.archive_old()
         return entry
 
+    def add_entries(self, items: List[Dict]) -> List[Dict]:
+        """Add many entries (add_entry keyword dicts) with a single file write"""
+        with self.store.transaction() as history:
+            entries = []
+            for item in items:
+                entry = self._new_entry(history, **item)
+                history.append(HistoryEntry.from_dict(entry, self.strings))
+                entries.append(entry)
+            self.columns.append(entries)
+
+        self._notify("entries_added", entries)
+        self.archive_old()
+        return entries
+
+    def archive_old(self, force: bool = False) -> int:
+        """
+        Move entries older than the hot window into a compressed segment.
+        Without force, waits until ARCHIVE_EVERY_DAYS have piled up.
+        """
+        cutoff = datetime.now() - timedelta(days=self.hot_days)
+        threshold = cutoff if force else cutoff - timedelta(days=ARCHIVE_EVERY_DAYS)
+        history = self.entries
+        if not history or history[0].ts >= datetime_to_micros(threshold):
+            return 0
+
+        cutoff = datetime_to_micros(cutoff)
+        with self.store.transaction() as history:
+            split = 0
+            while split < len(history) and history[split].ts < cutoff:
+                split += 1
+            if split:
+                self.archive.write_segment([e.to_dict() for e in history[:split]])
+                del history[:split]
+                # Steps only the archived entries used can go
+                self.strings.rebuild(s for e in history for s in e.strings())
+        self.archive.apply_policy()
+        return split
+
+    def iter_entries(self, start: str = None, end: str = None) -> Iterator[Dict]:
+        """All entries oldest first, archived ones streamed lazily; start <= timestamp < end"""
+        yield from self.archive.iter_entries(start, end)
+        low = timestamp_to_micros(start) if start else None
+        high = timestamp_to_micros(end) if end else None
+        for entry in list(self.entries):
+            if (low is not None and entry.ts < low) or (high is not None and entry.ts >= high):
+                continue
+            yield entry.to_dict()
+
     def get_all_history(self, limit: int = None) -> List[Dict]:
         """Get all history entries, optionally limited"""
-        if limit:
-            return self.history[-limit:]
-        return self.history
+        hot = self.entries
+        if limit and limit <= len(hot):
+            return [entry.to_dict() for entry in hot[-limit:]]
+        entries = list(self.iter_entries())
+        return entries[-limit:] if limit else entries
 
     def get_entry_by_id(self, entry_id: int) -> Dict:
         """Get a specific history entry by ID"""
-        for entry in self.history:
-            if entry["id"] == entry_id:
-                return entry
-        return None
+        for entry in self.entries:
+            if entry.id == entry_id:
+                return entry.to_dict()
+        return self.archive.get(entry_id)
 
     def mark_completed(self, entry_id: int):
         """Mark a history entry as completed"""
-        for entry in self.history:
-            if entry["id"] == entry_id:
-                entry["completed"] = True
-                entry["completed_at"] = datetime.now().isoformat()
-                self._save_history()
-                return True
-        return False
+        found = newly_completed = None
+        with self.store.transaction() as history:
+            for entry in history:
+                if entry.id == entry_id:
+                    newly_completed = not entry.completed
+                    entry.completed = True
+                    entry.completed_at = datetime_to_micros(datetime.now())
+                    found = entry.to_dict()
+                    self.columns.set_completed(entry_id)
+                    break
+        if found is None:
+            return False
+        if newly_completed:
+            self._notify("entry_completed", found)
+        return True
 
     def search_history(self, query: str) -> List[Dict]:
         """Search history by query text"""
         query_lower = query.lower()
-        results = []
-        for entry in self.history:
-            if query_lower in entry["user_query"].lower():
-                results.append(entry)
+        results = [entry for entry in self.archive.iter_entries()
+                   if query_lower in entry["user_query"].lower()]
+        results.extend(entry.to_dict() for entry in list(self.entries)
+                       if query_lower in entry.user_query.lower())
         return results
 
     def get_recent_queries(self, days: int = 7) -> List[Dict]:
         """Get queries from the last N days"""
-        from datetime import timedelta
         cutoff = datetime.now() - timedelta(days=days)
-        
-        recent = []
-        for entry in self.history:
-            entry_time = datetime.fromisoformat(entry["timestamp"])
-            if entry_time > cutoff:
-                recent.append(entry)
-        
-        return recent
+        return list(self.iter_entries(start=cutoff.isoformat()))
 
     def clear_history(self):
         """Clear all history"""
-        self.history = []
-        self._save_history()
+        with self.store.transaction() as history:
+            if history:
+                # Ids keep counting after a clear too, so exported ones stay unique
+                self.archive.note_last_id(history[-1].id)
+            history.clear()
+            self.strings.rebuild(())
+            self.columns.clear()
+            self.archive.clear()
+
+        self._notify("history_cleared")
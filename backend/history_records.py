@@ -0,0 +1,175 @@
+"""
+Compact in-memory form of task history entries.
+
+A parsed history entry is a dict of dicts of lists of strings, and most of
+it repeats: every entry carries its own copy of "medium", of the task name
+and of the same planner steps, plus a 26-character ISO timestamp that is
+re-parsed whenever a query filters by time. TaskHistory keeps its hot
+window as HistoryEntry records instead:
+
+- `__slots__` records, no per-entry dict;
+- energy level, mood and user id are interned, so each value exists once;
+- timestamps are integer microseconds since 1970-01-01 on the same naive
+  local clock the ISO strings use, so time filters compare ints;
+- task names and steps go through a StringTable, so a step that appears in
+  ten thousand plans is stored once and each plan holds a tuple of
+  references to it.
+
+to_dict() gives back exactly the JSON shape the API and the file always
+had; nothing outside TaskHistory sees a record.
+"""
+import sys
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Iterator, Optional
+
+EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+_FIELDS = ("id", "timestamp", "user_query", "energy_level", "mood", "generated_plan", "completed",
+           "user_id", "completed_at")
+_PLAN_KEYS = {"task", "current_step", "next_step_index", "total_steps", "all_steps"}
+
+
+def datetime_to_micros(value: datetime) -> int:
+    if value.tzinfo is not None:
+        value = value.astimezone().replace(tzinfo=None)
+    return (value - EPOCH) // _MICROSECOND
+
+
+def timestamp_to_micros(timestamp: str) -> int:
+    """ISO timestamp -> integer microseconds"""
+    return datetime_to_micros(datetime.fromisoformat(timestamp))
+
+
+def micros_to_timestamp(micros: int) -> str:
+    """Inverse of timestamp_to_micros for the naive timestamps history writes"""
+    return (EPOCH + timedelta(microseconds=micros)).isoformat()
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class StringTable:
+    """Hands out one shared object per distinct string"""
+    __slots__ = ("_strings",)
+
+    def __init__(self):
+        self._strings: Dict[str, str] = {}
+
+    def intern(self, value: str) -> str:
+        return self._strings.setdefault(value, value)
+
+    def rebuild(self, live: Iterable[str]):
+        """Keep only `live` strings, e.g. after entries were archived"""
+        self._strings = {}
+        for value in live:
+            self._strings.setdefault(value, value)
+
+    def __len__(self) -> int:
+        return len(self._strings)
+
+
+class PlanItem:
+    """One task of a stored plan; the step counters are derived from `steps`"""
+    __slots__ = ("task", "steps")
+
+    def __init__(self, task: str, steps: tuple):
+        self.task = task
+        self.steps = steps
+
+    def to_dict(self) -> Dict:
+        return {
+            "task": self.task,
+            "current_step": self.steps[0],
+            "next_step_index": 1,
+            "total_steps": len(self.steps),
+            "all_steps": list(self.steps),
+        }
+
+
+def _plan_item(item, strings: StringTable):
+    steps = item.get("all_steps") if isinstance(item, dict) else None
+    if (steps and item.keys() == _PLAN_KEYS and isinstance(item["task"], str)
+            and all(isinstance(step, str) for step in steps)
+            and item["current_step"] == steps[0] and item["next_step_index"] == 1
+            and item["total_steps"] == len(steps)):
+        return PlanItem(strings.intern(item["task"]), tuple(strings.intern(step) for step in steps))
+    # Any other shape (older entries, hand-written plans) is kept as it came
+    return item
+
+
+class HistoryEntry:
+    __slots__ = ("id", "ts", "user_query", "energy_level", "mood", "plan", "completed", "completed_at",
+                 "user_id", "extra")
+
+    def __init__(self, id: int, ts: int, user_query: str, energy_level: Optional[str] = None,
+                 mood: Optional[str] = None, plan: tuple = (), completed: bool = False,
+                 completed_at: Optional[int] = None, user_id: Optional[str] = None,
+                 extra: Optional[Dict] = None):
+        self.id = id
+        self.ts = ts
+        self.user_query = user_query
+        self.energy_level = energy_level
+        self.mood = mood
+        self.plan = plan
+        self.completed = completed
+        self.completed_at = completed_at
+        self.user_id = user_id
+        # Keys this class doesn't know about, written back unchanged
+        self.extra = extra
+
+    @classmethod
+    def from_dict(cls, entry: Dict, strings: StringTable) -> "HistoryEntry":
+        completed_at = entry.get("completed_at")
+        extra = {key: value for key, value in entry.items() if key not in _FIELDS} or None
+        return cls(
+            entry["id"],
+            timestamp_to_micros(entry["timestamp"]),
+            entry.get("user_query"),
+            _intern(entry.get("energy_level")),
+            _intern(entry.get("mood")),
+            tuple(_plan_item(item, strings) for item in entry.get("generated_plan") or ()),
+            entry.get("completed", False),
+            timestamp_to_micros(completed_at) if completed_at else None,
+            _intern(entry.get("user_id")),
+            extra,
+        )
+
+    @property
+    def timestamp(self) -> str:
+        return micros_to_timestamp(self.ts)
+
+    def to_dict(self) -> Dict:
+        """The entry in its JSON / API shape"""
+        entry = {
+            "id": self.id,
+            "timestamp": micros_to_timestamp(self.ts),
+            "user_query": self.user_query,
+            "energy_level": self.energy_level,
+            "mood": self.mood,
+            "generated_plan": [item.to_dict() if isinstance(item, PlanItem) else dict(item)
+                               for item in self.plan],
+            "completed": self.completed,
+        }
+        if self.user_id is not None:
+            entry["user_id"] = self.user_id
+        if self.completed_at is not None:
+            entry["completed_at"] = micros_to_timestamp(self.completed_at)
+        if self.extra:
+            entry.update(self.extra)
+        return entry
+
+    def strings(self) -> Iterator[str]:
+        """Table strings this entry refers to"""
+        for item in self.plan:
+            if isinstance(item, PlanItem):
+                yield item.task
+                yield from item.steps
+
+
+def json_default(value):
+    """`default=` hook for json.dump, so a list of records serializes as before"""
+    if isinstance(value, HistoryEntry):
+        return value.to_dict()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
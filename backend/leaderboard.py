@@ -0,0 +1,253 @@
+"""
+XP and streak leaderboards.
+
+Each metric is an order-statistics index: a SortedList of (-score, user_id),
+so the top N, a user's rank and the window around them cost O(log n) (plus
+the size of the answer) instead of a sort over every user per request.
+GamificationSystem pushes each user's new (xp, streak, last_active) in from
+add_xp and check_streak. A streak only counts while the user was last active
+today or yesterday: the index is swept once a day, so users who stopped
+showing up drop to 0 instead of keeping their rank.
+
+Other users are shown by an opaque id (an HMAC of the user id under
+LEADERBOARD_NAME_SECRET), never by anything derived from their email.
+
+Updates are also appended to a journal file (`leaderboard.log`, one JSON
+line per update, under the shared file lock). Every worker replays the lines
+it has not seen yet before answering, so all workers rank the same way, and
+a restart rebuilds the index from the journal without touching the
+per-user files. Once the journal holds COMPACT_RATIO times more lines than
+there are users, it is rewritten with one line per user.
+"""
+import hashlib
+import hmac
+import json
+import os
+import tempfile
+import threading
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sortedcontainers import SortedList
+
+from backend.shared_state import file_lock
+
+LEADERBOARD_FILE = "leaderboard.log"
+METRICS = ("xp", "streak")
+MAX_LIMIT = 100
+COMPACT_RATIO = 4
+# Journals this small are never worth compacting
+MIN_COMPACT_LINES = 10000
+NAME_SECRET = os.getenv("LEADERBOARD_NAME_SECRET", "PLEASE_CHANGE_THIS_TO_A_RANDOM_STRING_IN_PRODUCTION")
+
+
+def display_name(user_id: str) -> str:
+    """What other users see: a stable id that does not reveal the email"""
+    digest = hmac.new(NAME_SECRET.encode(), user_id.encode(), hashlib.sha256).hexdigest()
+    return f"player-{digest[:10]}"
+
+
+def _today() -> date:
+    return date.today()
+
+
+def live_streak(streak: int, last_active: Optional[str], today: date = None) -> int:
+    """`streak` if it can still be continued (last active today or yesterday), else 0"""
+    if last_active is None:
+        return streak
+    yesterday = (today or _today()) - timedelta(days=1)
+    return streak if last_active >= yesterday.isoformat() else 0
+
+
+def _parse(row) -> Tuple[str, int, int, Optional[str]]:
+    # Journals written before last_active was recorded have three fields
+    user_id, xp, streak, *rest = row
+    return user_id, xp, streak, rest[0] if rest else None
+
+
+class Leaderboard:
+    def __init__(self, path: Optional[str] = LEADERBOARD_FILE):
+        # path=None keeps the index in memory only (tests, benchmarks)
+        self.path = path
+        # Ranked (xp, live streak), and the raw (xp, streak, last_active) as journaled
+        self.scores: Dict[str, Tuple[int, int]] = {}
+        self.rows: Dict[str, Tuple[int, int, Optional[str]]] = {}
+        self._swept = None
+        self._index = {metric: SortedList() for metric in METRICS}
+        self._lines = 0
+        self._offset = 0
+        self._inode = None
+        self._lock = threading.RLock()
+        self.refresh()
+
+    # -------------------- INDEX --------------------
+    def _index_scores(self, user_id: str, scores: Tuple[int, int]):
+        old = self.scores.get(user_id)
+        if old == scores:
+            return
+        for position, metric in enumerate(METRICS):
+            index = self._index[metric]
+            if old is not None:
+                index.remove((-old[position], user_id))
+            index.add((-scores[position], user_id))
+        self.scores[user_id] = scores
+
+    def _apply(self, user_id: str, xp: int, streak: int, last_active: Optional[str] = None):
+        self.rows[user_id] = (xp, streak, last_active)
+        self._index_scores(user_id, (xp, live_streak(streak, last_active)))
+
+    def _sweep(self):
+        """Once a day: streaks that lapsed since they were last updated drop to 0"""
+        today = _today()
+        if self._swept == today:
+            return
+        self._swept = today
+        for user_id, (xp, streak, last_active) in self.rows.items():
+            if streak and live_streak(streak, last_active, today) != self.scores[user_id][1]:
+                self._index_scores(user_id, (xp, live_streak(streak, last_active, today)))
+
+    def load(self, rows: Iterable[Tuple]):
+        """Bulk (re)build from (user_id, xp, streak[, last_active]) rows; O(n log n) once"""
+        with self._lock:
+            today = _today()
+            self.rows = {user_id: (xp, streak, last_active) for user_id, xp, streak, last_active in map(_parse, rows)}
+            self.scores = {
+                user_id: (xp, live_streak(streak, last_active, today))
+                for user_id, (xp, streak, last_active) in self.rows.items()
+            }
+            self._swept = today
+            for position, metric in enumerate(METRICS):
+                self._index[metric] = SortedList(
+                    (-scores[position], user_id) for user_id, scores in self.scores.items()
+                )
+
+    # -------------------- JOURNAL --------------------
+    def _read_from(self, offset: int) -> List[Tuple]:
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            data = f.read()
+        # A line still being appended by another worker is picked up next time
+        end = data.rfind(b"\n") + 1
+        self._offset = offset + end
+        rows = []
+        for line in data[:end].splitlines():
+            try:
+                rows.append(_parse(json.loads(line)))
+            except ValueError:
+                continue
+        self._lines += len(rows)
+        return rows
+
+    def refresh(self):
+        """Replay journal lines written (by any worker) since the last call"""
+        if self.path is None:
+            return
+        with self._lock:
+            try:
+                st = os.stat(self.path)
+            except FileNotFoundError:
+                return
+            if st.st_ino != self._inode:
+                # New or compacted journal: rebuild from scratch
+                self._inode, self._offset, self._lines = st.st_ino, 0, 0
+                rows = self._read_from(0)
+                latest = {row[0]: row for row in rows}
+                self.load(latest.values())
+            elif st.st_size > self._offset:
+                for row in self._read_from(self._offset):
+                    self._apply(*row)
+
+    def update(self, user_id: str, xp: int, streak: int, last_active: Optional[str] = None):
+        """Record a user's current totals; last_active ("YYYY-MM-DD") lets the streak lapse"""
+        with self._lock:
+            if self.path is None:
+                self._apply(user_id, xp, streak, last_active)
+                return
+            self.refresh()
+            if self.rows.get(user_id) == (xp, streak, last_active):
+                return
+            with file_lock(self.path):
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps([user_id, xp, streak, last_active]) + "\n")
+                self.refresh()
+                if self._lines > max(COMPACT_RATIO * len(self.scores), MIN_COMPACT_LINES):
+                    self._compact()
+
+    def _compact(self):
+        """Rewrite the journal as one line per user; caller holds the file lock"""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".leaderboard-")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                for user_id, (xp, streak, last_active) in self.rows.items():
+                    f.write(json.dumps([user_id, xp, streak, last_active]) + "\n")
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        st = os.stat(self.path)
+        self._inode, self._offset, self._lines = st.st_ino, st.st_size, len(self.scores)
+
+    def backfill(self, rows: Iterable[Tuple]) -> bool:
+        """Seed an empty journal from existing per-user data; False if there is one already"""
+        if self.path is None:
+            self.load(rows)
+            return True
+        with self._lock, file_lock(self.path):
+            if os.path.exists(self.path):
+                return False
+            latest = {row[0]: row for row in map(_parse, rows)}
+            with open(self.path, "w", encoding="utf-8") as f:
+                for row in latest.values():
+                    f.write(json.dumps(list(row)) + "\n")
+            self.refresh()
+        return True
+
+    # -------------------- QUERIES --------------------
+    def _row(self, rank: int, user_id: str) -> Dict:
+        xp, streak = self.scores[user_id]
+        return {"rank": rank, "user": display_name(user_id), "xp": xp, "streak": streak}
+
+    def __len__(self) -> int:
+        return len(self.scores)
+
+    def top(self, metric: str = "xp", limit: int = 10) -> List[Dict]:
+        """The first `limit` users; ties share a rank"""
+        with self._lock:
+            self.refresh()
+            self._sweep()
+            index = self._index[metric]
+            return [self._row(self._rank(index, -key[0]), key[1]) for key in index[:limit]]
+
+    @staticmethod
+    def _rank(index: SortedList, score: int) -> int:
+        # 1 + number of users with a strictly higher score
+        return index.bisect_left((-score,)) + 1
+
+    def rank(self, user_id: str, metric: str = "xp") -> Optional[int]:
+        with self._lock:
+            self.refresh()
+            self._sweep()
+            scores = self.scores.get(user_id)
+            if scores is None:
+                return None
+            return self._rank(self._index[metric], scores[METRICS.index(metric)])
+
+    def around(self, user_id: str, metric: str = "xp", radius: int = 5) -> List[Dict]:
+        """The user and up to `radius` neighbours on each side"""
+        with self._lock:
+            self.refresh()
+            self._sweep()
+            scores = self.scores.get(user_id)
+            if scores is None:
+                return []
+            index = self._index[metric]
+            position = index.bisect_left((-scores[METRICS.index(metric)], user_id))
+            window = index[max(0, position - radius):position + radius + 1]
+            rows = []
+            for key in window:
+                row = self._row(self._rank(index, -key[0]), key[1])
+                if key[1] == user_id:
+                    row["you"] = True
+                rows.append(row)
+            return rows
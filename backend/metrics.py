@@ -0,0 +1,216 @@
+"""
+In-process metrics with Prometheus text-format output.
+
+No external service or client library: counters, gauges and histograms live in this
+process and `/metrics` renders them on demand. Under gunicorn each worker
+keeps its own numbers, so scrape each worker or sum them in Prometheus.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labelnames, values, extra=()) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    pairs += [f'{name}="{_escape(value)}"' for name, value in extra]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels) -> tuple:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def render(self):
+        # Snapshot under the lock: a new label set mid-scrape would break iteration
+        with self._lock:
+            values = list(self._values.items())
+        for key, value in sorted(values):
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # key -> [bucket counts..., sum, count]
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels) -> tuple:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the wall-clock duration of the `with` block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels) -> int:
+        series = self._values.get(self._key(labels))
+        return series[-1] if series else 0
+
+    def render(self):
+        # Copy each series too, so its buckets, sum and count agree
+        with self._lock:
+            values = [(key, list(series)) for key, series in self._values.items()]
+        for key, series in sorted(values):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, series):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, [("le", _format_value(bound))])
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {_format_value(series[-2])}"
+            yield f"{self.name}_count{labels} {series[-1]}"
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric already registered: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labelnames=()) -> Counter:
+        return self._register(Counter(name, help, labelnames))
+
+    def gauge(self, name: str, help: str, labelnames=()) -> Gauge:
+        return self._register(Gauge(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, labelnames, buckets))
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+# -------------------- PLAN PIPELINE --------------------
+PLAN_STAGE_SECONDS = registry.histogram(
+    "plan_stage_duration_seconds",
+    "Time spent in each stage of /generate-plan.",
+    ["stage"],
+)
+PLAN_LLM_RETRIES = registry.counter(
+    "plan_llm_retries_total",
+    "LLM attempts beyond the first for a single task.",
+)
+PLAN_FALLBACKS = registry.counter(
+    "plan_fallbacks_total",
+    "Tasks answered with the generic fallback steps.",
+)
+PLAN_VALIDATION_FAILURES = registry.counter(
+    "plan_validation_failures_total",
+    "Rejected user inputs and LLM outputs.",
+    ["kind"],
+)
+PLAN_SALVAGED_OUTPUTS = registry.counter(
+    "plan_salvaged_outputs_total",
+    "LLM outputs accepted after repair instead of being retried.",
+)
+PLAN_CACHE_LOOKUPS = registry.counter(
+    "plan_cache_lookups_total",
+    "Plan cache lookups before calling the LLM.",
+    ["result"],
+)
+PLAN_TIER_ANSWERS = registry.counter(
+    "plan_tier_answers_total",
+    "Tasks answered by each tier of the plan router (cache, template, llm, fallback).",
+    ["tier"],
+)
+
+# -------------------- ADMISSION --------------------
+ADMISSION_QUEUE_DEPTH = registry.gauge(
+    "admission_queue_depth",
+    "LLM-bound requests admitted and waiting for their rate-limit slot.",
+)
+ADMISSION_WAIT_SECONDS = registry.histogram(
+    "admission_wait_seconds",
+    "Time admitted requests waited for a rate-limit slot.",
+    buckets=(0.0, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+ADMISSION_REJECTIONS = registry.counter(
+    "admission_rejections_total",
+    "Requests shed with 429 before reaching the LLM.",
+    ["reason"],
+)
+
+# -------------------- HTTP --------------------
+HTTP_REQUEST_SECONDS = registry.histogram(
+    "http_request_duration_seconds",
+    "Request latency per endpoint.",
+    ["method", "path", "status"],
+)
@@ -1,13 +1,101 @@
+import re
+
+MAX_STEPS = 6
+MAX_WORDS = 12
+# Below this the salvaged list is not worth showing; ask the LLM again
+MIN_QUALITY = 0.5
+# Without list markers, fewer lines than this is more likely chatter than a plan
+MIN_UNMARKED_STEPS = 2
+
+# "1." "1)" "1:" "(1)" "Step 1:" "Step 1 -" and bullets "-" "*" "•"
+_LIST_MARKER = re.compile(
+    r"^(?:(?:step\s*)?\(?(\d{1,2})\s*[.):\-]|[-*•·–])\s*",
+    re.IGNORECASE,
+)
+_SPLIT_ON = re.compile(r";\s+|,?\s+and then\s+|,?\s+then\s+", re.IGNORECASE)
+# Refusals, apologies and pleasantries are not steps
+_CHATTER = re.compile(
+    r"^(?:i\b|i'm\b|i’m\b|sorry\b|sure\b|of course\b|here\b|as an\b|unfortunately\b|"
+    r"you\b|you're\b|let me\b|feel free\b|hope\b|good luck\b|note\b|please note\b)",
+    re.IGNORECASE,
+)
+
+
 def is_valid_output(text):
-    lines = [l.strip() for l in text.strip().split("\n") if l.strip()]
+    """True if parse_steps would use this answer without asking again"""
+    return parse_steps(text)[1] >= MIN_QUALITY
+
+
+def _clean_step(text):
+    text = text.strip().strip("*_`\"'").strip()
+    return text
+
+
+def parse_steps(text, max_steps: int = MAX_STEPS, max_words: int = MAX_WORDS):
+    """
+    Salvage a step list from an LLM response in one pass.
+
+    Accepts numbering variants ("1.", "1)", "Step 1:", bullets), skips
+    preambles like "Here are your steps:", splits over-long lines at
+    "; " / "then" when the pieces fit, and drops what can't be saved.
+    Returns (steps, quality) where quality is 1.0 for a perfectly formatted
+    answer and falls with every repair; callers retry below MIN_QUALITY.
+    """
+    steps = []
+    unmarked = []
+    penalty = 0.0
+    expected_number = 1
+
+    for raw_line in (text or "").splitlines():
+        line = raw_line.strip().lstrip("#").strip()
+        if not line:
+            continue
+        line = line.replace("**", "")
+
+        match = _LIST_MARKER.match(line)
+        if not match:
+            # Preamble before the list, or chatter after it
+            unmarked.append(line)
+            penalty += 0.05
+            continue
+
+        number = match.group(1)
+        if number is None or int(number) != expected_number or not line.startswith(f"{number}."):
+            penalty += 0.02
+        expected_number += 1
+
+        step = _clean_step(line[match.end():])
+        if not step:
+            penalty += 0.05
+            continue
+
+        if len(step.split()) <= max_words:
+            steps.append(step)
+            continue
+
+        parts = [p for p in (_clean_step(p) for p in _SPLIT_ON.split(step)) if p]
+        if len(parts) > 1 and all(len(p.split()) <= max_words for p in parts):
+            steps.extend(p[0].upper() + p[1:] for p in parts)
+            penalty += 0.1
+        else:
+            penalty += 0.2
 
-    if len(lines) == 0 or len(lines) > 8:
-        return False
+    if not steps and unmarked:
+        # No list markers at all: treat short plain lines as steps
+        steps = [
+            step for step in (_clean_step(line) for line in unmarked)
+            if step and not step.endswith((":", "?")) and not _CHATTER.match(step)
+            and len(step.split()) <= max_words
+        ]
+        penalty = 0.3 + 0.05 * (len(unmarked) - len(steps))
+        if len(steps) < MIN_UNMARKED_STEPS:
+            # A lone sentence is not worth showing as a plan; ask again
+            penalty += 0.5
 
-    for i, line in enumerate(lines, start=1):
-        if not line.startswith(f"{i}."):
-            return False
-        if len(line.split()) > 12:
-            return False
+    if len(steps) > max_steps:
+        penalty += 0.1 * (len(steps) - max_steps)
+        steps = steps[:max_steps]
 
-    return True
+    if not steps:
+        return [], 0.0
+    return steps, round(max(0.0, 1.0 - penalty), 2)
@@ -0,0 +1,151 @@
+"""
+Per-user history partitions.
+
+Each authenticated user gets their own TaskHistory under
+HISTORY_PARTITION_DIR (default `history/`), named by user_file_name()
+(a hash of the user id): `<name>.json` for the hot
+window, plus its own `.archive/` segments, `.columns/` analytics columns and
+`.rollups.json` daily/weekly totals. Searches, recent-window queries,
+exports and analytics therefore only ever touch the caller's own files, and
+cost grows with that user's history, not with the whole deployment.
+
+Partitions are opened lazily and kept in an LRU of HISTORY_MAX_OPEN_PARTITIONS
+per worker. Evicting one just drops the in-memory copy; everything is on
+disk and shared with the other workers through the usual file locks.
+Backfills (e.g. energy profiles) run when a partition is opened, not for
+every user at startup. The nightly cache warmer reads every user's hot JSON
+through iter_hot_entries(), which opens no TaskHistory and writes nothing.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Iterator, List
+
+from backend.analytics import SmartAnalytics
+from backend.history import TaskHistory
+from backend.retention import HOT_DAYS
+from backend.rollups import AnalyticsRollups
+from backend.shared_state import file_lock, user_file_name
+
+PARTITION_DIR = os.getenv("HISTORY_PARTITION_DIR", "history")
+MAX_OPEN_PARTITIONS = int(os.getenv("HISTORY_MAX_OPEN_PARTITIONS", "256"))
+
+# Partitions used to be named by the email itself; see _adopt_legacy
+_LEGACY_NAME = re.compile(r"[A-Za-z0-9_.@+-]{1,64}")
+_SUFFIXES = (".json", ".rollups.json", ".archive", ".columns")
+
+
+def _legacy_name(user_id: str) -> str:
+    if _LEGACY_NAME.fullmatch(user_id) and not user_id.startswith("."):
+        return user_id
+    return hashlib.sha1(user_id.encode()).hexdigest()[:16]
+
+
+class UserPartition:
+    """One user's history with its rollups and analytics"""
+    __slots__ = ("user_id", "history", "rollups", "analytics")
+
+    def __init__(self, user_id: str, base: str, hot_days: float, listeners: Iterable,
+                 backfills: Iterable[Callable] = ()):
+        self.user_id = user_id
+        self.history = TaskHistory(base + ".json", hot_days, user_id=user_id)
+        self.rollups = AnalyticsRollups(base + ".rollups.json")
+        self.rollups.backfill(self.history.iter_entries())
+        self.history.add_listener(self.rollups)
+        for backfill in backfills:
+            backfill(self.history.iter_entries(), user_id)
+        for listener in listeners:
+            self.history.add_listener(listener)
+        self.analytics = SmartAnalytics(self.history)
+
+
+class HistoryPartitions:
+    def __init__(self, directory: str = PARTITION_DIR, hot_days: float = HOT_DAYS,
+                 max_open: int = MAX_OPEN_PARTITIONS):
+        self.directory = directory
+        self.hot_days = hot_days
+        self.max_open = max_open
+        # Shared listeners (e.g. energy profiles) registered on every partition
+        self.listeners = []
+        # backfill(entries, user_id) run on each partition as it is opened
+        self.backfills = []
+        self._open = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def add_listener(self, listener):
+        """Register on every partition, open or not yet opened"""
+        with self._lock:
+            self.listeners.append(listener)
+            for partition in self._open.values():
+                partition.history.add_listener(listener)
+
+    def add_backfill(self, backfill: Callable):
+        """Run `backfill(entries, user_id)` with each partition's history when it is opened"""
+        with self._lock:
+            self.backfills.append(backfill)
+
+    def _base(self, user_id: str) -> str:
+        return os.path.join(self.directory, user_file_name(user_id))
+
+    def _adopt_legacy(self, user_id: str, base: str):
+        """Rename a partition from the old email-named layout to `base`"""
+        legacy = os.path.join(self.directory, _legacy_name(user_id))
+        if os.path.exists(base + ".json") or not os.path.exists(legacy + ".json"):
+            return
+        with file_lock(legacy + ".json"):
+            try:
+                with open(legacy + ".json", encoding="utf-8") as f:
+                    hot = json.load(f)
+            except (OSError, ValueError):
+                return
+            # Only a history file is a list; "<email>.json" may be another user's rollups
+            if not isinstance(hot, list) or os.path.exists(base + ".json"):
+                return
+            for suffix in _SUFFIXES:
+                if os.path.exists(legacy + suffix):
+                    os.replace(legacy + suffix, base + suffix)
+
+    def get(self, user_id: str) -> UserPartition:
+        with self._lock:
+            partition = self._open.get(user_id)
+            if partition is not None:
+                self._open.move_to_end(user_id)
+                return partition
+            base = self._base(user_id)
+            self._adopt_legacy(user_id, base)
+            partition = UserPartition(user_id, base, self.hot_days, self.listeners, self.backfills)
+            self._open[user_id] = partition
+            while len(self._open) > self.max_open:
+                self._open.popitem(last=False)
+            return partition
+
+    def paths(self) -> List[str]:
+        """Hot-window history file of every partition on disk"""
+        return sorted(
+            os.path.join(self.directory, name) for name in os.listdir(self.directory)
+            if name.endswith(".json") and not name.endswith(".rollups.json")
+            and os.path.isfile(os.path.join(self.directory, name))
+        )
+
+    def iter_hot_entries(self, since: str = None) -> Iterator[Dict]:
+        """
+        Entries in every partition's hot window (optionally from ISO timestamp
+        `since` on), read straight from the JSON files: for offline jobs only,
+        as the cost grows with the whole deployment.
+        """
+        for path in self.paths():
+            try:
+                with open(path, encoding="utf-8") as f:
+                    entries = json.load(f)
+            except (OSError, ValueError):
+                continue
+            for entry in entries:
+                if since is None or entry["timestamp"] >= since:
+                    yield entry
+
+    def __len__(self) -> int:
+        return len(self._open)
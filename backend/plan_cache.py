@@ -0,0 +1,68 @@
+import re
+import time
+from typing import Dict, List, Optional
+
+from backend.shared_state import SharedJSONFile
+
+PLAN_CACHE_FILE = "plan_cache.json"
+MAX_ENTRIES = 5000
+TTL_DAYS = 30
+
+
+def normalize_task(task: str) -> str:
+    """'  Clean  my Room! ' -> 'clean my room' so trivial variants share a plan"""
+    task = re.sub(r"[^\w\s']", " ", task.lower())
+    return " ".join(task.split())
+
+
+class PlanCache:
+    """
+    Step lists keyed by (normalized task, mood), shared across workers.
+
+    Filled by the planner after a good LLM answer and by the off-peak cache
+    warmer; read by the planner before it calls the LLM.
+    """
+
+    def __init__(self, path: str = PLAN_CACHE_FILE, max_entries: int = MAX_ENTRIES,
+                 ttl_days: int = TTL_DAYS):
+        self.store = SharedJSONFile(path, dict, ensure_ascii=False)
+        self.max_entries = max_entries
+        self.ttl = ttl_days * 86400
+
+    @staticmethod
+    def key(task: str, mood: str) -> str:
+        return f"{mood}|{normalize_task(task)}"
+
+    def get(self, task: str, mood: str) -> Optional[List[str]]:
+        self.store.refresh()
+        item = self.store.data.get(self.key(task, mood))
+        if not item or time.time() - item["updated_at"] > self.ttl:
+            return None
+        return list(item["steps"])
+
+    def __len__(self) -> int:
+        self.store.refresh()
+        return len(self.store.data)
+
+    def __contains__(self, key: str) -> bool:
+        self.store.refresh()
+        item = self.store.data.get(key)
+        return bool(item) and time.time() - item["updated_at"] <= self.ttl
+
+    def put(self, task: str, mood: str, steps: List[str], source: str = "llm"):
+        self.put_many([(task, mood, steps)], source=source)
+
+    def put_many(self, plans, source: str = "llm"):
+        """Store (task, mood, steps) tuples with a single file write"""
+        now = time.time()
+        with self.store.transaction() as data:
+            for task, mood, steps in plans:
+                data[self.key(task, mood)] = {"steps": list(steps), "source": source, "updated_at": now}
+            self._evict(data)
+
+    def _evict(self, data: Dict):
+        if len(data) <= self.max_entries:
+            return
+        oldest = sorted(data, key=lambda k: data[k]["updated_at"])
+        for key in oldest[:len(data) - self.max_entries]:
+            del data[key]
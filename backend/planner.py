@@ -0,0 +1,251 @@
+import os
+
+from groq import RateLimitError
+
+from backend.input_validator import is_valid_input
+from backend.output_validator import parse_steps, MIN_QUALITY
+from backend.task_utils import split_tasks, prioritize_tasks
+from backend.rag_patterns import get_task_pattern
+from backend.step_templates import StepTemplates
+from backend.empathy import EmpathyEngine
+from backend.deadline import Deadline, MIN_LLM_SECONDS
+from backend.metrics import (
+    PLAN_STAGE_SECONDS, PLAN_LLM_RETRIES, PLAN_FALLBACKS, PLAN_VALIDATION_FAILURES,
+    PLAN_SALVAGED_OUTPUTS, PLAN_CACHE_LOOKUPS, PLAN_TIER_ANSWERS,
+)
+
+MODEL = "llama-3.1-8b-instant"
+MAX_TASKS = 3  # anti-overwhelm
+MAX_ATTEMPTS = 3
+FALLBACK_STEPS = ["Break task into smaller parts.", "Start with the first part."]
+INVALID_INPUT = "Invalid input. Please provide simple actionable tasks."
+TIERS = ("cache", "template", "llm")
+# Routing policy: the first tier in this list that has an answer wins, e.g.
+# "cache,llm,template" keeps templates for when Groq is unavailable only
+PLAN_TIERS = tuple(
+    tier for tier in (t.strip() for t in os.getenv("PLAN_TIERS", ",".join(TIERS)).split(","))
+    if tier in TIERS
+)
+
+
+class InvalidInputError(ValueError):
+    """User input is not a simple actionable task list"""
+
+
+def _retry_after(error) -> float:
+    try:
+        return float(error.response.headers.get("retry-after", 1))
+    except (AttributeError, TypeError, ValueError):
+        return 1.0
+
+
+class PlanGenerator:
+    """
+    The /generate-plan pipeline without the HTTP layer: validate, split and
+    prioritize, read the mood, then get steps per task from the plan cache,
+    the offline templates or the LLM, in PLAN_TIERS order.
+    Shared by the single-request endpoint and the batch API.
+    """
+
+    def __init__(self, client, empathy: EmpathyEngine = None, rate_limiter=None, cache=None,
+                 templates: StepTemplates = None, tiers=PLAN_TIERS, prepaid_first_call: bool = False):
+        self.client = client
+        self.empathy = empathy or EmpathyEngine()
+        # Optional TokenBucket every LLM call takes a token from; also honours Retry-After
+        self.rate_limiter = rate_limiter
+        # Admission already reserved each task's first call (see llm_calls); only retries wait here
+        self.prepaid_first_call = prepaid_first_call
+        # Optional PlanCache consulted before the LLM and filled after it
+        self.cache = cache
+        # Optional offline generator; also the last resort when the LLM can't answer
+        self.templates = templates
+        # Order in which tiers get a chance to answer a task (see PLAN_TIERS)
+        self.tiers = tuple(tiers)
+
+    def build_prompt(self, task: str, sentiment: dict) -> str:
+        pattern = get_task_pattern(task)
+
+        # Inject Mood Instruction
+        return (
+            "You are an executive-function assistant for neurodivergent users.\n\n"
+            f"User Mood Context: {sentiment['instruction']}\n\n"
+            f"{pattern}\n\n"
+            "Rules:\n"
+            "- Output ONLY a numbered list\n"
+            "- Maximum 6 steps\n"
+            "- One action per line\n"
+            "- Each sentence under 12 words\n"
+            "- No explanations\n"
+            "- No emojis\n"
+            "- No extra text"
+        )
+
+    def generate_steps(self, task: str, sentiment: dict, deadline: Deadline = None) -> list:
+        """Steps for one task from the first tier that answers, fallback if none does"""
+        return self._generate_steps(task, sentiment, deadline)[0]
+
+    def routes_to_template(self, task: str) -> bool:
+        """True if the template tier answers this task before the LLM would be asked"""
+        if self.templates is None or "template" not in self.tiers:
+            return False
+        if "llm" in self.tiers and self.tiers.index("llm") < self.tiers.index("template"):
+            return False
+        return self.templates.match(task) is not None
+
+    def _answered_before_llm(self, task: str, mood: str) -> bool:
+        for tier in self.tiers:
+            if tier == "llm":
+                return False
+            if tier == "cache" and self.cache is not None and self.cache.key(task, mood) in self.cache:
+                return True
+            if tier == "template" and self.templates is not None and self.templates.match(task) is not None:
+                return True
+        return True
+
+    def llm_calls(self, user_input: str) -> int:
+        """
+        First LLM calls plan() will make for this input: one per task that the
+        cache or templates don't answer first. Raises InvalidInputError like plan().
+        """
+        user_input = user_input.strip()
+        if not is_valid_input(user_input):
+            raise InvalidInputError(INVALID_INPUT)
+        if self.client is None or "llm" not in self.tiers:
+            return 0
+        mood = self.empathy.analyze_sentiment(user_input)["mood"]
+        return sum(1 for task in split_tasks(user_input)[:MAX_TASKS] if not self._answered_before_llm(task, mood))
+
+    def _generate_steps(self, task: str, sentiment: dict, deadline: Deadline = None):
+        """(steps, in_time): in_time is False if the deadline cut the LLM attempts short"""
+        in_time = True
+        best_steps = []
+        tiers = self.tiers
+        if self.templates is not None and "template" not in tiers:
+            # Disabled as a tier, still better than the generic fallback
+            tiers = tiers + ("template",)
+        for tier in tiers:
+            if tier == "cache" and self.cache is not None:
+                steps = self.cache.get(task, sentiment["mood"])
+                PLAN_CACHE_LOOKUPS.inc(result="hit" if steps else "miss")
+            elif tier == "template" and self.templates is not None:
+                steps = self.templates.generate(task, sentiment["mood"])
+            elif tier == "llm" and self.client is not None:
+                steps, best_steps, in_time = self._llm_steps(task, sentiment, deadline)
+            else:
+                continue
+            if steps:
+                PLAN_TIER_ANSWERS.inc(tier=tier)
+                return steps, in_time
+
+        if best_steps:
+            # Out of attempts: a rough list still beats the generic fallback
+            PLAN_TIER_ANSWERS.inc(tier="llm")
+            return best_steps, in_time
+        PLAN_TIER_ANSWERS.inc(tier="fallback")
+        PLAN_FALLBACKS.inc()
+        return list(FALLBACK_STEPS), in_time
+
+    def _llm_steps(self, task: str, sentiment: dict, deadline: Deadline = None):
+        """(steps or None, best rough steps, in_time) from up to MAX_ATTEMPTS LLM calls"""
+        system_prompt = self.build_prompt(task, sentiment)
+        steps = None
+        best_steps, best_quality = [], 0.0
+        in_time = True
+
+        for attempt in range(MAX_ATTEMPTS):
+            if deadline is not None and not deadline.allows_llm_call():
+                in_time = False
+                break
+            if attempt:
+                PLAN_LLM_RETRIES.inc()
+            try:
+                if not self.client:
+                    raise Exception("No API Key")
+
+                if self.rate_limiter and (attempt or not self.prepaid_first_call):
+                    # Never wait for a token the call would have no time left to use
+                    limit = deadline.remaining() - MIN_LLM_SECONDS if deadline is not None else None
+                    if not self.rate_limiter.wait(max_wait=limit):
+                        in_time = False
+                        break
+                # The call may not outlive the request's budget
+                timeout = {"timeout": deadline.remaining()} if deadline is not None else {}
+                with PLAN_STAGE_SECONDS.time(stage="llm_attempt"):
+                    response = self.client.chat.completions.create(
+                        model=MODEL,
+                        messages=[
+                            {"role": "system", "content": system_prompt},
+                            {"role": "user", "content": task},
+                        ],
+                        temperature=0.2,
+                        max_tokens=120,
+                        **timeout
+                    )
+                output = response.choices[0].message.content
+                with PLAN_STAGE_SECONDS.time(stage="parse_output"):
+                    parsed, quality = parse_steps(output)
+                if quality > best_quality:
+                    best_steps, best_quality = parsed, quality
+                # Near-valid answers are repaired, not re-requested
+                if quality >= MIN_QUALITY:
+                    if quality < 1.0:
+                        PLAN_SALVAGED_OUTPUTS.inc()
+                    steps = parsed
+                    if self.cache is not None:
+                        self.cache.put(task, sentiment["mood"], steps)
+                    break
+                PLAN_VALIDATION_FAILURES.inc(kind="output")
+            except RateLimitError as e:
+                print(f"LLM rate limited: {e}")
+                if not self.rate_limiter:
+                    break
+                self.rate_limiter.backoff(_retry_after(e))
+            except Exception as e:
+                print(f"LLM Error: {e}")
+                if deadline is not None and not deadline.allows_llm_call():
+                    in_time = False  # most likely our own timeout
+                break
+
+        return steps, best_steps, in_time
+
+    def plan(self, user_input: str, deadline: Deadline = None) -> dict:
+        """
+        Full plan for one input; raises InvalidInputError for non-tasks.
+        With a deadline, tasks it cuts short get fallback steps and `partial` is True.
+        """
+        user_input = user_input.strip()
+
+        with PLAN_STAGE_SECONDS.time(stage="is_valid_input"):
+            valid_input = is_valid_input(user_input)
+        if not valid_input:
+            PLAN_VALIDATION_FAILURES.inc(kind="input")
+            raise InvalidInputError(INVALID_INPUT)
+
+        # Logic
+        with PLAN_STAGE_SECONDS.time(stage="split_prioritize"):
+            tasks = split_tasks(user_input)
+            tasks = tasks[:MAX_TASKS]
+            prioritized_tasks = prioritize_tasks(tasks)
+
+        # Empathy Check
+        with PLAN_STAGE_SECONDS.time(stage="analyze_sentiment"):
+            sentiment = self.empathy.analyze_sentiment(user_input)
+
+        results = []
+        partial = False
+        for task in prioritized_tasks:
+            steps, in_time = self._generate_steps(task, sentiment, deadline)
+            partial = partial or not in_time
+            results.append({
+                "task": task,
+                "current_step": steps[0],
+                "next_step_index": 1,
+                "total_steps": len(steps),
+                "all_steps": steps
+            })
+
+        return {
+            "plan": results,
+            "mood": sentiment['mood'],
+            "partial": partial
+        }
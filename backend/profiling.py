@@ -0,0 +1,190 @@
+"""
+Opt-in per-request profiling.
+
+Set PROFILE_ADMIN_TOKEN to enable it, then send that token in the
+`X-Profile-Token` header (or `?profile=<token>`) on the request you want to
+inspect. The request runs under a sampling profiler and its stacks are saved to
+PROFILE_DIR in collapsed-stack format, ready for flamegraph.pl / speedscope:
+
+    flamegraph.pl profiles/<id>.folded > request.svg
+
+Without the env var the middleware is never installed, so there is no
+per-request cost at all.
+"""
+import hmac
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Request
+from fastapi.responses import PlainTextResponse
+
+PROFILE_TOKEN = os.getenv("PROFILE_ADMIN_TOKEN")
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "20"))
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL_MS", "2")) / 1000
+PROFILE_HEADER = "X-Profile-Token"
+
+APP_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    filename = code.co_filename
+    if filename.startswith(APP_ROOT):
+        filename = os.path.relpath(filename, APP_ROOT)
+    else:
+        filename = os.path.basename(filename)
+    # ';' separates frames in the collapsed format
+    return f"{code.co_name} ({filename})".replace(";", ":")
+
+
+class SamplingProfiler:
+    """
+    Samples the stacks of every other thread at a fixed interval.
+
+    Sync endpoints run in a threadpool thread we can't name in advance, so we
+    keep only stacks that pass through our own `backend/` code; idle worker
+    threads and the event loop's select() drop out. Concurrent requests on the
+    same worker will show up too.
+    """
+
+    def __init__(self, interval: float = PROFILE_INTERVAL):
+        self.interval = interval
+        self.stacks = {}
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self) -> dict:
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+    def _run(self):
+        own_ident = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                stack = []
+                in_app = False
+                while frame is not None:
+                    if frame.f_code.co_filename.startswith(BACKEND_DIR):
+                        in_app = True
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                if not in_app:
+                    continue
+                key = ";".join(reversed(stack))
+                self.stacks[key] = self.stacks.get(key, 0) + 1
+                self.samples += 1
+
+
+class ProfileStore:
+    """Collapsed-stack files on disk plus a ring buffer of the most recent ones"""
+
+    def __init__(self, directory: str = PROFILE_DIR, keep: int = PROFILE_KEEP):
+        self.directory = directory
+        self.recent = deque(maxlen=keep)
+        self._lock = threading.Lock()
+
+    def save(self, method: str, path: str, duration: float, profiler: SamplingProfiler) -> dict:
+        os.makedirs(self.directory, exist_ok=True)
+        profile_id = uuid.uuid4().hex[:12]
+        filename = os.path.join(self.directory, f"{profile_id}.folded")
+        with open(filename, "w", encoding="utf-8") as f:
+            for stack, count in sorted(profiler.stacks.items()):
+                f.write(f"{stack} {count}\n")
+
+        record = {
+            "id": profile_id,
+            "method": method,
+            "path": path,
+            "started_at": datetime.now().isoformat(),
+            "duration_ms": round(duration * 1000, 2),
+            "samples": profiler.samples,
+            "file": filename,
+        }
+        with self._lock:
+            if len(self.recent) == self.recent.maxlen:
+                evicted = self.recent[0]
+                if os.path.exists(evicted["file"]):
+                    os.remove(evicted["file"])
+            self.recent.append(record)
+        return record
+
+    def list(self) -> list:
+        return list(reversed(self.recent))
+
+    def get(self, profile_id: str) -> Optional[dict]:
+        for record in self.recent:
+            if record["id"] == profile_id:
+                return record
+        return None
+
+
+profile_store = ProfileStore()
+
+
+def _is_admin(token: Optional[str]) -> bool:
+    return bool(PROFILE_TOKEN and token and hmac.compare_digest(token, PROFILE_TOKEN))
+
+
+def install_profiling(app):
+    """Register the profiling middleware; no-op unless PROFILE_ADMIN_TOKEN is set"""
+    if not PROFILE_TOKEN:
+        return
+
+    @app.middleware("http")
+    async def profile_request(request: Request, call_next):
+        if request.url.path.startswith(router.prefix):
+            return await call_next(request)
+        token = request.headers.get(PROFILE_HEADER) or request.query_params.get("profile")
+        if not _is_admin(token):
+            return await call_next(request)
+
+        profiler = SamplingProfiler()
+        start = time.perf_counter()
+        profiler.start()
+        try:
+            response = await call_next(request)
+        finally:
+            profiler.stop()
+            record = profile_store.save(
+                request.method, request.url.path, time.perf_counter() - start, profiler
+            )
+        response.headers["X-Profile-Id"] = record["id"]
+        return response
+
+
+# -------------------- ADMIN ROUTES --------------------
+def require_admin(x_profile_token: Optional[str] = Header(None)):
+    if not _is_admin(x_profile_token):
+        # Hide the endpoints entirely from non-admins and when disabled
+        raise HTTPException(status_code=404, detail="Not Found")
+
+router = APIRouter(prefix="/api/admin/profiles", dependencies=[Depends(require_admin)])
+
+@router.get("")
+def list_profiles():
+    """Most recent request profiles kept by this worker"""
+    return profile_store.list()
+
+@router.get("/{profile_id}", response_class=PlainTextResponse)
+def get_profile(profile_id: str):
+    """Collapsed stacks for one profile"""
+    record = profile_store.get(profile_id)
+    if not record or not os.path.exists(record["file"]):
+        raise HTTPException(status_code=404, detail="Profile not found")
+    with open(record["file"], "r", encoding="utf-8") as f:
+        return PlainTextResponse(f.read())
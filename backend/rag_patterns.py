@@ -1,7 +1,22 @@
-def get_task_pattern(task):
+CATEGORY_KEYWORDS = {
+    "cleaning": ["clean", "organize", "room", "desk"],
+    "studying": ["study", "exam", "prepare", "learn"],
+    "admin": ["email", "reply", "submit", "form"],
+}
+
+def get_task_category(task):
     task = task.lower()
 
-    if any(word in task for word in ["clean", "organize", "room", "desk"]):
+    for category, keywords in CATEGORY_KEYWORDS.items():
+        if any(word in task for word in keywords):
+            return category
+
+    return "general"
+
+def get_task_pattern(task):
+    category = get_task_category(task)
+
+    if category == "cleaning":
         return (
             "Task type: Cleaning\n"
             "- Start with visible items\n"
@@ -10,7 +25,7 @@ def get_task_pattern(task):
             "- Avoid perfection"
         )
 
-    if any(word in task for word in ["study", "exam", "prepare", "learn"]):
+    if category == "studying":
         return (
             "Task type: Studying\n"
             "- Start with materials, not thinking\n"
@@ -19,7 +34,7 @@ def get_task_pattern(task):
             "- Stop before fatigue"
         )
 
-    if any(word in task for word in ["email", "reply", "submit", "form"]):
+    if category == "admin":
         return (
             "Task type: Admin\n"
             "- Open required app first\n"
@@ -0,0 +1,174 @@
+"""
+WebSocket channel for focus mode.
+
+One connection carries step advances, XP awards and pushed stats / level-up
+events, reusing PlanSessionStore.advance and GamificationSystem.add_xp.
+
+Protocol (JSON text frames, every server message has a `seq`):
+
+    -> {"type": "hello", "client_id": "...", "last_seq": 12, "token": "..."}   (all optional)
+    <- {"type": "welcome", "client_id": "...", "resumed": true}
+       ...then any events after last_seq that were missed while offline
+    -> {"type": "next_step", "session_id": "...", "step_index": 2}
+    <- {"type": "step", "session_id": "...", "current_step": ..., ...}
+       finishing a task also awards TASK_XP and pushes "stats" (+ "level_up")
+    -> {"type": "xp", "amount": 50}   1 to MAX_XP_PER_EVENT (one task's worth)
+    -> {"type": "stats"}
+    <> {"type": "ping"} / {"type": "pong"}   heartbeat, both directions
+    <- {"type": "error", "detail": "..."}   bad frame, no hello yet, expired session
+
+The client sends no request/response pairs it has to wait on, so a finished
+task costs no extra round trips. With a valid access token in the hello, XP
+and stats are the user's own (and count on the leaderboard); without one they
+go to the shared anonymous stats. Resume buffers live in this worker only.
+"""
+import asyncio
+import os
+import secrets
+import time
+from collections import deque
+from typing import Callable, Dict, Optional
+
+from fastapi import WebSocket, WebSocketDisconnect
+from starlette.concurrency import run_in_threadpool
+
+from backend.energy_profile import DEFAULT_USER
+from backend.gamification import GamificationSystem, MAX_XP_PER_EVENT, TASK_XP
+from backend.sessions import PlanSessionStore
+
+HEARTBEAT_SECONDS = float(os.getenv("WS_HEARTBEAT_SECONDS", "20"))
+RESUME_TTL = float(os.getenv("WS_RESUME_TTL_SECONDS", "300"))
+RESUME_BUFFER = 100
+
+
+class ClientState:
+    """Events kept for a client id so a reconnect can pick up where it left off"""
+
+    def __init__(self, client_id: str):
+        self.client_id = client_id
+        self.seq = 0
+        self.outbox = deque(maxlen=RESUME_BUFFER)
+        self.websocket: Optional[WebSocket] = None
+        self.last_seen = time.monotonic()
+        self.user_id = DEFAULT_USER
+
+
+class RealtimeHub:
+    def __init__(self, plan_sessions: PlanSessionStore, gamification: GamificationSystem,
+                 identify: Callable[[str], str] = None):
+        self.plan_sessions = plan_sessions
+        self.gamification = gamification
+        # Access token -> user id (DEFAULT_USER if invalid); blocking, runs in the threadpool
+        self.identify = identify
+        self.clients: Dict[str, ClientState] = {}
+
+    def _expire_clients(self):
+        cutoff = time.monotonic() - RESUME_TTL
+        for client_id in [c for c, s in self.clients.items() if s.websocket is None and s.last_seen < cutoff]:
+            del self.clients[client_id]
+
+    async def _send(self, state: ClientState, event: dict):
+        state.seq += 1
+        event = {**event, "seq": state.seq}
+        state.outbox.append(event)
+        if state.websocket is not None:
+            await state.websocket.send_json(event)
+
+    async def _hello(self, websocket: WebSocket) -> ClientState:
+        while True:
+            message = await asyncio.wait_for(websocket.receive_json(), timeout=HEARTBEAT_SECONDS)
+            if isinstance(message, dict) and message.get("type") == "hello":
+                break
+            await websocket.send_json({"type": "error", "detail": "Send a hello first."})
+        self._expire_clients()
+
+        state = self.clients.get(message.get("client_id") or "")
+        resumed = state is not None
+        if state is None:
+            state = ClientState(secrets.token_urlsafe(8))
+            self.clients[state.client_id] = state
+        elif state.websocket is not None:
+            # Same client opened a second socket; the newest one wins
+            try:
+                await state.websocket.close()
+            except RuntimeError:
+                pass
+
+        state.websocket = websocket
+        token = message.get("token")
+        state.user_id = DEFAULT_USER
+        if token and self.identify:
+            state.user_id = await run_in_threadpool(self.identify, str(token))
+        await websocket.send_json({"type": "welcome", "client_id": state.client_id,
+                                   "resumed": resumed, "seq": state.seq})
+        if resumed:
+            last_seq = int(message.get("last_seq") or 0)
+            for event in list(state.outbox):
+                if event["seq"] > last_seq:
+                    await websocket.send_json(event)
+        return state
+
+    async def _award_xp(self, state: ClientState, amount: int):
+        result = await run_in_threadpool(self.gamification.add_xp, amount, state.user_id)
+        await self._send(state, {"type": "stats", **self.gamification.get_stats(state.user_id)})
+        if result["leveled_up"]:
+            await self._send(state, {"type": "level_up", "level": result["level"]})
+
+    async def _dispatch(self, state: ClientState, message):
+        if not isinstance(message, dict):
+            await state.websocket.send_json({"type": "error", "detail": "Messages must be JSON objects."})
+            return
+        kind = message.get("type")
+
+        if kind == "ping":
+            await state.websocket.send_json({"type": "pong"})
+        elif kind == "pong":
+            pass
+        elif kind == "next_step":
+            session_id = str(message.get("session_id", ""))
+            step = await run_in_threadpool(
+                self.plan_sessions.advance, session_id, int(message.get("step_index", 0))
+            )
+            if step is None:
+                await self._send(state, {"type": "error", "session_id": session_id,
+                                         "detail": "Plan session expired."})
+                return
+            task_completed = step.pop("task_completed", False)
+            await self._send(state, {"type": "step", "session_id": session_id, **step})
+            if task_completed:
+                await self._award_xp(state, TASK_XP)
+        elif kind == "xp":
+            amount = message.get("amount")
+            if type(amount) is not int or not 1 <= amount <= MAX_XP_PER_EVENT:
+                await state.websocket.send_json(
+                    {"type": "error", "detail": f"XP amount must be between 1 and {MAX_XP_PER_EVENT}."}
+                )
+                return
+            await self._award_xp(state, amount)
+        elif kind == "stats":
+            await self._send(state, {"type": "stats", **self.gamification.get_stats(state.user_id)})
+        else:
+            await state.websocket.send_json({"type": "error", "detail": f"Unknown message type: {kind}"})
+
+    async def handle(self, websocket: WebSocket):
+        await websocket.accept()
+        state = None
+        try:
+            state = await self._hello(websocket)
+            while True:
+                try:
+                    message = await asyncio.wait_for(websocket.receive_json(), timeout=HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    # Quiet for a whole interval: probe, and give up after a second one
+                    await websocket.send_json({"type": "ping"})
+                    message = await asyncio.wait_for(websocket.receive_json(), timeout=HEARTBEAT_SECONDS)
+                if state.websocket is not websocket:
+                    break  # replaced by a newer connection
+                state.last_seen = time.monotonic()
+                await self._dispatch(state, message)
+        except (WebSocketDisconnect, asyncio.TimeoutError, ValueError, TypeError, RuntimeError):
+            pass
+        finally:
+            if state is not None and state.websocket is websocket:
+                state.websocket = None
+                state.last_seen = time.monotonic()
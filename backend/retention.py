@@ -0,0 +1,187 @@
+"""
+Tiered retention for task history.
+
+TaskHistory keeps only a hot window (HISTORY_HOT_DAYS, default 30) in its
+JSON file and in memory. Older entries are rolled into immutable,
+compressed NDJSON segment files in `<history>.archive/`. The codec is zstd
+if the `zstandard` package is installed, gzip otherwise. `index.json`
+records each segment's id range, time range, entry count and size, so a
+lookup by id or by date only opens the segments it needs. Segments are
+decompressed as a stream, one line at a time, and are never loaded whole
+unless asked for.
+
+Rolling happens once the oldest hot entry is HISTORY_ARCHIVE_EVERY_DAYS
+past the window, so each segment holds about that many days. Deletion
+policy, applied after each roll:
+    HISTORY_ARCHIVE_MAX_DAYS   drop segments whose newest entry is older (0 = keep)
+    HISTORY_ARCHIVE_MAX_MB     drop the oldest segments above this total (0 = no cap)
+Archived entries are read-only: mark_completed only reaches the hot window.
+The highest id ever archived is kept in `state.json`, apart from the
+segments, so ids are never reused after the policy deletes them all.
+"""
+import gzip
+import io
+import json
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from backend.shared_state import SharedJSONFile
+
+try:
+    import zstandard
+except ImportError:  # optional; gzip segments
+    zstandard = None
+
+HOT_DAYS = float(os.getenv("HISTORY_HOT_DAYS", "30"))
+ARCHIVE_EVERY_DAYS = float(os.getenv("HISTORY_ARCHIVE_EVERY_DAYS", "7"))
+ARCHIVE_MAX_DAYS = float(os.getenv("HISTORY_ARCHIVE_MAX_DAYS", "0"))
+ARCHIVE_MAX_MB = float(os.getenv("HISTORY_ARCHIVE_MAX_MB", "0"))
+# Decoded segments kept for repeated lookups by id
+SEGMENT_CACHE_SIZE = 2
+
+
+def _open_segment(path: str):
+    if path.endswith(".zst"):
+        if zstandard is None:
+            raise RuntimeError(f"{path} needs the 'zstandard' package")
+        raw = open(path, "rb")
+        return io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(raw, closefd=True), encoding="utf-8")
+    return gzip.open(path, "rt", encoding="utf-8")
+
+
+def _compress(data: bytes) -> Tuple[bytes, str]:
+    if zstandard is not None:
+        return zstandard.ZstdCompressor(level=10).compress(data), ".zst"
+    return gzip.compress(data, compresslevel=6, mtime=0), ".gz"
+
+
+class SegmentArchive:
+    def __init__(self, directory: str, on_remove: Callable[[List[Dict]], object] = None):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.index = SharedJSONFile(os.path.join(directory, "index.json"), list, indent=1)
+        self.state = SharedJSONFile(os.path.join(directory, "state.json"), dict)
+        # Called with the segments apply_policy deleted
+        self.on_remove = on_remove
+        self._decoded = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def segments(self) -> List[Dict]:
+        self.index.refresh()
+        return self.index.data
+
+    @property
+    def count(self) -> int:
+        return sum(segment["count"] for segment in self.segments)
+
+    @property
+    def last_id(self) -> int:
+        """Highest id ever archived (or noted), even if its segment is gone"""
+        self.state.refresh()
+        segments = self.segments
+        return max(self.state.data.get("last_id", 0), segments[-1]["last_id"] if segments else 0)
+
+    def note_last_id(self, entry_id: int):
+        with self.state.transaction() as state:
+            state["last_id"] = max(state.get("last_id", 0), entry_id)
+
+    # -------------------- WRITES --------------------
+    def write_segment(self, entries: List[Dict]) -> Dict:
+        """Store entries (oldest first) as one new immutable segment"""
+        body = "".join(json.dumps(e, ensure_ascii=False) + "\n" for e in entries).encode("utf-8")
+        compressed, extension = _compress(body)
+        name = f"seg-{entries[0]['id']:010d}-{entries[-1]['id']:010d}.ndjson{extension}"
+        path = os.path.join(self.directory, name)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(compressed)
+        os.replace(tmp_path, path)
+
+        segment = {
+            "file": name,
+            "first_id": entries[0]["id"],
+            "last_id": entries[-1]["id"],
+            "first_ts": entries[0]["timestamp"],
+            "last_ts": entries[-1]["timestamp"],
+            "count": len(entries),
+            "bytes": len(compressed),
+        }
+        with self.index.transaction() as segments:
+            segments.append(segment)
+        self.note_last_id(segment["last_id"])
+        return segment
+
+    def apply_policy(self, max_days: float = ARCHIVE_MAX_DAYS, max_mb: float = ARCHIVE_MAX_MB) -> int:
+        """Delete segments past the age / size limits; returns how many went"""
+        removed = []
+        with self.index.transaction() as segments:
+            if max_days:
+                cutoff = (datetime.now() - timedelta(days=max_days)).isoformat()
+                while segments and segments[0]["last_ts"] < cutoff:
+                    removed.append(segments.pop(0))
+            if max_mb:
+                while segments and sum(s["bytes"] for s in segments) > max_mb * 1024 * 1024:
+                    removed.append(segments.pop(0))
+        for segment in removed:
+            self._remove_file(segment["file"])
+        if removed and self.on_remove:
+            self.on_remove(removed)
+        return len(removed)
+
+    def clear(self):
+        with self.index.transaction() as segments:
+            removed = list(segments)
+            segments.clear()
+        for segment in removed:
+            self._remove_file(segment["file"])
+
+    def _remove_file(self, name: str):
+        with self._lock:
+            self._decoded.pop(name, None)
+        try:
+            os.remove(os.path.join(self.directory, name))
+        except FileNotFoundError:
+            pass
+
+    # -------------------- READS --------------------
+    def iter_segment(self, segment: Dict) -> Iterator[Dict]:
+        """Stream one segment's entries without decoding it all at once"""
+        try:
+            with _open_segment(os.path.join(self.directory, segment["file"])) as f:
+                for line in f:
+                    yield json.loads(line)
+        except FileNotFoundError:
+            return  # deleted by the retention policy meanwhile
+
+    def iter_entries(self, start: str = None, end: str = None) -> Iterator[Dict]:
+        """Archived entries, oldest first, with start <= timestamp < end (ISO strings)"""
+        for segment in list(self.segments):
+            if (start and segment["last_ts"] < start) or (end and segment["first_ts"] >= end):
+                continue
+            for entry in self.iter_segment(segment):
+                if (start and entry["timestamp"] < start) or (end and entry["timestamp"] >= end):
+                    continue
+                yield entry
+
+    def get(self, entry_id: int) -> Optional[Dict]:
+        for segment in self.segments:
+            if segment["first_id"] <= entry_id <= segment["last_id"]:
+                return self._load(segment).get(entry_id)
+        return None
+
+    def _load(self, segment: Dict) -> Dict[int, Dict]:
+        name = segment["file"]
+        with self._lock:
+            if name in self._decoded:
+                self._decoded.move_to_end(name)
+                return self._decoded[name]
+        decoded = {entry["id"]: entry for entry in self.iter_segment(segment)}
+        with self._lock:
+            self._decoded[name] = decoded
+            while len(self._decoded) > SEGMENT_CACHE_SIZE:
+                self._decoded.popitem(last=False)
+        return decoded
@@ -0,0 +1,106 @@
+"""
+Materialized daily and weekly analytics rollups.
+
+Each bucket stores [sessions, completions, {mood: sessions}], keyed by day
+("2026-01-05") or by the Monday of the ISO week. Buckets are updated in
+place as TaskHistory reports new and completed entries, through its
+listener hook. A completion counts on the day the task was finished, not
+the day it was planned. Time-series queries read only these buckets, so a
+chart over years of history touches a few thousand small lists, never the
+raw entries.
+"""
+from datetime import date, datetime, timedelta
+from typing import Dict, List
+
+from backend.shared_state import SharedJSONFile
+
+ROLLUP_FILE = "analytics_rollups.json"
+BUCKETS = ("day", "week")
+NO_MOOD = "unknown"
+# Longest series one query may zero-fill: ten years of days, seventy of weeks
+MAX_POINTS = 3660
+
+
+def _empty() -> Dict:
+    return {"day": {}, "week": {}, "backfilled": False}
+
+
+def _bucket_start(day: date, bucket: str) -> date:
+    if bucket == "week":
+        return day - timedelta(days=day.weekday())
+    return day
+
+
+def bucket_count(start: date, end: date, bucket: str) -> int:
+    """Points timeseries(start, end, bucket) would return"""
+    step = 7 if bucket == "week" else 1
+    return max(0, (end - _bucket_start(start, bucket)).days // step + 1)
+
+
+def _day_of(timestamp: str) -> date:
+    return datetime.fromisoformat(timestamp).date()
+
+
+class AnalyticsRollups:
+    def __init__(self, path: str = ROLLUP_FILE):
+        self.store = SharedJSONFile(path, _empty, separators=(",", ":"))
+
+    @staticmethod
+    def _bump(data: Dict, day: date, sessions: int = 0, completions: int = 0, mood: str = None):
+        for bucket in BUCKETS:
+            key = _bucket_start(day, bucket).isoformat()
+            row = data[bucket].setdefault(key, [0, 0, {}])
+            row[0] += sessions
+            row[1] += completions
+            if sessions:
+                moods = row[2]
+                moods[mood or NO_MOOD] = moods.get(mood or NO_MOOD, 0) + sessions
+
+    # -------------------- TaskHistory listener --------------------
+    def entries_added(self, entries: List[Dict]):
+        with self.store.transaction() as data:
+            for entry in entries:
+                self._bump(data, _day_of(entry["timestamp"]), sessions=1, mood=entry.get("mood"))
+
+    def entry_completed(self, entry: Dict):
+        with self.store.transaction() as data:
+            self._bump(data, _day_of(entry.get("completed_at") or entry["timestamp"]), completions=1)
+
+    def history_cleared(self):
+        with self.store.transaction() as data:
+            data.clear()
+            data.update(_empty(), backfilled=True)
+
+    def backfill(self, entries: List[Dict]) -> bool:
+        """Build the rollups from existing history, once across all workers"""
+        with self.store.transaction() as data:
+            if data.get("backfilled"):
+                return False
+            data.update(_empty(), backfilled=True)
+            for entry in entries:
+                self._bump(data, _day_of(entry["timestamp"]), sessions=1, mood=entry.get("mood"))
+                if entry.get("completed"):
+                    self._bump(data, _day_of(entry.get("completed_at") or entry["timestamp"]), completions=1)
+        return True
+
+    # -------------------- QUERIES --------------------
+    def timeseries(self, start: date, end: date, bucket: str = "day") -> List[Dict]:
+        """One point per bucket from start to end (inclusive), zero-filled"""
+        if bucket_count(start, end, bucket) > MAX_POINTS:
+            raise ValueError(f"Range spans more than {MAX_POINTS} {bucket}s.")
+        self.store.refresh()
+        rows = self.store.data[bucket]
+        step = timedelta(days=7 if bucket == "week" else 1)
+
+        series = []
+        current = _bucket_start(start, bucket)
+        while current <= end:
+            sessions, completions, moods = rows.get(current.isoformat(), (0, 0, {}))
+            series.append({
+                "start": current.isoformat(),
+                "sessions": sessions,
+                "completions": completions,
+                "moods": dict(moods),
+            })
+            current += step
+        return series
@@ -1,12 +1,37 @@
 import datetime
+from typing import List
+
+from backend.energy_profile import EnergyProfiles, DEFAULT_USER
+
+# Energy levels each difficulty prefers, best first
+SLOT_PREFERENCES = {
+    "hard": ("high", "medium", "low"),
+    "medium": ("medium", "high", "low"),
+    "easy": ("low", "medium", "high"),
+}
+SLOT_REASONS = {
+    ("hard", "high"): "This is your peak energy time.",
+    ("easy", "low"): "Good time for low-effort tasks.",
+    ("easy", "medium"): "Good time for low-effort tasks.",
+    ("medium", "medium"): "Balanced energy time.",
+    ("medium", "high"): "Balanced energy time.",
+}
+DEFAULT_SLOT_CAPACITY = 2
 
 class EnergyScheduler:
-    def __init__(self):
+    def __init__(self, profiles: EnergyProfiles = None):
         # Default "Pattern": High energy in morning (9-12), dip in afternoon (2-4), medium evening (6-8)
         self.peak_hours = [(9, 12), (18, 20)]
         self.slump_hours = [(14, 16)]
-    
-    def get_energy_level(self, hour: int) -> str:
+        # Learned per-user patterns replace the default once a user has enough history
+        self.profiles = profiles
+        self.rebuild_energy_table()
+
+    def rebuild_energy_table(self):
+        """Precompute hour -> energy once; call again after editing peak/slump hours"""
+        self.energy_by_hour = [self._classify_hour(hour) for hour in range(24)]
+
+    def _classify_hour(self, hour: int) -> str:
         for start, end in self.peak_hours:
             if start <= hour < end:
                 return "high"
@@ -15,40 +40,131 @@ class EnergyScheduler:
                 return "low"
         return "medium"
 
-    def suggest_time_for_task(self, difficulty: str, current_time: datetime.datetime = None):
+    def get_energy_level(self, hour: int) -> str:
+        return self.energy_by_hour[hour % 24]
+
+    def energy_table(self, weekday: int, user_id: str = DEFAULT_USER) -> List[str]:
+        """The user's learned hour -> energy table for a weekday, else the default"""
+        if self.profiles is not None:
+            learned = self.profiles.energy_table(user_id, weekday, self.energy_by_hour)
+            if learned is not None:
+                return learned
+        return self.energy_by_hour
+
+    def _upcoming_energy(self, current_time: datetime.datetime, hours: int, user_id: str) -> List[str]:
+        """Energy for each of the next `hours` hours, starting with the current one"""
+        if self.profiles is None:
+            return [self.energy_by_hour[(current_time.hour + offset) % 24] for offset in range(hours)]
+        tables = {}
+        energies = []
+        for offset in range(hours):
+            days, hour = divmod(current_time.hour + offset, 24)
+            weekday = (current_time.weekday() + days) % 7
+            if weekday not in tables:
+                tables[weekday] = self.energy_table(weekday, user_id)
+            energies.append(tables[weekday][hour])
+        return energies
+
+    def suggest_time_for_task(self, difficulty: str, current_time: datetime.datetime = None,
+                              user_id: str = DEFAULT_USER):
         if current_time is None:
             current_time = datetime.datetime.now()
-        
-        current_hour = current_time.hour
+
+        upcoming = self._upcoming_energy(current_time, 12, user_id)
         # If task is 'hard', find next 'high' energy slot
         # If task is 'easy', any slot works, preferably 'low' or 'medium' to save 'high' for hard tasks.
-        
+
         difficulty = difficulty.lower()
-        
+
         # Simple heuristic search for next 12 hours
-        for i in range(12):
-            check_time = current_time + datetime.timedelta(hours=i)
-            hour = check_time.hour
-            energy = self.get_energy_level(hour)
-            
+        for i, energy in enumerate(upcoming):
             if difficulty == "hard" and energy == "high":
                 return {
-                    "suggested_time": check_time.strftime("%I:%M %p"),
+                    "suggested_time": (current_time + datetime.timedelta(hours=i)).strftime("%I:%M %p"),
                     "reason": "This is your peak energy time."
                 }
             elif difficulty == "easy" and energy in ["medium", "low"]:
                 return {
-                    "suggested_time": check_time.strftime("%I:%M %p"),
+                    "suggested_time": (current_time + datetime.timedelta(hours=i)).strftime("%I:%M %p"),
                     "reason": "Good time for low-effort tasks.",
                 }
             elif difficulty == "medium" and energy in ["medium", "high"]:
                  return {
-                    "suggested_time": check_time.strftime("%I:%M %p"),
+                    "suggested_time": (current_time + datetime.timedelta(hours=i)).strftime("%I:%M %p"),
                     "reason": "Balanced energy time."
                 }
-        
+
         # Fallback
         return {
             "suggested_time": current_time.strftime("%I:%M %p"),
             "reason": "No perfect slot found soon, start now."
         }
+
+    def schedule_many(self, tasks: list, current_time: datetime.datetime = None,
+                      capacity: int = DEFAULT_SLOT_CAPACITY, horizon: int = 24,
+                      user_id: str = DEFAULT_USER) -> dict:
+        """
+        Assign a whole day's tasks to hourly slots in one pass.
+
+        `tasks` are {"task": str, "difficulty": "easy|medium|hard"} dicts.
+        Hard tasks are placed first so they get the high-energy hours; each
+        hour takes at most `capacity` tasks, so they don't all land on 9am.
+        Tasks that don't fit in the next `horizon` hours come back unscheduled.
+        """
+        if current_time is None:
+            current_time = datetime.datetime.now()
+        first_hour = current_time.replace(minute=0, second=0, microsecond=0)
+
+        # Slot offsets grouped by energy, in time order
+        slots_by_energy = {"high": [], "medium": [], "low": []}
+        for offset, energy in enumerate(self._upcoming_energy(current_time, horizon, user_id)):
+            slots_by_energy[energy].append(offset)
+        remaining = [capacity] * horizon
+        # Per energy level, index of the earliest slot that may still have room
+        cursor = {energy: 0 for energy in slots_by_energy}
+
+        by_difficulty = {"hard": [], "medium": [], "easy": []}
+        for index, task in enumerate(tasks):
+            difficulty = str(task.get("difficulty", "medium")).lower()
+            by_difficulty.get(difficulty, by_difficulty["medium"]).append(index)
+
+        placements = [None] * len(tasks)
+        unscheduled = []
+        for difficulty in ("hard", "medium", "easy"):
+            for index in by_difficulty[difficulty]:
+                for energy in SLOT_PREFERENCES[difficulty]:
+                    slots = slots_by_energy[energy]
+                    position = cursor[energy]
+                    while position < len(slots) and remaining[slots[position]] == 0:
+                        position += 1
+                    cursor[energy] = position
+                    if position < len(slots):
+                        offset = slots[position]
+                        remaining[offset] -= 1
+                        placements[index] = (offset, energy, difficulty)
+                        break
+                else:
+                    unscheduled.append(tasks[index])
+
+        # Format each slot's time once rather than once per task
+        slot_times = []
+        for offset in range(horizon):
+            start = current_time if offset == 0 else first_hour + datetime.timedelta(hours=offset)
+            slot_times.append((start.isoformat(timespec="minutes"), start.strftime("%I:%M %p")))
+
+        scheduled = []
+        for index, placement in enumerate(placements):
+            if placement is None:
+                continue
+            offset, energy, difficulty = placement
+            start, suggested_time = slot_times[offset]
+            scheduled.append({
+                **tasks[index],
+                "difficulty": difficulty,
+                "energy": energy,
+                "start": start,
+                "suggested_time": suggested_time,
+                "reason": SLOT_REASONS.get((difficulty, energy), "Best free slot left today."),
+            })
+
+        return {"scheduled": scheduled, "unscheduled": unscheduled}
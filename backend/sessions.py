@@ -0,0 +1,133 @@
+"""
+Server-side plan sessions for step-by-step progress.
+
+generate_plan registers one session per task in the plan; /next-step then
+only needs the compact session id and a cursor instead of re-uploading the
+task and all of its steps. Sessions live in this worker's memory, bounded by
+count (LRU) and age (TTL). A client that hits a different worker or an
+expired session gets a 404 and can fall back to sending `task` + `steps`.
+"""
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+SESSION_TTL = int(os.getenv("PLAN_SESSION_TTL_SECONDS", str(4 * 3600)))
+MAX_SESSIONS = int(os.getenv("PLAN_SESSION_MAX", "10000"))
+COMPLETION_MESSAGE = "🎉 Task completed. Take a short break."
+
+
+class PlanProgress:
+    """Shared by the task sessions of one plan; completes the history entry once"""
+    __slots__ = ("entry_id", "remaining", "on_complete")
+
+    def __init__(self, entry_id: Optional[int], remaining: int,
+                 on_complete: Callable[[int], object] = None):
+        self.entry_id = entry_id
+        self.remaining = remaining
+        self.on_complete = on_complete
+
+
+class PlanSession:
+    __slots__ = ("id", "task", "steps", "cursor", "finished", "progress", "expires_at")
+
+    def __init__(self, session_id: str, task: str, steps: List[str], progress: PlanProgress,
+                 expires_at: float):
+        self.id = session_id
+        self.task = task
+        self.steps = steps
+        self.cursor = 0
+        self.finished = False
+        self.progress = progress
+        self.expires_at = expires_at
+
+
+class PlanSessionStore:
+    def __init__(self, max_sessions: int = MAX_SESSIONS, ttl: int = SESSION_TTL,
+                 on_plan_complete: Callable[[int], object] = None):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        # Called with the history entry id once every task in the plan is done
+        self.on_plan_complete = on_plan_complete
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def _new_id(self) -> str:
+        while True:
+            session_id = secrets.token_urlsafe(6)
+            if session_id not in self._sessions:
+                return session_id
+
+    def create_plan(self, plan: List[Dict], entry_id: Optional[int] = None,
+                    on_complete: Callable[[int], object] = None) -> List[str]:
+        """
+        Register a session per task and stamp `session_id` onto each plan item.
+        `on_complete` replaces the store's on_plan_complete for this plan
+        (e.g. the owner's history partition).
+        """
+        progress = PlanProgress(entry_id, len(plan), on_complete or self.on_plan_complete)
+        expires_at = time.monotonic() + self.ttl
+        ids = []
+        with self._lock:
+            for item in plan:
+                session = PlanSession(self._new_id(), item["task"], item["all_steps"], progress, expires_at)
+                self._sessions[session.id] = session
+                item["session_id"] = session.id
+                ids.append(session.id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        return ids
+
+    def get(self, session_id: str) -> Optional[PlanSession]:
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return None
+            if session.expires_at < time.monotonic():
+                del self._sessions[session_id]
+                return None
+            self._sessions.move_to_end(session_id)
+            session.expires_at = time.monotonic() + self.ttl
+            return session
+
+    def advance(self, session_id: str, cursor: int) -> Optional[Dict]:
+        """
+        Step at `cursor` (same meaning as step_index); None if the session is gone.
+        The first call past the last step also carries `task_completed: True`.
+        """
+        session = self.get(session_id)
+        if session is None:
+            return None
+
+        total = len(session.steps)
+        if cursor < total:
+            session.cursor = cursor
+            return {
+                "current_step": session.steps[cursor],
+                "next_step_index": cursor + 1,
+                "total_steps": total
+            }
+
+        newly_finished = completed_plan = False
+        with self._lock:
+            if not session.finished:
+                session.finished = newly_finished = True
+                session.progress.remaining -= 1
+                completed_plan = session.progress.remaining == 0
+        progress = session.progress
+        if completed_plan and progress.entry_id is not None and progress.on_complete:
+            progress.on_complete(progress.entry_id)
+
+        step = {
+            "current_step": COMPLETION_MESSAGE,
+            "next_step_index": cursor,
+            "total_steps": total
+        }
+        if newly_finished:
+            step["task_completed"] = True
+        return step
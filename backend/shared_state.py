@@ -0,0 +1,138 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+def user_file_name(user_id: str) -> str:
+    """
+    Base name for one user's own files. Always a hash of the exact id: no id can
+    name another user's files (or their sidecars), and ids differing only in
+    case stay apart on case-insensitive filesystems.
+    """
+    return hashlib.sha256(user_id.encode("utf-8")).hexdigest()[:32]
+
+
+@contextmanager
+def file_lock(path: str):
+    """
+    Exclusive cross-process lock for `path`, held on a sidecar `.lock` file.
+    Works the same for threads of one worker and for separate gunicorn workers.
+    """
+    with open(path + ".lock", "a+") as f:
+        if fcntl:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class SharedJSONFile:
+    """
+    In-memory copy of a JSON file that stays consistent across worker processes.
+
+    - Reads call refresh(), which costs one os.stat() and only re-parses the
+      file when another process has replaced it since we last looked.
+    - Writes go through transaction(): lock, refresh, mutate, atomic replace.
+    - `version` bumps whenever `data` changes so callers can key caches on it.
+    - `decode`, if given, turns the parsed JSON into the in-memory form (and
+      re-runs after each transaction, so callers may add plain JSON values);
+      `encode` is the json `default=` hook that writes that form back.
+    """
+
+    def __init__(self, path: str, default, decode=None, encode=None, **dump_kwargs):
+        self.path = path
+        self.default = default
+        self.decode = decode
+        self.dump_kwargs = dict(dump_kwargs, default=encode) if encode else dump_kwargs
+        self.data = None
+        self.version = 0
+        self._signature = None
+        self._lock = threading.RLock()
+        self.refresh()
+
+    def _stat_signature(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def _read(self):
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                return self.default()
+            # Outside the try: a bad record must not read as an empty file and get overwritten
+            return self.decode(data) if self.decode else data
+        return self.default()
+
+    def refresh(self) -> bool:
+        """Reload from disk if the file changed; returns True when it did"""
+        with self._lock:
+            signature = self._stat_signature()
+            if self.data is not None and signature == self._signature:
+                return False
+            self.data = self._read()
+            self._signature = signature
+            self.version += 1
+            return True
+
+    def _write(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(self.data, f, **self.dump_kwargs)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._signature = self._stat_signature()
+        self.version += 1
+
+    @contextmanager
+    def locked(self):
+        """Lock the file and yield fresh data read-only; nothing is written"""
+        with self._lock, file_lock(self.path):
+            self.refresh()
+            yield self.data
+
+    @contextmanager
+    def transaction(self):
+        """Lock the file, yield fresh data for mutation, then persist it"""
+        with self._lock, file_lock(self.path):
+            self.refresh()
+            try:
+                yield self.data
+            except BaseException:
+                # Drop the half-applied change; next read reloads from disk
+                self.data = None
+                raise
+            if self.decode:
+                self.data = self.decode(self.data)
+            self._write()
@@ -1,10 +1,12 @@
 import os
 from dotenv import load_dotenv
 from fastapi import FastAPI, HTTPException, Depends
-from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 from groq import Groq
 from backend import auth
+from backend.admission import AdmissionController
+from backend.output_validator import parse_steps
+from backend.static_assets import PrecompressedStaticFiles
 
 # Load environment
 load_dotenv()
@@ -17,6 +19,8 @@ app.include_router(auth.router)
 # Initialize Groq
 api_key = os.getenv("GROQ_API_KEY")
 client = Groq(api_key=api_key) if api_key else None
+# Per-user and global token buckets in front of Groq
+admission = AdmissionController()
 
 # Simple Models
 class TaskRequest(BaseModel):
@@ -26,8 +30,14 @@ class TaskResponse(BaseModel):
     task: str
     steps: list[str]
 
+async def admitted_user(current_user: auth.User = Depends(auth.get_current_user)) -> auth.User:
+    """Authenticated user whose request got a Groq slot (429 otherwise)"""
+    if client:
+        await admission.admit_http(current_user.email)
+    return current_user
+
 @app.post("/break-down-task", response_model=TaskResponse)
-def break_down_task(request: TaskRequest, current_user: auth.User = Depends(auth.get_current_user)):
+def break_down_task(request: TaskRequest, current_user: auth.User = Depends(admitted_user)):
     """Simple endpoint: takes a task, returns micro-steps"""
     try:
         if not client:
@@ -70,14 +80,8 @@ Rules:
         
         output = response.choices[0].message.content.strip()
         
-        # Parse numbered list
-        steps = []
-        for line in output.split("\n"):
-            line = line.strip()
-            if line and any(line.startswith(f"{i}.") for i in range(1, 20)):
-                # Remove number prefix
-                step = line.split(".", 1)[1].strip() if "." in line else line
-                steps.append(step)
+        # Parse numbered list (same salvaging parser as the main app)
+        steps, _quality = parse_steps(output)
         
         # Fallback if parsing failed
         if not steps:
@@ -104,4 +108,7 @@ def health():
     return {"status": "ok", "has_api_key": client is not None}
 
 # Serve frontend
-app.mount("/", StaticFiles(directory="simple_frontend", html=True), name="static")
+# Hashed + gzip/brotli variants built once; versioned URLs are cached for a year
+static_files = PrecompressedStaticFiles(directory="simple_frontend", html=True)
+static_files.precompress()
+app.mount("/", static_files, name="static")
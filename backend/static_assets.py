@@ -0,0 +1,196 @@
+"""
+Precompressed, cache-busted static file serving.
+
+Drop-in replacement for StaticFiles used by both apps:
+
+- Text assets are hashed and compressed once (gzip, plus brotli when the
+  `brotli` package is installed), at startup via precompress() or on the
+  first request, and the right variant is picked from Accept-Encoding.
+- ETags are content hashes. Rebuilding happens only when a file's mtime or
+  size changes, so a matching If-None-Match gets a 304 without reading it.
+- HTML pages are rewritten so local `src`/`href` references carry `?v=<hash>`;
+  those versioned URLs are served with a one-year immutable Cache-Control,
+  everything else with `no-cache` (always revalidate, usually a 304).
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import stat
+import threading
+from urllib.parse import parse_qs
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import StaticFiles
+
+try:
+    import brotli
+except ImportError:  # optional; gzip only
+    brotli = None
+
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml")
+MIN_COMPRESS_SIZE = 512
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+_LOCAL_REF = re.compile(r'(\b(?:src|href)=")([^"#?:]+)(")')
+
+
+class _Asset:
+    __slots__ = ("signature", "etag", "media_type", "body", "variants", "deps")
+
+    def __init__(self, signature, etag, media_type, body, variants, deps):
+        self.signature = signature
+        self.etag = etag
+        self.media_type = media_type
+        # Only kept for rewritten HTML; other identity responses stream from disk
+        self.body = body
+        self.variants = variants
+        # HTML only: {full_path: signature} of the assets it references
+        self.deps = deps
+
+
+def _signature(stat_result: os.stat_result) -> tuple:
+    return (stat_result.st_mtime_ns, stat_result.st_size)
+
+
+def accepts_encoding(accept_encoding: str, encoding: str) -> bool:
+    """True if an Accept-Encoding header allows `encoding` (honours q=0)"""
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        if name.strip().lower() not in (encoding, "*"):
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        return q > 0
+    return False
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._assets = {}
+        self._lock = threading.Lock()
+
+    # -------------------- BUILD --------------------
+    def _compress(self, data: bytes, media_type: str) -> dict:
+        if len(data) < MIN_COMPRESS_SIZE or not media_type.startswith(COMPRESSIBLE_TYPES):
+            return {}
+        variants = {"gzip": gzip.compress(data, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            variants["br"] = brotli.compress(data, quality=11)
+        # Keep only encodings that actually save bytes
+        return {name: body for name, body in variants.items() if len(body) < len(data)}
+
+    def _resolve_ref(self, html_path: str, ref: str):
+        if ref.startswith("/"):
+            full_path, stat_result = self.lookup_path(ref.lstrip("/"))
+        else:
+            full_path = os.path.normpath(os.path.join(os.path.dirname(html_path), ref))
+            try:
+                stat_result = os.stat(full_path)
+            except OSError:
+                stat_result = None
+        if stat_result is None or not stat.S_ISREG(stat_result.st_mode):
+            return None, None
+        return full_path, stat_result
+
+    def _rewrite_html(self, full_path: str, html: bytes):
+        deps = {}
+
+        def version(match):
+            ref = match.group(2)
+            dep_path, dep_stat = self._resolve_ref(full_path, ref)
+            # Page links stay as they are; only versioned sub-resources are immutable
+            if dep_path is None or mimetypes.guess_type(dep_path)[0] == "text/html":
+                return match.group(0)
+            asset = self._asset(dep_path, dep_stat)
+            deps[dep_path] = asset.signature
+            return f"{match.group(1)}{ref}?v={asset.etag}{match.group(3)}"
+
+        text = _LOCAL_REF.sub(version, html.decode("utf-8"))
+        return text.encode("utf-8"), deps
+
+    def _asset(self, full_path: str, stat_result: os.stat_result) -> _Asset:
+        full_path = os.fspath(full_path)
+        asset = self._assets.get(full_path)
+        if asset is not None and asset.signature == _signature(stat_result):
+            if not asset.deps or all(self._dep_fresh(p, s) for p, s in asset.deps.items()):
+                return asset
+
+        with open(full_path, "rb") as f:
+            data = f.read()
+        media_type = mimetypes.guess_type(full_path)[0] or "application/octet-stream"
+        body, deps = None, None
+        if media_type == "text/html":
+            body, deps = self._rewrite_html(full_path, data)
+            data = body
+        asset = _Asset(
+            signature=_signature(stat_result),
+            etag=hashlib.sha256(data).hexdigest()[:16],
+            media_type=media_type,
+            body=body,
+            variants=self._compress(data, media_type),
+            deps=deps,
+        )
+        with self._lock:
+            self._assets[full_path] = asset
+        return asset
+
+    def _dep_fresh(self, path: str, signature: tuple) -> bool:
+        try:
+            return _signature(os.stat(path)) == signature
+        except OSError:
+            return False
+
+    def precompress(self):
+        """Hash and compress every file up front so first visitors get cached variants"""
+        for directory in self.all_directories:
+            for root, _dirs, files in os.walk(directory):
+                for name in files:
+                    full_path = os.path.join(root, name)
+                    self._asset(full_path, os.stat(full_path))
+
+    # -------------------- SERVE --------------------
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200) -> Response:
+        if status_code != 200:
+            return super().file_response(full_path, stat_result, scope, status_code)
+
+        asset = self._asset(full_path, stat_result)
+        request_headers = Headers(scope=scope)
+        query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+        versioned = query.get("v", [None])[0] == asset.etag
+
+        encoding = None
+        accept_encoding = request_headers.get("accept-encoding", "")
+        for candidate in ("br", "gzip"):
+            if candidate in asset.variants and accepts_encoding(accept_encoding, candidate):
+                encoding = candidate
+                break
+
+        etag = f'"{asset.etag}-{encoding}"' if encoding else f'"{asset.etag}"'
+        headers = {
+            "ETag": etag,
+            "Cache-Control": IMMUTABLE if versioned else REVALIDATE,
+        }
+        if asset.variants:
+            headers["Vary"] = "Accept-Encoding"
+
+        if_none_match = request_headers.get("if-none-match", "")
+        if if_none_match and (if_none_match.strip() == "*" or etag in if_none_match):
+            return Response(status_code=304, headers=headers)
+
+        if encoding:
+            headers["Content-Encoding"] = encoding
+            return Response(asset.variants[encoding], media_type=asset.media_type, headers=headers)
+        if asset.body is not None:
+            return Response(asset.body, media_type=asset.media_type, headers=headers)
+        return FileResponse(full_path, stat_result=stat_result, headers=headers)
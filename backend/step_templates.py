@@ -0,0 +1,120 @@
+"""
+Offline step generator: the template tier of the plan router.
+
+`step_templates.json` holds hand-written step lists for common task types
+(desk, dishes, exams, emails, bills, ...), grouped by the same categories as
+rag_patterns. Each template lists `keywords`, words or phrases specific
+enough to pick it on their own ("dishes", "book report"), and optional
+`hints`, generic words ("clean", "room", "pay") that only count next to
+another hit: a keyword scores KEYWORD_SCORE, a hint HINT_SCORE, and a
+template needs MIN_SCORE. So "clean my room" and "pay the rent" match, while
+"organize a birthday party" or "fix the kitchen sink" go to the LLM. The
+highest score wins (earlier templates win ties, so specific ones come
+first). The slots
+are then filled from the task text: "clean my desk" gives {object} "desk"
+and {the_object} "your desk". Mood tweaks from the same file are applied,
+e.g. stressed users get a timer step and a shorter list.
+
+Matching is a dictionary lookup per word of the task, so a whole plan is
+answered in microseconds with no network. Tasks that match nothing return
+None and go on to the next tier.
+"""
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+from backend.plan_cache import normalize_task
+
+TEMPLATE_FILE = os.path.join(os.path.dirname(__file__), "step_templates.json")
+KEYWORD_SCORE = 2
+HINT_SCORE = 1
+MIN_SCORE = 2
+
+# Words that start the object phrase; "my" is said back as "your"
+_DETERMINERS = {
+    "the": "the", "a": "the", "an": "the", "my": "your", "your": "your", "our": "our",
+    "his": "his", "her": "her", "their": "their", "this": "this", "that": "that",
+    "these": "these", "those": "those", "some": "the", "all": "all the",
+}
+_PREPOSITIONS = {"to", "for", "on", "up", "out", "off", "about", "with", "through", "over", "at", "in"}
+_TRAILING = {"today", "tomorrow", "tonight", "now", "later", "asap", "soon", "please"}
+
+
+def object_phrase(task: str):
+    """(bare object, object with determiner) of a task, e.g. ("desk", "your desk")"""
+    words = task.strip().rstrip(".!?").split()
+    # Drop the leading verb, then any particles: "tidy up", "reply to", "study for"
+    words = words[1:] if len(words) > 1 else []
+    while words and words[0].lower() in _PREPOSITIONS:
+        words = words[1:]
+    while words and words[-1].lower() in _TRAILING:
+        words = words[:-1]
+    if not words:
+        return None, None
+
+    first = words[0].lower()
+    if first in _DETERMINERS:
+        determiner, words = _DETERMINERS[first], words[1:]
+    elif first.endswith("'s"):
+        determiner, words = words[0], words[1:]
+    else:
+        determiner = "the"
+    if not words:
+        return None, None
+    bare = " ".join(words)
+    return bare, f"{determiner} {bare}"
+
+
+class StepTemplates:
+    def __init__(self, path: str = TEMPLATE_FILE):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        self.templates: List[Dict] = data["templates"]
+        self.moods: Dict[str, Dict] = data.get("moods", {})
+        # word -> (template index, score) of every template that lists it
+        self._by_word: Dict[str, List[Tuple[int, int]]] = {}
+        self._phrases = []
+        for i, template in enumerate(self.templates):
+            weighted = ((template["keywords"], KEYWORD_SCORE), (template.get("hints", ()), HINT_SCORE))
+            for words, score in weighted:
+                for word in words:
+                    if " " in word:
+                        self._phrases.append((f" {word} ", i, score))
+                    else:
+                        self._by_word.setdefault(word, []).append((i, score))
+
+    def match(self, task: str) -> Optional[Dict]:
+        """Best template for a task, or None if none scores MIN_SCORE"""
+        normalized = normalize_task(task)
+        scores = {}
+        for word in normalized.split():
+            for i, score in self._by_word.get(word, ()):
+                scores[i] = scores.get(i, 0) + score
+        padded = f" {normalized} "
+        for phrase, i, score in self._phrases:
+            if phrase in padded:
+                scores[i] = scores.get(i, 0) + score
+        best = max(scores.values(), default=0)
+        if best < MIN_SCORE:
+            return None
+        return self.templates[min(i for i, score in scores.items() if score == best)]
+
+    def generate(self, task: str, mood: str = "neutral") -> Optional[List[str]]:
+        """Filled-in steps for a task, or None if no template fits"""
+        template = self.match(task)
+        if template is None:
+            return None
+        bare, with_determiner = object_phrase(task)
+        if bare is None:
+            bare = template["default_object"]
+            with_determiner = f"the {bare}"
+        steps = [step.format(object=bare, the_object=with_determiner) for step in template["steps"]]
+
+        tweaks = self.moods.get(mood, {})
+        if "max_steps" in tweaks:
+            steps = steps[:tweaks["max_steps"]]
+        if "first" in tweaks:
+            steps.insert(0, tweaks["first"])
+        if "last" in tweaks:
+            steps.append(tweaks["last"])
+        return steps
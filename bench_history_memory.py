@@ -0,0 +1,108 @@
+"""
+History memory benchmark: parsed JSON dicts vs compact HistoryEntry records.
+
+Entries look like real ones: 1-3 tasks per plan with template steps, some
+(--unique-steps) with one-off LLM-style steps that no other entry shares.
+Parsed dicts share nothing, so their footprint is measured one chunk at a
+time and summed (holding 1M of them takes ~3 GB); the records are all held
+at once, since they share the string table. Records trade load time for
+memory: building one costs about 1.5x parsing the dict alone.
+
+Run with: python bench_history_memory.py [--entries 1000000] [--unique-steps 0.3]
+"""
+import argparse
+import gc
+import json
+import random
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from backend.history_records import HistoryEntry, StringTable
+from backend.step_templates import StepTemplates
+
+CHUNK = 50_000
+TASKS = ["clean my desk", "wash the dishes", "do the laundry", "study for the exam", "read the textbook chapter",
+         "finish my homework", "reply to emails", "fill in the form", "pay the rent", "call the dentist"]
+MOODS = ["neutral", "stressed", "excited", None]
+
+
+def make_lines(first: int, count: int, unique: float, templates: StepTemplates, rng: random.Random):
+    start = datetime(2026, 1, 1)
+    for i in range(first, first + count):
+        plan = []
+        for task in rng.sample(TASKS, rng.randint(1, 3)):
+            steps = templates.generate(task, rng.choice(["neutral", "stressed", "excited"]))
+            if rng.random() < unique:
+                steps = [f"{step[:-1]} ({i})." for step in steps]
+            plan.append({"task": task.capitalize(), "current_step": steps[0], "next_step_index": 1,
+                         "total_steps": len(steps), "all_steps": steps})
+        yield json.dumps({
+            "id": i,
+            "timestamp": (start + timedelta(seconds=30 * i)).isoformat(),
+            "user_query": " and ".join(item["task"] for item in plan) + f" ({i})",
+            "energy_level": rng.choice(["low", "medium", "high"]),
+            "mood": rng.choice(MOODS),
+            "generated_plan": plan,
+            "completed": rng.random() < 0.5,
+        }, ensure_ascii=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--entries", type=int, default=1_000_000)
+    parser.add_argument("--unique-steps", type=float, default=0.3)
+    args = parser.parse_args()
+
+    templates = StepTemplates()
+    # Every task needs template steps; fail loudly if a template change drops one
+    unmatched = [task for task in TASKS if templates.match(task) is None]
+    assert not unmatched, f"No template for {unmatched}"
+    rng = random.Random(7)
+    strings = StringTable()
+    records = []
+    dict_bytes = record_bytes = 0
+    dict_seconds = record_seconds = 0.0
+
+    gc.collect()
+    tracemalloc.start()
+    for first in range(1, args.entries + 1, CHUNK):
+        lines = list(make_lines(first, min(CHUNK, args.entries + 1 - first), args.unique_steps, templates, rng))
+
+        before = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        parsed = [json.loads(line) for line in lines]
+        dict_seconds += time.perf_counter() - start
+        dict_bytes += tracemalloc.get_traced_memory()[0] - before
+        del parsed
+
+        before = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        records.extend(HistoryEntry.from_dict(json.loads(line), strings) for line in lines)
+        record_seconds += time.perf_counter() - start
+        record_bytes += tracemalloc.get_traced_memory()[0] - before
+        del lines
+    tracemalloc.stop()
+
+    # Round trip must be exact: the API sees the same JSON as before
+    check = list(make_lines(1, 1, args.unique_steps, templates, random.Random(7)))[0]
+    assert records[0].to_dict() == json.loads(check)
+
+    sample = records[:100_000]
+    start = time.perf_counter()
+    for record in sample:
+        record.to_dict()
+    to_dict = (time.perf_counter() - start) / len(sample)
+
+    entries = len(records)
+    print(f"{entries} entries, {args.unique_steps:.0%} of plans with one-off steps")
+    print(f"  parsed dicts:     {dict_bytes / 2**20:10.1f} MB  ({dict_bytes / entries:7.0f} B/entry)")
+    print(f"  records:          {record_bytes / 2**20:10.1f} MB  ({record_bytes / entries:7.0f} B/entry)")
+    print(f"  reduction:        {dict_bytes / record_bytes:10.1f}x  ({len(strings)} distinct task/step strings)")
+    print(f"  load as dicts:    {dict_seconds / entries * 1e6:10.1f} us/entry")
+    print(f"  load as records:  {record_seconds / entries * 1e6:10.1f} us/entry")
+    print(f"  record -> dict:   {to_dict * 1e6:10.1f} us/entry (API boundary)")
+
+
+if __name__ == "__main__":
+    main()
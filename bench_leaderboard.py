@@ -0,0 +1,79 @@
+"""
+Leaderboard benchmark: sorted index vs sorting every user per request.
+
+Run with: python bench_leaderboard.py [--users 1000000] [--queries 10000]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from backend.leaderboard import Leaderboard, display_name
+
+
+def make_rows(count: int, seed: int = 7):
+    rng = random.Random(seed)
+    return [(f"user{i}@example.com", int(rng.paretovariate(1.2) * 100), rng.randint(0, 60)) for i in range(count)]
+
+
+def per_call(fn, calls: int) -> float:
+    start = time.perf_counter()
+    for i in range(calls):
+        fn(i)
+    return (time.perf_counter() - start) / calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=10_000)
+    args = parser.parse_args()
+
+    rows = make_rows(args.users)
+    users = [row[0] for row in rows]
+    rng = random.Random(1)
+
+    board = Leaderboard(path=None)
+    start = time.perf_counter()
+    board.load(rows)
+    build = time.perf_counter() - start
+
+    update = per_call(lambda i: board.update(rng.choice(users), rng.randint(0, 10_000), rng.randint(0, 60)),
+                      args.queries)
+    top = per_call(lambda i: board.top("xp", 10), args.queries)
+    rank = per_call(lambda i: board.rank(users[i % len(users)], "xp"), args.queries)
+    around = per_call(lambda i: board.around(users[i % len(users)], "streak", 5), args.queries)
+
+    # What each request would cost without the index
+    scores = dict(board.scores)
+    naive = per_call(lambda i: sorted(scores.items(), key=lambda item: -item[1][0])[:10], 3)
+
+    # Same updates through the shared journal (file lock + append per update)
+    with tempfile.TemporaryDirectory() as directory:
+        journaled = Leaderboard(os.path.join(directory, "leaderboard.log"))
+        journaled.backfill(rows)
+        journal_update = per_call(
+            lambda i: journaled.update(rng.choice(users), rng.randint(0, 10_000), 1), min(args.queries, 2000)
+        )
+        start = time.perf_counter()
+        reloaded = Leaderboard(journaled.path)
+        reload = time.perf_counter() - start
+        assert reloaded.scores == journaled.scores
+
+    leader = min(board.scores, key=lambda user: (-board.scores[user][0], user))
+    assert board.rank(leader) == 1 and board.top("xp", 1)[0]["user"] == display_name(leader)
+
+    print(f"{args.users} users")
+    print(f"  build index:          {build * 1000:10.1f} ms (once per worker start)")
+    print(f"  update (in memory):   {update * 1e6:10.1f} us")
+    print(f"  update (journaled):   {journal_update * 1e6:10.1f} us")
+    print(f"  top 10:               {top * 1e6:10.1f} us")
+    print(f"  rank of user:         {rank * 1e6:10.1f} us")
+    print(f"  around me (+-5):      {around * 1e6:10.1f} us")
+    print(f"  naive sort per call:  {naive * 1000:10.1f} ms")
+    print(f"  rebuild from journal: {reload * 1000:10.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Scheduler benchmark: batch schedule_many vs one suggest_time_for_task call per task.
+
+Run with: python bench_scheduler.py [--tasks 5000] [--capacity 250]
+"""
+import argparse
+import datetime
+import random
+import time
+from collections import Counter
+
+from backend.scheduler import EnergyScheduler
+
+
+def make_tasks(count: int, seed: int = 7):
+    rng = random.Random(seed)
+    return [
+        {"task": f"task {i}", "difficulty": rng.choice(["easy", "medium", "hard"])}
+        for i in range(count)
+    ]
+
+
+def best_of(fn, repeats: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=5000)
+    parser.add_argument("--capacity", type=int, default=250, help="tasks per hourly slot")
+    args = parser.parse_args()
+
+    scheduler = EnergyScheduler()
+    tasks = make_tasks(args.tasks)
+    now = datetime.datetime(2026, 1, 5, 8, 30)
+
+    single = best_of(lambda: [scheduler.suggest_time_for_task(t["difficulty"], now) for t in tasks])
+    batch = best_of(lambda: scheduler.schedule_many(tasks, now, capacity=args.capacity))
+
+    result = scheduler.schedule_many(tasks, now, capacity=args.capacity)
+    per_slot = Counter(item["start"] for item in result["scheduled"])
+    assert max(per_slot.values()) <= args.capacity
+    hard_high = sum(1 for item in result["scheduled"] if item["difficulty"] == "hard" and item["energy"] == "high")
+    hard_total = sum(1 for t in tasks if t["difficulty"] == "hard")
+
+    print(f"{args.tasks} tasks, capacity {args.capacity}/hour")
+    print(f"  suggest_time_for_task x{args.tasks}: {single * 1000:8.2f} ms (no capacity, all hard tasks share one slot)")
+    print(f"  schedule_many:                {batch * 1000:8.2f} ms ({batch / args.tasks * 1e6:.2f} us/task)")
+    print(f"  scheduled {len(result['scheduled'])}, unscheduled {len(result['unscheduled'])}, "
+          f"busiest slot {max(per_slot.values())}, hard tasks in high-energy slots {hard_high}/{hard_total}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""
+Shared pytest fixtures.
+
+backend.app keeps its JSON files, users.db and per-user directories in the
+working directory, so `app_module` imports it once per session inside a
+scratch directory (with a copy of the frontend) and stays there until the
+session ends. Without GROQ_API_KEY plans come from templates and fallbacks.
+"""
+import os
+import shutil
+
+import pytest
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+@pytest.fixture(scope="session")
+def app_module(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("app")
+    shutil.copytree(os.path.join(ROOT, "frontend"), directory / "frontend")
+    cwd = os.getcwd()
+    api_key = os.environ.pop("GROQ_API_KEY", None)
+    os.chdir(directory)
+    try:
+        import backend.app as app_module
+        yield app_module
+    finally:
+        os.chdir(cwd)
+        if api_key is not None:
+            os.environ["GROQ_API_KEY"] = api_key
+
+
+@pytest.fixture
+def client(app_module):
+    from fastapi.testclient import TestClient
+    return TestClient(app_module.app)
+
+
+@pytest.fixture
+def login(client):
+    """login(email) -> Authorization headers for a (newly registered) user"""
+    def login(email: str, password: str = "correct horse"):
+        client.post("/register", json={"email": email, "password": password})
+        token = client.post("/token", data={"username": email, "password": password}).json()["access_token"]
+        return {"Authorization": f"Bearer {token}"}
+    return login
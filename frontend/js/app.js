@@ -34,10 +34,29 @@ const elements = {
     companionAvatar: document.getElementById('companion-avatar')
 };
 
+// Bearer token from /token (same localStorage key as the simple frontend).
+// History and analytics are per user and need it; planning works without.
+function authHeaders(headers = {}) {
+    const token = localStorage.getItem('access_token');
+    return token ? { ...headers, 'Authorization': `Bearer ${token}` } : headers;
+}
+
+class AuthRequiredError extends Error {}
+
+async function checkAuth(res) {
+    if (res.status === 401) {
+        throw new AuthRequiredError('Log in to see your history');
+    }
+    if (!res.ok) {
+        throw new Error(`HTTP ${res.status}: ${await res.text()}`);
+    }
+    return res.json();
+}
+
 // API Client
 const API = {
     async getStats() {
-        const res = await fetch('/api/gamification/stats');
+        const res = await fetch('/api/gamification/stats', { headers: authHeaders() });
         if (!res.ok) {
             throw new Error(`HTTP ${res.status}: ${await res.text()}`);
         }
@@ -46,7 +65,7 @@ const API = {
     async generatePlan(tasks, energyLevel = 'medium') {
         const res = await fetch('/generate-plan', {
             method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
+            headers: authHeaders({ 'Content-Type': 'application/json' }),
             body: JSON.stringify({ tasks, energy_level: energyLevel })
         });
 
@@ -102,7 +121,7 @@ const API = {
     async addXp(amount) {
         const res = await fetch('/api/gamification/xp', {
             method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
+            headers: authHeaders({ 'Content-Type': 'application/json' }),
             body: JSON.stringify({ amount })
         });
         if (!res.ok) {
@@ -112,32 +131,100 @@ const API = {
     },
     async getHistory(limit = null) {
         const url = limit ? `/api/history?limit=${limit}` : '/api/history';
-        const res = await fetch(url);
-        if (!res.ok) {
-            throw new Error(`HTTP ${res.status}: ${await res.text()}`);
-        }
-        return res.json();
+        return checkAuth(await fetch(url, { headers: authHeaders() }));
     },
     async searchHistory(query) {
-        const res = await fetch(`/api/history/search?q=${encodeURIComponent(query)}`);
-        if (!res.ok) {
-            throw new Error(`HTTP ${res.status}: ${await res.text()}`);
-        }
-        return res.json();
+        const url = `/api/history/search?q=${encodeURIComponent(query)}`;
+        return checkAuth(await fetch(url, { headers: authHeaders() }));
     },
     async clearHistory() {
-        const res = await fetch('/api/history', { method: 'DELETE' });
-        if (!res.ok) {
-            throw new Error(`HTTP ${res.status}: ${await res.text()}`);
-        }
-        return res.json();
+        return checkAuth(await fetch('/api/history', { method: 'DELETE', headers: authHeaders() }));
     },
     async getAnalytics() {
-        const res = await fetch('/api/analytics/insights');
-        if (!res.ok) {
-            throw new Error(`HTTP ${res.status}: ${await res.text()}`);
+        return checkAuth(await fetch('/api/analytics/insights', { headers: authHeaders() }));
+    }
+};
+
+// Realtime channel: step advances, XP and stats over one WebSocket.
+// Falls back to the HTTP API whenever the socket isn't open.
+const Realtime = {
+    socket: null,
+    clientId: null,
+    lastSeq: 0,
+    retryMs: 1000,
+    // session_id -> what to do instead if the server can't advance it
+    // (session expired, or it lives on another worker)
+    fallbacks: {},
+
+    connect() {
+        if (!('WebSocket' in window)) return;
+        const scheme = location.protocol === 'https:' ? 'wss' : 'ws';
+        const socket = new WebSocket(`${scheme}://${location.host}/ws`);
+        this.socket = socket;
+
+        socket.addEventListener('open', () => {
+            // Resume: the server replays anything we missed after lastSeq
+            socket.send(JSON.stringify({
+                type: 'hello', client_id: this.clientId, last_seq: this.lastSeq,
+                token: localStorage.getItem('access_token')
+            }));
+        });
+        socket.addEventListener('message', (e) => this.handle(JSON.parse(e.data)));
+        socket.addEventListener('close', () => {
+            this.socket = null;
+            setTimeout(() => this.connect(), this.retryMs);
+            this.retryMs = Math.min(this.retryMs * 2, 30000);
+        });
+    },
+
+    isOpen() {
+        return this.socket !== null && this.socket.readyState === WebSocket.OPEN;
+    },
+
+    send(message) {
+        if (!this.isOpen()) return false;
+        this.socket.send(JSON.stringify(message));
+        return true;
+    },
+
+    sendStep(sessionId, stepIndex, onError = null) {
+        if (!this.send({ type: 'next_step', session_id: sessionId, step_index: stepIndex })) return false;
+        if (onError) this.fallbacks[sessionId] = onError;
+        return true;
+    },
+
+    handle(message) {
+        if (message.seq) this.lastSeq = Math.max(this.lastSeq, message.seq);
+
+        switch (message.type) {
+            case 'welcome':
+                this.clientId = message.client_id;
+                this.retryMs = 1000;
+                break;
+            case 'ping':
+                this.send({ type: 'pong' });
+                break;
+            case 'stats': {
+                const { type, seq, ...stats } = message;
+                updateGamificationUI(stats);
+                break;
+            }
+            case 'step':
+                delete this.fallbacks[message.session_id];
+                break;
+            case 'level_up':
+                if (state.voice) state.voice.speak(`Level up! You reached level ${message.level}.`);
+                break;
+            case 'error': {
+                console.warn('Realtime error:', message.detail);
+                const fallback = message.session_id && this.fallbacks[message.session_id];
+                if (fallback) {
+                    delete this.fallbacks[message.session_id];
+                    fallback();
+                }
+                break;
+            }
         }
-        return res.json();
     }
 };
 
@@ -157,6 +244,7 @@ async function init() {
     }
 
     setupEventListeners();
+    Realtime.connect();
 }
 
 function updateGamificationUI(stats) {
@@ -248,7 +336,22 @@ function setupEventListeners() {
             // For now, let's keep it simple: speak encouragement if finishing.
         }
 
-        if (nextIdx >= task.all_steps.length) {
+        const completing = nextIdx >= task.all_steps.length;
+        const awardXpOverHttp = async () => {
+            try {
+                await API.addXp(50);
+                updateGamificationUI(await API.getStats());
+            } catch (e) {
+                console.error("Failed to award XP", e);
+            }
+        };
+
+        // Fire-and-forget progress; the server pushes XP and stats back,
+        // or answers with an error and we award the XP over HTTP instead
+        const sentRealtime = task.session_id
+            && Realtime.sendStep(task.session_id, nextIdx, completing ? awardXpOverHttp : null);
+
+        if (completing) {
             // Task Complete
             elements.focusStepDisplay.textContent = "🎉 You did it!";
 
@@ -257,9 +360,9 @@ function setupEventListeners() {
                 state.voice.speak(state.voice.getCompletion());
             }
 
-            await API.addXp(50);
-            const stats = await API.getStats();
-            updateGamificationUI(stats);
+            if (!sentRealtime) {
+                await awardXpOverHttp();
+            }
             setTimeout(closeFocusMode, 3000); // 3s delay to hear voice
             return;
         }
@@ -435,6 +538,10 @@ async function loadHistory() {
         renderAnalytics(analyticsData);
         renderHistory(history);
     } catch (e) {
+        if (e instanceof AuthRequiredError) {
+            elements.historyList.innerHTML = `<p style="color: var(--text-muted); text-align: center;">${e.message}.</p>`;
+            return;
+        }
         console.error('Failed to load history', e);
     }
 }
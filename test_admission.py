@@ -0,0 +1,163 @@
+"""
+Tests for admission control (backend/admission.py).
+Run with: python -m pytest test_admission.py
+"""
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from backend.admission import AdmissionController, AdmissionRejected, TokenBucket
+from backend.metrics import ADMISSION_REJECTIONS
+from backend.planner import PlanGenerator, MAX_ATTEMPTS
+
+
+def test_bucket_burst_then_steady_rate():
+    bucket = TokenBucket(per_minute=60, burst=3)
+    now = 1000.0
+    delays = []
+    for _ in range(5):
+        delays.append(bucket.delay(1, now))
+        bucket.take(1, now)
+    assert delays == [0, 0, 0, 1, 2]
+    # Refilled after waiting
+    assert bucket.delay(1, now + 10) == 0
+
+
+def test_user_quota_rejects_without_queueing():
+    controller = AdmissionController(per_minute=6000, burst=100, user_per_minute=60, user_burst=2)
+
+    async def run():
+        await controller.admit("alice", cost=2)
+        with pytest.raises(AdmissionRejected) as error:
+            await controller.admit("alice")
+        await controller.admit("bob")
+        return error.value
+
+    error = asyncio.run(run())
+    assert error.reason == "user_quota"
+    assert error.retry_after >= 1
+
+
+def test_overload_sheds_instead_of_collapsing():
+    # 10 requests/s with a burst of 5; nobody may wait more than 1s
+    controller = AdmissionController(per_minute=600, burst=5, user_per_minute=0, max_queue=100, max_wait=1.0)
+    before = ADMISSION_REJECTIONS.value(reason="max_wait")
+
+    async def one():
+        start = time.monotonic()
+        try:
+            await controller.admit("user")
+        except AdmissionRejected as e:
+            return "rejected", time.monotonic() - start, e.retry_after
+        return "admitted", time.monotonic() - start, 0
+
+    async def run():
+        return await asyncio.gather(*(one() for _ in range(100)))
+
+    results = asyncio.run(run())
+    admitted = [r for r in results if r[0] == "admitted"]
+    rejected = [r for r in results if r[0] == "rejected"]
+
+    # Burst plus about one second of refill gets in, the rest is told to come back
+    assert 14 <= len(admitted) <= 16
+    assert max(wait for _, wait, _ in admitted) < 1.3
+    assert max(wait for _, wait, _ in rejected) < 0.1
+    assert ADMISSION_REJECTIONS.value(reason="max_wait") - before == len(rejected)
+    assert controller.waiting == 0
+
+
+def test_queue_bound():
+    controller = AdmissionController(per_minute=60, burst=1, user_per_minute=0, max_queue=2, max_wait=60)
+
+    async def run():
+        await controller.admit("u")  # uses the burst
+        waiting = [asyncio.create_task(controller.admit("u")) for _ in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as error:
+            await controller.admit("u")
+        for task in waiting:
+            task.cancel()
+        await asyncio.gather(*waiting, return_exceptions=True)
+        return error.value
+
+    assert asyncio.run(run()).reason == "queue_full"
+    assert controller.waiting == 0
+
+
+def test_batch_is_charged_up_front_and_its_wait_is_capped():
+    controller = AdmissionController(per_minute=60, burst=5, user_per_minute=60, user_burst=10)
+
+    with pytest.raises(ValueError):
+        controller.admit_batch("alice", cost=100, max_wait=30)
+    # The last of 10 calls is due 5s from now on the global bucket
+    assert controller.admit_batch("alice", cost=10, max_wait=30) == pytest.approx(5, abs=0.1)
+    # Batches do not hold global tokens; their LLM calls take them through wait()
+    assert controller.bucket.delay(1, time.monotonic()) == 0
+    controller.bucket.wait(5)
+    with pytest.raises(AdmissionRejected) as error:
+        controller.admit_batch("bob", cost=10, max_wait=8)
+    assert error.value.reason == "max_wait"
+    # The user's share was spent by the first batch
+    with pytest.raises(AdmissionRejected) as error:
+        controller.admit_batch("alice", cost=1)
+    assert error.value.reason == "user_quota"
+
+
+def test_bucket_wait_refuses_past_max_wait():
+    bucket = TokenBucket(per_minute=60, burst=1)
+    assert bucket.wait(max_wait=0)
+    # The next token is a second away; refusing takes nothing
+    assert not bucket.wait(max_wait=0.5)
+    assert 0.5 < bucket.delay(1, time.monotonic()) <= 1
+
+
+class CountingBucket(TokenBucket):
+    def __init__(self):
+        super().__init__(per_minute=6000, burst=10)
+        self.taken = 0
+
+    def wait(self, cost: float = 1, max_wait: float = None) -> bool:
+        self.taken += cost
+        return super().wait(cost, max_wait)
+
+
+class VagueClient:
+    """Fake Groq client whose answers never pass validation"""
+
+    def __init__(self):
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        self.calls += 1
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="maybe"))])
+
+
+def test_retries_take_global_tokens():
+    client, bucket = VagueClient(), CountingBucket()
+    planner = PlanGenerator(client, rate_limiter=bucket, prepaid_first_call=True)
+    assert planner.llm_calls("write the report") == 1
+    planner.plan("write the report")
+    # Admission paid for the first call; both retries waited on the bucket
+    assert client.calls == MAX_ATTEMPTS
+    assert bucket.taken == MAX_ATTEMPTS - 1
+
+
+def test_invalid_input_and_cache_hits_cost_no_quota(app_module, client, login, monkeypatch):
+    monkeypatch.setattr(app_module, "client", object())
+    monkeypatch.setattr(app_module.planner, "client", VagueClient())
+    controller = AdmissionController(per_minute=6000, burst=100, user_per_minute=60, user_burst=1)
+    monkeypatch.setattr(app_module, "admission", controller)
+    headers = login("free@example.com")
+    app_module.plan_cache.put("write the sonnet", "neutral", ["Open a blank page.", "Write one line."])
+
+    assert client.post("/generate-plan", json={"tasks": "why am I so lazy"}, headers=headers).status_code == 400
+    response = client.post("/generate-plan", json={"tasks": "write the sonnet"}, headers=headers)
+    assert response.status_code == 200
+    assert response.json()["plan"][0]["all_steps"] == ["Open a blank page.", "Write one line."]
+    # Neither request touched the user's single token
+    assert controller._users == {}
+    assert client.post("/generate-plan", json={"tasks": "write the essay"}, headers=headers).status_code == 200
+    assert client.post("/generate-plan", json={"tasks": "write the poem"}, headers=headers).status_code == 429
@@ -0,0 +1,98 @@
+"""
+Tests for batch plan generation (backend/batch.py).
+Run with: python -m pytest test_batch.py
+"""
+import json
+
+from backend.admission import AdmissionController
+from backend.batch import generate_plans_batch
+from backend.history import TaskHistory
+from backend.planner import PlanGenerator
+from backend.step_templates import StepTemplates
+
+
+class FlakyPlanner(PlanGenerator):
+    """Offline planner whose "boom" input fails like an unexpected upstream error"""
+
+    def plan(self, user_input, deadline=None):
+        if user_input == "boom":
+            raise RuntimeError("upstream exploded")
+        return super().plan(user_input, deadline)
+
+
+def _run(tmp_path, items, concurrency=4):
+    history = TaskHistory(str(tmp_path / "history.json"))
+    writes = []
+    write = history.store._write
+    history.store._write = lambda: (writes.append(1), write())
+    planner = FlakyPlanner(None, templates=StepTemplates())
+    lines = [json.dumps(result) for result in generate_plans_batch(planner, history, items, concurrency)]
+    return history, writes, [json.loads(line) for line in lines]
+
+
+def test_one_line_per_item_then_summary(tmp_path):
+    items = [{"tasks": f"clean my desk {i}", "energy_level": "low"} for i in range(10)]
+    history, writes, results = _run(tmp_path, items)
+
+    *plans, summary = results
+    assert summary == {"status": "done", "total": 10, "saved": 10}
+    assert sorted(r["index"] for r in plans) == list(range(10))
+    assert all(r["status"] == "ok" and r["plan"][0]["all_steps"] for r in plans)
+    # Every plan saved, in one file write
+    assert len(writes) == 1
+    assert sorted(e["user_query"] for e in history.get_all_history()) == sorted(i["tasks"] for i in items)
+    assert {e["energy_level"] for e in history.get_all_history()} == {"low"}
+
+
+def test_per_item_errors_do_not_stop_the_batch(tmp_path):
+    items = [{"tasks": "wash the dishes"}, {"tasks": "why am I so lazy"}, {"tasks": "boom"},
+             {"tasks": "pay the rent"}]
+    history, writes, results = _run(tmp_path, items, concurrency=1)
+
+    by_index = {r["index"]: r for r in results[:-1]}
+    assert [by_index[i]["status"] for i in range(4)] == ["ok", "error", "error", "ok"]
+    assert "Internal server error" in by_index[2]["detail"]
+    assert results[-1] == {"status": "done", "total": 4, "saved": 2}
+    assert len(writes) == 1
+    assert sorted(e["user_query"] for e in history.get_all_history()) == ["pay the rent", "wash the dishes"]
+
+
+def test_nothing_written_when_every_item_fails(tmp_path):
+    history, writes, results = _run(tmp_path, [{"tasks": "boom"}])
+    assert results[-1]["saved"] == 0
+    assert writes == [] and history.get_all_history() == []
+
+
+def test_batch_endpoint_needs_login(client, login):
+    body = {"items": [{"tasks": "wash the dishes", "energy_level": "low"}]}
+    assert client.post("/generate-plan/batch", json=body).status_code == 401
+
+    response = client.post("/generate-plan/batch", json=body, headers=login("batch@example.com"))
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert lines[0]["status"] == "ok"
+    assert lines[-1] == {"status": "done", "total": 1, "saved": 1}
+
+
+def test_batch_is_charged_to_the_callers_quota(app_module, client, login, monkeypatch):
+    # Pretend an LLM is configured; every request below is turned away before calling it
+    monkeypatch.setattr(app_module, "client", object())
+    monkeypatch.setattr(app_module.batch_planner, "client", object())
+    monkeypatch.setattr(app_module, "admission", AdmissionController(
+        per_minute=6000, burst=100, user_per_minute=60, user_burst=3))
+    headers = login("quota@example.com")
+
+    def batch(*tasks):
+        items = [{"tasks": task} for task in tasks]
+        return client.post("/generate-plan/batch", json={"items": items}, headers=headers)
+
+    # 400 items at 1/s never fit in the 300s cap
+    assert batch(*[f"ponder the universe {i}" for i in range(400)]).status_code == 400
+
+    monkeypatch.setattr(app_module, "generate_plans_batch", lambda *args, **kwargs: iter([]))
+    assert batch("ponder the universe 1", "ponder the universe 2", "ponder the universe 3").status_code == 200
+    # The batch used up the user's share, so the next one waits its turn
+    rejected = batch("ponder the universe 4")
+    assert rejected.status_code == 429
+    assert int(rejected.headers["retry-after"]) >= 1
@@ -0,0 +1,104 @@
+"""
+Tests for the memory-mapped history columns (backend/columnar.py) and the
+vectorized SmartAnalytics built on them.
+Run with: python -m pytest test_columnar.py
+"""
+import tracemalloc
+
+import numpy as np
+
+from backend.analytics import SmartAnalytics
+from backend.columnar import INITIAL_CAPACITY
+from backend.history import TaskHistory
+
+PLAN = [{"task": "Task", "all_steps": ["one", "two"]}, {"task": "Other", "all_steps": ["three"]}]
+
+
+def test_columns_follow_history(tmp_path):
+    history = TaskHistory(str(tmp_path / "history.json"))
+    history.add_entries([  # forces one growth
+        {"user_query": f"task {i}", "generated_plan": PLAN, "energy_level": ("low", "high", "sleepy")[i % 3]}
+        for i in range(INITIAL_CAPACITY + 8)
+    ])
+    history.add_entry("task", PLAN, energy_level="low")
+    history.add_entry("task", PLAN, energy_level="high")
+    history.mark_completed(5)
+
+    columns = history.columns.read()
+    assert len(columns["id"]) == INITIAL_CAPACITY + 10
+    assert list(columns["id"][:3]) == [1, 2, 3]
+    assert list(columns["energy"][:3]) == [0, 2, 3]
+    assert columns["steps"][0] == 3
+    assert columns["completed"].sum() == 1 and columns["completed"][4]
+
+    # A second instance (another worker) maps the same files
+    assert TaskHistory(str(tmp_path / "history.json")).columns.count == INITIAL_CAPACITY + 10
+
+    history.clear_history()
+    assert len(history.columns.read()["id"]) == 0
+
+
+def test_columns_rebuilt_when_missing(tmp_path):
+    path = str(tmp_path / "history.json")
+    history = TaskHistory(path)
+    history.add_entries([{"user_query": f"task {i}", "generated_plan": PLAN} for i in range(3)])
+
+    (tmp_path / "history.columns" / "meta.bin").unlink()
+    assert TaskHistory(path).columns.count == 3
+
+    for column in (tmp_path / "history.columns").glob("id.*.npy"):
+        column.unlink()
+    assert TaskHistory(path).columns.count == 3
+
+
+def test_insights_from_columns(tmp_path):
+    history = TaskHistory(str(tmp_path / "history.json"))
+    analytics = SmartAnalytics(history)
+    assert analytics.get_insights() == {"message": "Not enough data yet."}
+
+    for energy in ("low", "low", "high"):
+        history.add_entry("task", PLAN, energy_level=energy)
+    history.mark_completed(3)
+
+    insights = analytics.get_insights()
+    assert insights["total_sessions"] == 3
+    assert insights["best_energy"] == "high"
+
+
+def test_insights_memory_is_flat(tmp_path):
+    history = TaskHistory(str(tmp_path / "history.json"))
+    rows, batch = 3_000_000, 1_000_000
+    rng = np.random.default_rng(0)
+    for start in range(0, rows, batch):
+        history.columns.append_rows({
+            "id": np.arange(start + 1, start + batch + 1),
+            "ts": np.zeros(batch),
+            "hour": rng.integers(0, 24, batch, dtype=np.int8),
+            "energy": rng.integers(0, 4, batch, dtype=np.int8),
+            "completed": rng.random(batch) < 0.4,
+            "steps": np.full(batch, 4, dtype=np.int32),
+        })
+
+    tracemalloc.start()
+    try:
+        insights = SmartAnalytics(history).get_insights()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    assert insights["total_sessions"] == rows
+    # One chunk of temporaries, not a copy of 3M rows
+    assert peak < 24 * 1024 * 1024
+
+
+def test_growing_writes_new_files_instead_of_replacing_mapped_ones(tmp_path):
+    path = str(tmp_path / "history.json")
+    first = TaskHistory(path)
+    first.add_entry("task", PLAN)
+    second = TaskHistory(path)
+    assert len(second.columns.read()["id"]) == 1  # maps the first capacity
+
+    first.add_entries([{"user_query": f"task {i}", "generated_plan": PLAN} for i in range(INITIAL_CAPACITY)])
+    names = sorted(p.name for p in (tmp_path / "history.columns").glob("*.npy"))
+    assert names == sorted(f"{name}.{2 * INITIAL_CAPACITY}.npy" for name in first.columns._arrays)
+    assert len(second.columns.read()["id"]) == INITIAL_CAPACITY + 1
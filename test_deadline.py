@@ -0,0 +1,56 @@
+"""
+Tests for the per-request deadline (backend/deadline.py).
+Run with: python -m pytest test_deadline.py
+"""
+import time
+from types import SimpleNamespace
+
+from backend.deadline import Deadline, DEFAULT_TIMEOUT, MAX_TIMEOUT
+from backend.planner import PlanGenerator, FALLBACK_STEPS
+
+
+class SlowClient:
+    """Fake Groq client: every call takes `seconds` and records its timeout"""
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.timeouts = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        self.timeouts.append(kwargs.get("timeout"))
+        time.sleep(self.seconds)
+        content = "1. Open the document\n2. Write one sentence\n3. Save the file"
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+def test_from_header():
+    assert Deadline.from_header("5").remaining() <= 5
+    assert Deadline.from_header(str(MAX_TIMEOUT * 10)).remaining() <= MAX_TIMEOUT
+    for bad in (None, "", "soon", "-1", "inf", "nan"):
+        assert DEFAULT_TIMEOUT - 1 < Deadline.from_header(bad).remaining() <= DEFAULT_TIMEOUT
+
+
+def test_cancel_ends_budget():
+    deadline = Deadline(30)
+    deadline.cancel()
+    assert deadline.cancelled and deadline.expired and not deadline.allows_llm_call()
+
+
+def test_plan_is_partial_when_budget_runs_out():
+    client = SlowClient(1.2)
+    planner = PlanGenerator(client)
+    result = planner.plan("write the report, then clean the kitchen, then call mom", Deadline(2.5))
+
+    assert result["partial"] is True
+    # Two calls fit in the budget, each bounded by what was left of it
+    assert len(client.timeouts) == 2
+    assert client.timeouts[0] <= 2.5 and client.timeouts[1] < client.timeouts[0]
+    assert result["plan"][-1]["all_steps"] == list(FALLBACK_STEPS)
+
+
+def test_plan_without_deadline_is_complete():
+    client = SlowClient(0)
+    result = PlanGenerator(client).plan("write the report")
+    assert result["partial"] is False
+    assert client.timeouts == [None]
@@ -0,0 +1,96 @@
+"""
+Tests for learned energy profiles (backend/energy_profile.py).
+Run with: python -m pytest test_energy_profile.py
+"""
+import datetime
+
+import numpy as np
+
+from backend.energy_profile import EnergyProfiles
+from backend.history import TaskHistory
+from backend.scheduler import EnergyScheduler
+
+MONDAY = datetime.datetime(2026, 1, 5)
+
+
+def _at(day: int, hour: int) -> str:
+    return (MONDAY + datetime.timedelta(days=day, hours=hour)).isoformat()
+
+
+def _train(profiles, weeks=3):
+    # Sessions at 7am and 3pm every day; only the 3pm ones get finished
+    for day in range(7 * weeks):
+        for hour in (7, 15):
+            timestamp = _at(day, hour)
+            profiles.record([timestamp])
+            if hour == 15:
+                profiles.record([timestamp], completed=True)
+
+
+def test_decay_halves_weight_after_half_life(tmp_path):
+    profiles = EnergyProfiles(str(tmp_path), half_life_days=7, min_sessions=0)
+    profiles.record([_at(0, 9)])
+    profiles.record([_at(0, 9)], completed=True)
+    profile = profiles._load("default")
+
+    now = datetime.datetime.fromisoformat(_at(7, 9)).timestamp()
+    sessions, completions = profile.decayed(now, profiles.rate)
+    assert np.isclose(sessions[0, 9], 0.5)
+    assert np.isclose(completions[0, 9], 0.5)
+
+
+def test_rebase_keeps_values(tmp_path):
+    profiles = EnergyProfiles(str(tmp_path), half_life_days=1)
+    profiles.record([_at(0, 9)])
+    # ~2 years at a one-day half-life forces a rebase
+    profiles.record([_at(730, 9)])
+    profile = profiles._load("default")
+    now = datetime.datetime.fromisoformat(_at(730, 9)).timestamp()
+    sessions, _ = profile.decayed(now, profiles.rate)
+    assert np.isfinite(profile.sessions).all()
+    assert np.isclose(sessions.sum(), 1.0)
+
+
+def test_learned_table_follows_completions(tmp_path):
+    profiles = EnergyProfiles(str(tmp_path), min_sessions=10)
+    _train(profiles)
+    scheduler = EnergyScheduler(profiles)
+    now = datetime.datetime.fromisoformat(_at(21, 0)).timestamp()
+
+    table = profiles.energy_table("default", 2, scheduler.energy_by_hour, now=now)
+    assert table[15] == "high"
+    assert table[7] == "low"
+    # Hours without data keep the default pattern
+    assert table[10] == scheduler.energy_by_hour[10]
+
+
+def test_not_enough_data_uses_defaults(tmp_path):
+    profiles = EnergyProfiles(str(tmp_path), min_sessions=10)
+    profiles.record([_at(0, 15)])
+    scheduler = EnergyScheduler(profiles)
+    assert scheduler.energy_table(0) is scheduler.energy_by_hour
+
+
+def test_history_listener_and_persistence(tmp_path):
+    profiles = EnergyProfiles(str(tmp_path / "profiles"), min_sessions=0)
+    history = TaskHistory(str(tmp_path / "history.json"))
+    history.add_listener(profiles)
+
+    entry = history.add_entry("write report", [])
+    history.mark_completed(entry["id"])
+    # Completing twice counts once
+    history.mark_completed(entry["id"])
+
+    reloaded = EnergyProfiles(str(tmp_path / "profiles"), min_sessions=0)
+    profile = reloaded._load("default")
+    assert np.isclose(profile.completions.sum() / profile.sessions.sum(), 1.0)
+    assert reloaded.summary()["learned"]
+
+
+def test_backfill_runs_once(tmp_path):
+    profiles = EnergyProfiles(str(tmp_path))
+    entries = [{"timestamp": _at(0, 9), "completed": True}, {"timestamp": _at(1, 9), "completed": False}]
+    assert profiles.backfill(entries)
+    assert not profiles.backfill(entries)
+    profile = profiles._load("default")
+    assert profile.completions.sum() < profile.sessions.sum()
@@ -0,0 +1,66 @@
+"""
+Tests for the compact history records (backend/history_records.py).
+Run with: python -m pytest test_history_records.py
+"""
+import json
+from datetime import datetime, timedelta
+
+from backend.history import TaskHistory
+from backend.history_records import HistoryEntry, PlanItem, StringTable
+
+
+def _plan(task, steps):
+    return [{"task": task, "current_step": steps[0], "next_step_index": 1,
+             "total_steps": len(steps), "all_steps": list(steps)}]
+
+
+def test_round_trip_is_exact():
+    entry = {
+        "id": 7,
+        "timestamp": "2026-01-29T21:13:21.105973",
+        "user_query": "clean room",
+        "energy_level": "medium",
+        "mood": "stressed",
+        "generated_plan": _plan("Clean room", ["Pick up trash.", "Wipe the desk."])
+                          + [{"task": "hand written", "all_steps": ["a"]}],
+        "completed": True,
+        "user_id": "alice@example.com",
+        "completed_at": "2026-01-29T22:00:00",
+        "note": {"kept": True},
+    }
+    record = HistoryEntry.from_dict(json.loads(json.dumps(entry)), StringTable())
+    assert record.to_dict() == entry
+    assert list(record.to_dict()) == list(entry)
+    assert isinstance(record.plan[0], PlanItem) and isinstance(record.plan[1], dict)
+
+
+def test_entries_share_strings(tmp_path):
+    history = TaskHistory(str(tmp_path / "history.json"))
+    steps = ["Fill the sink.", "Wash the cups."]
+    for _ in range(3):
+        history.add_entry("wash dishes", json.loads(json.dumps(_plan("Wash dishes", steps))), "low")
+
+    first, *rest = history.entries
+    for other in rest:
+        assert other.plan[0].steps[1] is first.plan[0].steps[1]
+        assert other.energy_level is first.energy_level
+    assert len(history.strings) == 3
+
+    # The file and the API keep the plain JSON shape
+    with open(history.store.path, encoding="utf-8") as f:
+        assert json.load(f) == history.get_all_history()
+    assert history.get_entry_by_id(2)["generated_plan"] == _plan("Wash dishes", steps)
+
+
+def test_time_filters_and_completion(tmp_path):
+    history = TaskHistory(str(tmp_path / "history.json"))
+    history.add_entries([{"user_query": f"task {i}", "generated_plan": []} for i in range(3)])
+    now = datetime.now()
+
+    assert len(list(history.iter_entries(start=(now - timedelta(minutes=1)).isoformat()))) == 3
+    assert list(history.iter_entries(end=(now - timedelta(minutes=1)).isoformat())) == []
+
+    assert history.mark_completed(2)
+    completed = history.get_entry_by_id(2)
+    assert completed["completed"] and datetime.fromisoformat(completed["completed_at"]) >= now
+    assert TaskHistory(history.store.path).get_entry_by_id(2) == completed
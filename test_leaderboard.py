@@ -0,0 +1,125 @@
+"""
+Tests for the XP / streak leaderboard (backend/leaderboard.py).
+Run with: python -m pytest test_leaderboard.py
+"""
+from datetime import date
+
+import pytest
+
+from backend import leaderboard as leaderboard_module
+from backend.gamification import GamificationSystem, MAX_XP_PER_EVENT
+from backend.leaderboard import Leaderboard, display_name
+from backend.shared_state import user_file_name
+
+
+def _users(rows):
+    names = {display_name(f"{user}@x"): user for user in "abcde"}
+    return [names[row["user"]] for row in rows]
+
+
+def test_ranks_ties_and_window():
+    board = Leaderboard(path=None)
+    for user, xp in [("a@x", 300), ("b@x", 200), ("c@x", 200), ("d@x", 100), ("e@x", 50)]:
+        board.update(user, xp, 1)
+
+    top = board.top("xp", 3)
+    assert [r["rank"] for r in top] == [1, 2, 2] and _users(top) == ["a", "b", "c"]
+    assert board.rank("d@x") == 4
+    around = board.around("d@x", radius=1)
+    assert _users(around) == ["c", "d", "e"]
+    assert around[1]["you"] is True
+
+    board.update("e@x", 500, 2)
+    assert board.rank("e@x") == 1 and board.rank("a@x") == 2
+    assert board.rank("e@x", "streak") == 1
+    assert board.rank("nobody@x") is None
+
+
+def test_journal_is_shared_between_workers(tmp_path, monkeypatch):
+    monkeypatch.setattr(leaderboard_module, "MIN_COMPACT_LINES", 4)
+    path = str(tmp_path / "leaderboard.log")
+    first, second = Leaderboard(path), Leaderboard(path)
+    first.update("a@x", 10, 1)
+    second.update("b@x", 20, 1)
+    assert _users(first.top()) == ["b", "a"]
+
+    # Enough updates to compact; the other instance rebuilds from the new file
+    for xp in range(11, 30):
+        first.update("a@x", xp, 1)
+    assert sum(1 for _ in open(path)) < 10  # 21 updates written
+    assert second.rank("a@x") == 1
+    assert Leaderboard(path).scores == {"a@x": (29, 1), "b@x": (20, 1)}
+
+
+def test_gamification_feeds_leaderboard(tmp_path):
+    board = Leaderboard(str(tmp_path / "leaderboard.log"))
+    gamification = GamificationSystem(str(tmp_path / "anon.json"), str(tmp_path / "users"), leaderboard=board)
+    gamification.add_xp(30, "a@x")
+    gamification.add_xp(50, "b@x")
+    gamification.add_xp(50)  # anonymous: never ranked
+
+    assert len(board) == 2 and board.rank("b@x") == 1
+    assert gamification.get_stats("a@x")["xp"] == 30
+
+    rebuilt = Leaderboard(str(tmp_path / "rebuilt.log"))
+    assert rebuilt.backfill(gamification.user_totals())
+    assert rebuilt.scores == board.scores
+
+
+def test_public_names_do_not_reveal_emails():
+    board = Leaderboard(path=None)
+    board.update("alice.smith@example.com", 10, 1)
+    [row] = board.top()
+    assert "alice" not in row["user"] and "example" not in row["user"]
+    assert row["user"] == display_name("alice.smith@example.com") != display_name("bob@example.com")
+
+
+def test_lapsed_streaks_drop_out_of_the_ranking(tmp_path, monkeypatch):
+    today = [date(2026, 3, 10)]
+    monkeypatch.setattr(leaderboard_module, "_today", lambda: today[0])
+    path = str(tmp_path / "leaderboard.log")
+    board = Leaderboard(path)
+    board.update("a@x", 100, 9, "2026-03-09")
+    board.update("b@x", 100, 3, "2026-03-10")
+    assert _users(board.top("streak")) == ["a", "b"]
+
+    # Nobody acted, but a day passed: a's streak can no longer be continued
+    today[0] = date(2026, 3, 11)
+    top = board.top("streak")
+    assert _users(top) == ["b", "a"] and [r["streak"] for r in top] == [3, 0]
+    assert board.rank("a@x", "streak") == 2
+    # A worker that starts later sees the same thing from the journal
+    assert Leaderboard(path).scores == {"a@x": (100, 0), "b@x": (100, 3)}
+
+
+def test_gamification_stats_expire_the_streak(tmp_path, monkeypatch):
+    gamification = GamificationSystem(str(tmp_path / "anon.json"), str(tmp_path / "users"))
+    gamification.add_xp(10, "a@x")
+    assert gamification.get_stats("a@x")["streak"] == 1
+    with gamification._store("a@x").transaction() as data:
+        data["last_active"] = "2020-01-01"
+    assert gamification.get_stats("a@x")["streak"] == 0
+    assert [row[3] for row in gamification.user_totals()] == ["2020-01-01"]
+
+
+def test_email_named_gamification_files_are_adopted(tmp_path):
+    users = tmp_path / "users"
+    GamificationSystem(str(tmp_path / "anon.json"), str(users)).add_xp(40, "a@x")
+    [path] = users.glob("*.json")
+    path.rename(users / "a@x.json")
+
+    gamification = GamificationSystem(str(tmp_path / "anon.json"), str(users))
+    assert gamification.get_stats("a@x")["xp"] == 40
+    assert [p.name for p in users.glob("*.json")] == [user_file_name("a@x") + ".json"]
+
+
+def test_xp_amounts_are_bounded(tmp_path, client, login):
+    gamification = GamificationSystem(str(tmp_path / "anon.json"), str(tmp_path / "users"))
+    with pytest.raises(ValueError):
+        gamification.add_xp(MAX_XP_PER_EVENT + 1, "a@x")
+
+    headers = login("xp@example.com")
+    for amount in (10**9, 0, -50):
+        assert client.post("/api/gamification/xp", json={"amount": amount}, headers=headers).status_code == 422
+    response = client.post("/api/gamification/xp", json={"amount": MAX_XP_PER_EVENT}, headers=headers)
+    assert response.status_code == 200 and response.json()["xp"] == MAX_XP_PER_EVENT
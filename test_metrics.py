@@ -0,0 +1,77 @@
+"""
+Tests for the in-process metrics and the /metrics endpoint (backend/metrics.py).
+Run with: python -m pytest test_metrics.py
+"""
+import pytest
+
+from backend.metrics import MetricsRegistry, HTTP_REQUEST_SECONDS
+
+
+def test_render_text_format():
+    registry = MetricsRegistry()
+    requests = registry.counter("requests_total", "Requests.", ["path"])
+    depth = registry.gauge("queue_depth", "Queued.")
+    latency = registry.histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0))
+
+    requests.inc(path='/a"b')
+    requests.inc(2, path='/a"b')
+    depth.set(3)
+    depth.dec()
+    latency.observe(0.05)
+    latency.observe(0.5)
+    latency.observe(5)
+
+    assert registry.render().splitlines() == [
+        "# HELP requests_total Requests.",
+        "# TYPE requests_total counter",
+        'requests_total{path="/a\\"b"} 3',
+        "# HELP queue_depth Queued.",
+        "# TYPE queue_depth gauge",
+        "queue_depth 2",
+        "# HELP latency_seconds Latency.",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{le="0.1"} 1',
+        'latency_seconds_bucket{le="1"} 2',
+        'latency_seconds_bucket{le="+Inf"} 3',
+        "latency_seconds_sum 5.55",
+        "latency_seconds_count 3",
+    ]
+
+
+def test_render_is_a_consistent_snapshot():
+    registry = MetricsRegistry()
+    latency = registry.histogram("latency_seconds", "Latency.", ["route"], buckets=(1.0,))
+    latency.observe(0.5, route="/a")
+    lines = latency.render()
+    first = next(lines)
+    # Observations during a scrape land in the next one
+    latency.observe(0.5, route="/a")
+    latency.observe(0.5, route="/b")
+    assert [first, *lines] == [
+        'latency_seconds_bucket{route="/a",le="1"} 1',
+        'latency_seconds_bucket{route="/a",le="+Inf"} 1',
+        'latency_seconds_sum{route="/a"} 0.5',
+        'latency_seconds_count{route="/a"} 1',
+    ]
+
+
+def test_duplicate_names_are_rejected():
+    registry = MetricsRegistry()
+    registry.counter("x_total", "X.")
+    with pytest.raises(ValueError):
+        registry.gauge("x_total", "X again.")
+
+
+def test_http_latency_is_labelled_by_route_template(client):
+    before = HTTP_REQUEST_SECONDS.count(method="GET", path="/api/history/{entry_id}", status=401)
+    for entry_id in (1, 2, 3):
+        client.get(f"/api/history/{entry_id}")
+    assert HTTP_REQUEST_SECONDS.count(method="GET", path="/api/history/{entry_id}", status=401) == before + 3
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    body = response.text
+    assert 'path="/api/history/{entry_id}"' in body
+    assert 'path="/api/history/1"' not in body
+    assert "# TYPE http_request_duration_seconds histogram" in body
@@ -0,0 +1,107 @@
+"""
+Tests for per-user history partitions (backend/partitions.py).
+Run with: python -m pytest test_partitions.py
+"""
+import os
+
+from backend.partitions import HistoryPartitions
+from backend.shared_state import user_file_name
+
+
+class Recorder:
+    def __init__(self):
+        self.added = []
+
+    def entries_added(self, entries):
+        self.added.extend(entries)
+
+
+def test_users_only_see_their_own_history(tmp_path):
+    partitions = HistoryPartitions(str(tmp_path))
+    alice = partitions.get("alice@example.com")
+    bob = partitions.get("bob@example.com")
+    alice.history.add_entry("write report", [{"task": "write report", "all_steps": ["a"]}])
+    alice.history.add_entry("clean kitchen", [])
+    bob.history.add_entry("write essay", [])
+
+    assert [e["user_query"] for e in alice.history.search_history("write")] == ["write report"]
+    assert [e["id"] for e in bob.history.get_all_history()] == [1]
+    assert bob.history.get_entry_by_id(1)["user_id"] == "bob@example.com"
+    assert alice.analytics.get_insights()["total_sessions"] == 2
+    assert os.path.exists(tmp_path / (user_file_name("alice@example.com") + ".json"))
+
+    bob.history.clear_history()
+    assert len(alice.history.get_all_history()) == 2
+
+
+def test_lru_reopens_from_disk_with_listeners(tmp_path):
+    recorder = Recorder()
+    partitions = HistoryPartitions(str(tmp_path), max_open=1)
+    partitions.add_listener(recorder)
+    partitions.get("alice").history.add_entry("first", [])
+    partitions.get("bob")
+    assert len(partitions) == 1
+
+    alice = partitions.get("alice")
+    alice.history.add_entry("second", [])
+    assert [e["id"] for e in alice.history.get_all_history()] == [1, 2]
+    assert [e["user_id"] for e in recorder.added] == ["alice", "alice"]
+    assert alice.rollups.store.data["day"]
+
+
+def test_unsafe_user_ids_are_hashed(tmp_path):
+    partitions = HistoryPartitions(str(tmp_path))
+    partitions.get("../etc/passwd").history.add_entry("x", [])
+    names = os.listdir(tmp_path)
+    assert names and all(not name.startswith(".") for name in names)
+    assert not (tmp_path.parent / "etc").exists()
+
+
+def test_hot_entries_are_read_without_opening_partitions(tmp_path):
+    partitions = HistoryPartitions(str(tmp_path), max_open=1)
+    partitions.get("alice").history.add_entry("first", [])
+    partitions.get("../bob").history.add_entry("second", [])
+    partitions.get("carol")  # opened but never written
+    before = sorted(os.listdir(tmp_path))
+
+    assert sorted(e["user_query"] for e in partitions.iter_hot_entries()) == ["first", "second"]
+    assert list(partitions.iter_hot_entries(since="2999-01-01")) == []
+    assert len(partitions.paths()) == 2
+    assert sorted(os.listdir(tmp_path)) == before and len(partitions) == 1
+
+
+def test_backfills_run_when_a_partition_opens(tmp_path):
+    seen = []
+    partitions = HistoryPartitions(str(tmp_path), max_open=1)
+    partitions.get("alice").history.add_entry("first", [])
+    partitions.add_backfill(lambda entries, user_id: seen.append((user_id, [e["user_query"] for e in entries])))
+    partitions.get("bob")
+    partitions.get("alice")
+    assert seen == [("bob", []), ("alice", ["first"])]
+
+
+def test_user_ids_cannot_reach_each_others_files(tmp_path):
+    partitions = HistoryPartitions(str(tmp_path))
+    victim = partitions.get("a@b")
+    victim.history.add_entry("mine", [{"task": "mine", "all_steps": ["a"]}])
+    partitions.get("a@b.rollups").history.add_entry("theirs", [])
+    partitions.get("A@B").history.add_entry("shouty", [])
+
+    assert [e["user_query"] for e in victim.history.get_all_history()] == ["mine"]
+    assert victim.rollups.store.data["day"]
+    names = [name.lower() for name in os.listdir(tmp_path)]
+    assert len(names) == len(set(names))  # nothing collides on a case-insensitive disk
+
+
+def test_email_named_partitions_are_adopted(tmp_path):
+    old = HistoryPartitions(str(tmp_path))
+    legacy = old.get("alice@example.com")
+    legacy.history.add_entry("from before", [])
+    for suffix in (".json", ".rollups.json", ".archive", ".columns"):
+        os.rename(tmp_path / (user_file_name("alice@example.com") + suffix), tmp_path / ("alice@example.com" + suffix))
+
+    partitions = HistoryPartitions(str(tmp_path))
+    # A rollups file is not a history: "alice@example.com.rollups" gets a fresh partition
+    assert partitions.get("alice@example.com.rollups").history.get_all_history() == []
+    assert [e["user_query"] for e in partitions.get("alice@example.com").history.get_all_history()] == ["from before"]
+    assert not (tmp_path / "alice@example.com.json").exists()
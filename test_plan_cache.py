@@ -0,0 +1,116 @@
+"""
+Tests for the plan cache and off-peak cache warming
+(backend/plan_cache.py, backend/cache_warmer.py).
+Run with: python -m pytest test_plan_cache.py
+"""
+import itertools
+
+import pytest
+
+from backend import plan_cache
+from backend.cache_warmer import CacheWarmer
+from backend.history import TaskHistory
+from backend.partitions import HistoryPartitions
+from backend.plan_cache import PlanCache
+from backend.planner import PlanGenerator
+
+
+def _clock(monkeypatch, start=1_000_000.0):
+    ticks = itertools.count()
+    now = {"offset": 0.0}
+    monkeypatch.setattr(plan_cache.time, "time", lambda: start + next(ticks) + now["offset"])
+    return now
+
+
+def test_hit_miss_and_normalization(tmp_path):
+    cache = PlanCache(str(tmp_path / "cache.json"))
+    assert cache.get("Clean my room", "neutral") is None
+
+    cache.put("Clean my room", "neutral", ["Pick up trash."])
+    assert cache.get("  clean MY room! ", "neutral") == ["Pick up trash."]
+    assert cache.get("clean my room", "stressed") is None
+    assert PlanCache.key("clean my room", "neutral") in cache
+    # Another worker's instance sees the same file
+    assert PlanCache(cache.store.path).get("clean my room", "neutral") == ["Pick up trash."]
+
+
+def test_entries_expire_after_ttl(tmp_path, monkeypatch):
+    now = _clock(monkeypatch)
+    cache = PlanCache(str(tmp_path / "cache.json"), ttl_days=1)
+    cache.put("pay rent", "neutral", ["Open the app."])
+    now["offset"] = 2 * 86400
+    assert cache.get("pay rent", "neutral") is None
+    assert PlanCache.key("pay rent", "neutral") not in cache
+
+
+def test_oldest_entries_are_evicted(tmp_path, monkeypatch):
+    _clock(monkeypatch)
+    cache = PlanCache(str(tmp_path / "cache.json"), max_entries=2)
+    for task in ("first", "second", "third"):
+        cache.put(task, "neutral", [task])
+
+    assert len(cache) == 2
+    assert cache.get("first", "neutral") is None
+    assert cache.get("third", "neutral") == ["third"]
+
+
+def _warmer(tmp_path, top_n=1):
+    history = TaskHistory(str(tmp_path / "history.json"))
+    cache = PlanCache(str(tmp_path / "cache.json"))
+    warmer = CacheWarmer(history, PlanGenerator(None), cache, top_n=top_n, window=None,
+                         state_path=str(tmp_path / "warm.json"))
+    return history, cache, warmer
+
+
+def _add(history, *tasks, mood="neutral"):
+    history.add_entry(" and ".join(tasks), [{"task": task, "all_steps": ["x"]} for task in tasks], mood=mood)
+
+
+def test_top_tasks_per_category_and_mood(tmp_path):
+    history, _, warmer = _warmer(tmp_path, top_n=1)
+    for _ in range(3):
+        _add(history, "Clean my room")
+    _add(history, "Clean the kitchen")
+    _add(history, "Study for exam", "Clean my room")
+    _add(history, "Clean the kitchen", mood="stressed")
+
+    top = {(item["category"], item["mood"]): (item["task"], item["count"]) for item in warmer.top_tasks()}
+    assert top[("cleaning", "neutral")] == ("clean my room", 4)
+    assert top[("cleaning", "stressed")] == ("clean the kitchen", 1)
+    assert top[("studying", "neutral")] == ("study for exam", 1)
+    assert len(top) == 3
+
+
+def test_coverage_counts_requests_fully_served_from_cache(tmp_path):
+    history, cache, warmer = _warmer(tmp_path)
+    _add(history, "Clean my room")
+    _add(history, "Clean my room", "Pay rent")
+    _add(history, "Pay rent")
+    cache.put("clean my room", "neutral", ["Pick up trash."])
+
+    assert warmer.coverage() == {"days": 7, "requests": 3, "request_coverage": 0.333, "task_coverage": 0.5}
+
+
+def test_warmer_reads_every_user_partition(tmp_path):
+    partitions = HistoryPartitions(str(tmp_path / "history"))
+    history, cache, _ = _warmer(tmp_path)
+    warmer = CacheWarmer(history, PlanGenerator(None), cache, window=None,
+                         state_path=str(tmp_path / "warm.json"), partitions=partitions)
+    _add(history, "Pay rent")
+    _add(partitions.get("alice@example.com").history, "Clean my room")
+    _add(partitions.get("bob@example.com").history, "Clean my room")
+    cache.put("clean my room", "neutral", ["Pick up trash."])
+
+    top = {item["task"]: item["count"] for item in warmer.top_tasks()}
+    assert top == {"clean my room": 2, "pay rent": 1}
+    assert warmer.coverage()["requests"] == 3
+    assert warmer.coverage()["request_coverage"] == 0.667
+
+
+def test_status_reports_the_last_warm_coverage_without_rescanning(tmp_path, monkeypatch):
+    history, cache, warmer = _warmer(tmp_path)
+    assert warmer.status()["coverage"] is None
+    with warmer.state.transaction() as state:
+        state["last_report"] = {"warmed": 1, "coverage": {"days": 7, "requests": 5}}
+    monkeypatch.setattr(warmer, "coverage", lambda *args: pytest.fail("status() rescanned history"))
+    assert warmer.status()["coverage"] == {"days": 7, "requests": 5}
@@ -0,0 +1,55 @@
+"""
+Tests for opt-in request profiling (backend/profiling.py).
+Run with: python -m pytest test_profiling.py
+"""
+import os
+from types import SimpleNamespace
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend import profiling
+from backend.profiling import ProfileStore
+
+
+def _profiler(samples=3):
+    return SimpleNamespace(stacks={"handler (backend/app.py);work (backend/planner.py)": samples},
+                           samples=samples)
+
+
+def test_ring_buffer_keeps_latest_and_deletes_evicted_files(tmp_path):
+    store = ProfileStore(str(tmp_path), keep=2)
+    first, second, third = (store.save("GET", f"/path/{i}", 0.01, _profiler()) for i in range(3))
+
+    assert [record["id"] for record in store.list()] == [third["id"], second["id"]]
+    assert store.get(first["id"]) is None
+    assert not os.path.exists(first["file"])
+    with open(third["file"], encoding="utf-8") as f:
+        assert f.read() == "handler (backend/app.py);work (backend/planner.py) 3\n"
+
+
+def _admin_client(monkeypatch, tmp_path, token):
+    monkeypatch.setattr(profiling, "PROFILE_TOKEN", token)
+    monkeypatch.setattr(profiling, "profile_store", ProfileStore(str(tmp_path)))
+    app = FastAPI()
+    app.include_router(profiling.router)
+    return TestClient(app)
+
+
+def test_endpoints_are_admin_only(monkeypatch, tmp_path):
+    client = _admin_client(monkeypatch, tmp_path, "secret")
+    record = profiling.profile_store.save("POST", "/generate-plan", 0.2, _profiler())
+    url = f"/api/admin/profiles/{record['id']}"
+
+    assert client.get("/api/admin/profiles").status_code == 404
+    assert client.get(url, headers={"X-Profile-Token": "wrong"}).status_code == 404
+
+    admin = {"X-Profile-Token": "secret"}
+    assert [r["id"] for r in client.get("/api/admin/profiles", headers=admin).json()] == [record["id"]]
+    assert client.get(url, headers=admin).text.endswith(" 3\n")
+
+
+def test_endpoints_hidden_when_disabled(monkeypatch, tmp_path):
+    client = _admin_client(monkeypatch, tmp_path, None)
+    assert client.get("/api/admin/profiles", headers={"X-Profile-Token": ""}).status_code == 404
+    assert client.get("/api/admin/profiles", headers={"X-Profile-Token": "anything"}).status_code == 404
@@ -0,0 +1,108 @@
+"""
+Tests for the focus-mode WebSocket channel (backend/realtime.py).
+Run with: python -m pytest test_realtime.py
+"""
+import pytest
+from fastapi import FastAPI, WebSocket
+from fastapi.testclient import TestClient
+
+from backend.energy_profile import DEFAULT_USER
+from backend.gamification import GamificationSystem, MAX_XP_PER_EVENT
+from backend.realtime import RealtimeHub, TASK_XP
+from backend.sessions import COMPLETION_MESSAGE, PlanSessionStore
+
+
+@pytest.fixture
+def hub(tmp_path):
+    gamification = GamificationSystem(str(tmp_path / "gamification.json"), str(tmp_path / "users"))
+    return RealtimeHub(PlanSessionStore(), gamification,
+                       identify=lambda token: "alice@example.com" if token == "good" else DEFAULT_USER)
+
+
+@pytest.fixture
+def client(hub):
+    app = FastAPI()
+
+    @app.websocket("/ws")
+    async def channel(websocket: WebSocket):
+        await hub.handle(websocket)
+
+    return TestClient(app)
+
+
+def test_step_progress_awards_xp_on_completion(hub, client):
+    [session_id] = hub.plan_sessions.create_plan([{"task": "desk", "all_steps": ["one", "two"]}])
+    with client.websocket_connect("/ws") as ws:
+        ws.send_json({"type": "hello"})
+        welcome = ws.receive_json()
+        assert welcome["type"] == "welcome" and welcome["resumed"] is False
+
+        ws.send_json({"type": "next_step", "session_id": session_id, "step_index": 1})
+        assert ws.receive_json() == {"type": "step", "session_id": session_id, "current_step": "two",
+                                     "next_step_index": 2, "total_steps": 2, "seq": 1}
+
+        ws.send_json({"type": "next_step", "session_id": session_id, "step_index": 2})
+        step, stats = ws.receive_json(), ws.receive_json()
+        assert step["current_step"] == COMPLETION_MESSAGE and "task_completed" not in step
+        assert stats["type"] == "stats" and stats["xp"] == TASK_XP
+
+        ws.send_json({"type": "ping"})
+        assert ws.receive_json() == {"type": "pong"}
+
+
+def test_expired_session_gets_an_error_event(client):
+    with client.websocket_connect("/ws") as ws:
+        ws.send_json({"type": "hello"})
+        ws.receive_json()
+        ws.send_json({"type": "next_step", "session_id": "gone", "step_index": 1})
+        error = ws.receive_json()
+        assert error["type"] == "error" and error["session_id"] == "gone"
+
+
+def test_bad_frames_get_errors_and_keep_the_connection(client):
+    with client.websocket_connect("/ws") as ws:
+        ws.send_json({"type": "stats"})
+        assert ws.receive_json() == {"type": "error", "detail": "Send a hello first."}
+        ws.send_json([1, 2])
+        assert ws.receive_json()["type"] == "error"
+
+        ws.send_json({"type": "hello"})
+        assert ws.receive_json()["type"] == "welcome"
+        ws.send_json([1, 2])
+        assert ws.receive_json() == {"type": "error", "detail": "Messages must be JSON objects."}
+        ws.send_json("ping")
+        assert ws.receive_json()["type"] == "error"
+        ws.send_json({"type": "dance"})
+        assert ws.receive_json()["detail"] == "Unknown message type: dance"
+        ws.send_json({"type": "ping"})
+        assert ws.receive_json() == {"type": "pong"}
+
+
+def test_token_identifies_the_user_and_resume_replays_missed_events(hub, client):
+    with client.websocket_connect("/ws") as ws:
+        ws.send_json({"type": "hello", "token": "good"})
+        client_id = ws.receive_json()["client_id"]
+        ws.send_json({"type": "xp", "amount": 50})
+        assert ws.receive_json()["xp"] == 50
+        ws.send_json({"type": "xp", "amount": 50})
+        assert ws.receive_json()["xp"] == 100
+        assert ws.receive_json() == {"type": "level_up", "level": 2, "seq": 3}
+
+    assert hub.gamification.get_stats("alice@example.com")["xp"] == 100
+    assert hub.gamification.get_stats(DEFAULT_USER)["xp"] == 0
+
+    with client.websocket_connect("/ws") as ws:
+        ws.send_json({"type": "hello", "client_id": client_id, "last_seq": 2, "token": "good"})
+        assert ws.receive_json()["resumed"] is True
+        assert ws.receive_json() == {"type": "level_up", "level": 2, "seq": 3}
+
+
+def test_client_reported_xp_is_bounded(hub, client):
+    with client.websocket_connect("/ws") as ws:
+        ws.send_json({"type": "hello", "token": "good"})
+        ws.receive_json()
+        for amount in (10**9, 0, -50, "50", 50.5):
+            ws.send_json({"type": "xp", "amount": amount})
+            assert ws.receive_json()["type"] == "error"
+        ws.send_json({"type": "xp", "amount": MAX_XP_PER_EVENT})
+        assert ws.receive_json()["xp"] == MAX_XP_PER_EVENT
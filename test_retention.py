@@ -0,0 +1,109 @@
+"""
+Tests for tiered history retention (backend/retention.py).
+Run with: python -m pytest test_retention.py
+"""
+import json
+import os
+from datetime import datetime, timedelta
+
+from backend.history import TaskHistory
+
+
+def _seed(history: TaskHistory, days_ago):
+    """Entries with the given ages (oldest first), written as if logged back then"""
+    now = datetime.now()
+    with history.store.transaction() as entries:
+        for i, age in enumerate(days_ago, start=1):
+            entries.append({
+                "id": i,
+                "timestamp": (now - timedelta(days=age)).isoformat(),
+                "user_query": f"task {i}",
+                "energy_level": "medium",
+                "mood": None,
+                "generated_plan": [],
+                "completed": False,
+            })
+        history.columns.append(entries)
+
+
+def test_old_entries_move_to_segments(tmp_path):
+    path = str(tmp_path / "history.json")
+    history = TaskHistory(path, hot_days=30)
+    _seed(history, [90, 60, 45, 10, 1])
+
+    assert history.archive_old() == 3
+    with open(path, encoding="utf-8") as f:
+        assert [e["id"] for e in json.load(f)] == [4, 5]
+
+    [segment] = history.archive.segments
+    assert (segment["first_id"], segment["last_id"], segment["count"]) == (1, 3, 3)
+    assert os.path.exists(os.path.join(history.archive.directory, segment["file"]))
+
+    # Reads reach into the archive lazily
+    assert history.get_entry_by_id(2)["user_query"] == "task 2"
+    assert [e["id"] for e in history.search_history("task")] == [1, 2, 3, 4, 5]
+    assert [e["id"] for e in history.get_recent_queries(50)] == [3, 4, 5]
+    assert len(history.get_all_history()) == 5
+    assert [e["id"] for e in history.get_all_history(limit=3)] == [3, 4, 5]
+
+    # Ids continue after archived ones; columns still cover everything
+    assert history.add_entry("new", [])["id"] == 6
+    reopened = TaskHistory(path, hot_days=30)
+    assert reopened.columns.count == 6
+    assert reopened.get_entry_by_id(1)["user_query"] == "task 1"
+
+
+def test_archiving_waits_for_a_full_batch(tmp_path):
+    history = TaskHistory(str(tmp_path / "history.json"), hot_days=30)
+    _seed(history, [33, 1])
+    # Only 3 days past the window: not worth a segment yet
+    assert history.archive_old() == 0
+    assert history.archive_old(force=True) == 1
+
+
+def test_deletion_policy_and_clear(tmp_path):
+    history = TaskHistory(str(tmp_path / "history.json"), hot_days=30)
+    _seed(history, [400, 200, 1])
+    history.archive_old(force=True)
+    assert history.archive.count == 2
+
+    assert history.archive.apply_policy(max_days=365) == 0
+    # Newest archived entry is 200 days old
+    assert history.archive.apply_policy(max_days=100) == 1
+    assert history.archive.segments == []
+    assert history.get_entry_by_id(1) is None
+
+    history.clear_history()
+    _seed(history, [90, 1])
+    history.archive_old(force=True)
+    assert history.archive.count == 1
+    history.clear_history()
+    assert history.archive.segments == []
+    assert not [name for name in os.listdir(history.archive.directory) if name.startswith("seg-")]
+
+
+def test_deleted_segments_leave_the_analytics_columns(tmp_path):
+    history = TaskHistory(str(tmp_path / "history.json"), hot_days=300)
+    _seed(history, [400, 399, 200, 1])
+    history.archive_old(force=True)
+    history.hot_days = 30
+    history.archive_old(force=True)
+    assert len(history.archive.segments) == 2 and history.columns.count == 4
+
+    assert history.archive.apply_policy(max_days=300) == 1
+    assert list(history.columns.read()["id"]) == [3, 4]
+    # Another worker sees the same rows, and a restart doesn't rebuild them
+    assert list(TaskHistory(history.store.path, hot_days=30).columns.read()["id"]) == [3, 4]
+
+
+def test_ids_are_never_reused(tmp_path):
+    path = str(tmp_path / "history.json")
+    history = TaskHistory(path, hot_days=30)
+    _seed(history, [200, 100])
+    history.archive_old(force=True)
+    assert history.archive.apply_policy(max_days=50) == 1
+    assert history.archive.segments == [] and history.get_all_history() == []
+
+    assert history.add_entry("after deletion", [])["id"] == 3
+    history.clear_history()
+    assert TaskHistory(path, hot_days=30).add_entry("after clear", [])["id"] == 4
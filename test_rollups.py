@@ -0,0 +1,71 @@
+"""
+Tests for the daily/weekly analytics rollups (backend/rollups.py).
+Run with: python -m pytest test_rollups.py
+"""
+from datetime import date, timedelta
+
+import pytest
+
+from backend.history import TaskHistory
+from backend.rollups import AnalyticsRollups, MAX_POINTS
+
+
+def _entries():
+    return [
+        {"timestamp": "2026-01-05T09:00:00", "mood": "happy", "completed": True,
+         "completed_at": "2026-01-06T10:00:00"},
+        {"timestamp": "2026-01-05T15:00:00", "mood": "stressed", "completed": False},
+        {"timestamp": "2026-01-12T09:00:00", "mood": None, "completed": False},
+    ]
+
+
+def test_backfill_days_and_weeks(tmp_path):
+    rollups = AnalyticsRollups(str(tmp_path / "rollups.json"))
+    assert rollups.backfill(_entries())
+    assert not rollups.backfill(_entries())
+
+    days = rollups.timeseries(date(2026, 1, 5), date(2026, 1, 7))
+    assert [d["sessions"] for d in days] == [2, 0, 0]
+    # Completions count on the day the task was finished
+    assert [d["completions"] for d in days] == [0, 1, 0]
+    assert days[0]["moods"] == {"happy": 1, "stressed": 1}
+
+    weeks = rollups.timeseries(date(2026, 1, 7), date(2026, 1, 12), bucket="week")
+    assert [w["start"] for w in weeks] == ["2026-01-05", "2026-01-12"]
+    assert [(w["sessions"], w["completions"]) for w in weeks] == [(2, 1), (1, 0)]
+    assert weeks[1]["moods"] == {"unknown": 1}
+
+
+def test_incremental_updates_from_history(tmp_path):
+    rollups = AnalyticsRollups(str(tmp_path / "rollups.json"))
+    history = TaskHistory(str(tmp_path / "history.json"))
+    rollups.backfill(history.history)
+    history.add_listener(rollups)
+
+    entry = history.add_entry("write report", [], mood="happy")
+    history.add_entries([{"user_query": "tidy", "generated_plan": []}])
+    history.mark_completed(entry["id"])
+
+    today = date.today()
+    [point] = rollups.timeseries(today, today)
+    assert (point["sessions"], point["completions"]) == (2, 1)
+    assert point["moods"] == {"happy": 1, "unknown": 1}
+
+    history.clear_history()
+    [point] = rollups.timeseries(today, today)
+    assert point["sessions"] == 0
+
+
+def test_long_ranges_are_capped(tmp_path, client, login):
+    rollups = AnalyticsRollups(str(tmp_path / "rollups.json"))
+    start = date(2020, 1, 1)
+    assert len(rollups.timeseries(start, start + timedelta(days=MAX_POINTS - 1))) == MAX_POINTS
+    with pytest.raises(ValueError):
+        rollups.timeseries(start, start + timedelta(days=MAX_POINTS))
+    assert len(rollups.timeseries(date(1990, 1, 1), date(2026, 1, 1), bucket="week")) == 1879
+
+    headers = login("rollups@example.com")
+    response = client.get("/api/analytics/timeseries?from=0001-01-01&to=9999-12-31&bucket=day", headers=headers)
+    assert response.status_code == 400
+    response = client.get("/api/analytics/timeseries?from=2026-01-01&to=2026-01-31", headers=headers)
+    assert len(response.json()["series"]) == 31
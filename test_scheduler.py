@@ -0,0 +1,56 @@
+"""
+Tests for batch scheduling (backend/scheduler.py).
+Run with: python -m pytest test_scheduler.py
+"""
+import datetime
+from collections import Counter
+
+from backend.scheduler import EnergyScheduler
+
+# Monday 08:30: default table is high 9-12 and 18-20, low 14-16, medium otherwise
+NOW = datetime.datetime(2026, 1, 5, 8, 30)
+
+
+def _tasks(*difficulties):
+    return [{"task": f"{difficulty} {i}", "difficulty": difficulty} for i, difficulty in enumerate(difficulties)]
+
+
+def test_each_slot_takes_at_most_capacity_tasks():
+    result = EnergyScheduler().schedule_many(_tasks(*["medium"] * 20), NOW, capacity=3)
+    per_slot = Counter(item["start"] for item in result["scheduled"])
+    assert len(result["scheduled"]) == 20
+    assert max(per_slot.values()) == 3
+
+
+def test_hard_tasks_get_high_energy_slots():
+    tasks = _tasks("easy", "easy", "hard", "hard", "easy")
+    result = EnergyScheduler().schedule_many(tasks, NOW, capacity=1)
+    by_task = {item["task"]: item for item in result["scheduled"]}
+
+    assert [by_task[t]["energy"] for t in ("hard 2", "hard 3")] == ["high", "high"]
+    assert by_task["hard 2"]["start"] == "2026-01-05T09:00"
+    assert by_task["hard 2"]["reason"] == "This is your peak energy time."
+    assert all(by_task[t]["energy"] != "high" for t in ("easy 0", "easy 1", "easy 4"))
+
+
+def test_hard_tasks_spill_to_the_next_best_energy():
+    # Only 9-12 is high within 6 hours; the fourth hard task takes a medium slot
+    result = EnergyScheduler().schedule_many(_tasks(*["hard"] * 4), NOW, capacity=1, horizon=6)
+    assert Counter(item["energy"] for item in result["scheduled"]) == {"high": 3, "medium": 1}
+
+
+def test_overflow_is_reported_not_dropped():
+    tasks = _tasks("hard", "easy", "medium", "easy")
+    result = EnergyScheduler().schedule_many(tasks, NOW, capacity=1, horizon=2)
+
+    assert len(result["scheduled"]) == 2
+    assert len(result["unscheduled"]) == 2
+    placed = {item["task"] for item in result["scheduled"]} | {item["task"] for item in result["unscheduled"]}
+    assert placed == {task["task"] for task in tasks}
+    # Hard tasks are placed first, so they are never the ones left over
+    assert "hard 0" in {item["task"] for item in result["scheduled"]}
+
+
+def test_unknown_difficulty_is_treated_as_medium():
+    result = EnergyScheduler().schedule_many([{"task": "x", "difficulty": "epic"}], NOW)
+    assert result["scheduled"][0]["difficulty"] == "medium"
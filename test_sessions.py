@@ -0,0 +1,72 @@
+"""
+Tests for server-side plan sessions (backend/sessions.py).
+Run with: python -m pytest test_sessions.py
+"""
+from backend import sessions
+from backend.sessions import COMPLETION_MESSAGE, PlanSessionStore
+
+
+def _plan(*tasks):
+    return [{"task": task, "all_steps": [f"{task} step 1", f"{task} step 2"]} for task in tasks]
+
+
+def test_advance_walks_the_steps():
+    store = PlanSessionStore()
+    plan = _plan("desk")
+    [session_id] = store.create_plan(plan, entry_id=1)
+    assert plan[0]["session_id"] == session_id
+
+    assert store.advance(session_id, 1) == {"current_step": "desk step 2", "next_step_index": 2, "total_steps": 2}
+    assert store.advance(session_id, 2) == {"current_step": COMPLETION_MESSAGE, "next_step_index": 2,
+                                            "total_steps": 2, "task_completed": True}
+    # Only the first call past the end reports the completion
+    assert "task_completed" not in store.advance(session_id, 2)
+    assert store.advance("missing", 0) is None
+
+
+def test_plan_completes_once_after_every_task():
+    completed = []
+    store = PlanSessionStore(on_plan_complete=completed.append)
+    first, second = store.create_plan(_plan("desk", "dishes"), entry_id=7)
+
+    store.advance(first, 2)
+    store.advance(first, 2)
+    assert completed == []
+    store.advance(second, 2)
+    store.advance(second, 2)
+    assert completed == [7]
+
+
+def test_per_plan_callback_replaces_the_default():
+    default, owner = [], []
+    store = PlanSessionStore(on_plan_complete=default.append)
+    [session_id] = store.create_plan(_plan("desk"), entry_id=3, on_complete=owner.append)
+    store.advance(session_id, 2)
+    assert (default, owner) == ([], [3])
+
+
+def test_sessions_expire_after_ttl(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(sessions.time, "monotonic", lambda: now[0])
+    store = PlanSessionStore(ttl=60)
+    [session_id] = store.create_plan(_plan("desk"))
+
+    now[0] += 50
+    assert store.advance(session_id, 0) is not None  # use refreshes the TTL
+    now[0] += 50
+    assert store.advance(session_id, 1) is not None
+    now[0] += 61
+    assert store.advance(session_id, 1) is None
+    assert len(store) == 0
+
+
+def test_least_recently_used_sessions_are_evicted():
+    store = PlanSessionStore(max_sessions=2)
+    [first] = store.create_plan(_plan("a"))
+    [second] = store.create_plan(_plan("b"))
+    store.get(first)
+    [third] = store.create_plan(_plan("c"))
+
+    assert len(store) == 2
+    assert store.get(second) is None
+    assert store.get(first) is not None and store.get(third) is not None
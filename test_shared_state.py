@@ -0,0 +1,79 @@
+"""
+Multi-worker consistency test for the shared JSON stores.
+
+Spawns several independent processes (like gunicorn workers) that all write
+history entries and XP into the same files, then checks nothing was lost.
+Run with: python -m pytest test_shared_state.py
+"""
+import multiprocessing
+import os
+
+from backend.gamification import GamificationSystem
+from backend.history import TaskHistory
+from backend.analytics import SmartAnalytics
+
+WORKERS = 4
+WRITES_PER_WORKER = 25
+
+
+def _worker(workdir, worker_id):
+    os.chdir(workdir)
+    history = TaskHistory()
+    gamification = GamificationSystem()
+    for i in range(WRITES_PER_WORKER):
+        history.add_entry(
+            user_query=f"task {worker_id}-{i}",
+            generated_plan=[{"task": "Task", "all_steps": ["Step"]}],
+        )
+        gamification.add_xp(10)
+
+
+def test_workers_share_consistent_state(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    # Instances created before the workers run must see their writes afterwards
+    history = TaskHistory()
+    gamification = GamificationSystem()
+    analytics = SmartAnalytics(history)
+    assert history.get_all_history() == []
+    assert analytics.get_insights() == {"message": "Not enough data yet."}
+
+    ctx = multiprocessing.get_context("spawn")
+    processes = [ctx.Process(target=_worker, args=(str(tmp_path), w)) for w in range(WORKERS)]
+    for p in processes:
+        p.start()
+    for p in processes:
+        p.join(timeout=120)
+        assert p.exitcode == 0
+
+    total = WORKERS * WRITES_PER_WORKER
+    entries = history.get_all_history()
+    assert len(entries) == total
+    assert sorted(e["id"] for e in entries) == list(range(1, total + 1))
+    assert len({e["user_query"] for e in entries}) == total
+
+    stats = gamification.get_stats()
+    assert stats["xp"] == total * 10
+    assert stats["level"] == 1 + (total * 10) // 100
+
+    assert analytics.get_insights()["total_sessions"] == total
+
+
+def test_reads_skip_reload_when_unchanged(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    history = TaskHistory()
+    history.add_entry("clean room", [])
+
+    version = history.store.version
+    history.get_all_history()
+    assert history.store.version == version
+
+    # Another worker writes; the next read picks it up
+    TaskHistory().add_entry("study math", [])
+    assert [e["user_query"] for e in history.get_all_history()] == ["clean room", "study math"]
+    assert history.store.version > version
+
+
+if __name__ == "__main__":
+    import pytest
+    raise SystemExit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,95 @@
+"""
+Tests for precompressed, cache-busted static files (backend/static_assets.py).
+Run with: python -m pytest test_static_assets.py
+"""
+import re
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend import static_assets
+from backend.static_assets import IMMUTABLE, REVALIDATE, PrecompressedStaticFiles
+
+SCRIPT = "console.log('focus mode');\n" * 40
+
+
+@pytest.fixture
+def site(tmp_path):
+    (tmp_path / "js").mkdir()
+    (tmp_path / "js" / "app.js").write_text(SCRIPT)
+    (tmp_path / "tiny.css").write_text("body{}")
+    (tmp_path / "index.html").write_text(
+        '<link href="tiny.css"><script src="js/app.js"></script><a href="index.html">home</a>'
+    )
+    app = FastAPI()
+    app.mount("/", PrecompressedStaticFiles(directory=str(tmp_path), html=True), name="static")
+    return TestClient(app)
+
+
+def _get(client, path, **headers):
+    headers.setdefault("Accept-Encoding", "identity")
+    return client.get(path, headers=headers)
+
+
+def test_gzip_negotiation_and_vary(site):
+    plain = _get(site, "/js/app.js")
+    assert plain.text == SCRIPT
+    assert "content-encoding" not in plain.headers
+    assert plain.headers["vary"] == "Accept-Encoding"
+
+    zipped = site.get("/js/app.js", headers={"Accept-Encoding": "gzip"})
+    assert zipped.headers["content-encoding"] == "gzip"
+    assert zipped.headers["vary"] == "Accept-Encoding"
+    assert zipped.headers["etag"] == plain.headers["etag"][:-1] + '-gzip"'
+    assert zipped.text == SCRIPT
+
+    refused = _get(site, "/js/app.js", **{"Accept-Encoding": "gzip;q=0"})
+    assert "content-encoding" not in refused.headers
+
+
+@pytest.mark.skipif(static_assets.brotli is None, reason="brotli not installed")
+def test_brotli_preferred_when_available(site):
+    response = site.get("/js/app.js", headers={"Accept-Encoding": "gzip, br"})
+    assert response.headers["content-encoding"] == "br"
+
+
+def test_small_files_are_not_compressed(site):
+    response = site.get("/tiny.css", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+    assert "vary" not in response.headers
+
+
+def test_matching_etag_gets_304(site):
+    first = site.get("/js/app.js", headers={"Accept-Encoding": "gzip"})
+    etag = first.headers["etag"]
+
+    cached = site.get("/js/app.js", headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+    assert cached.headers["etag"] == etag
+
+    # The identity variant has a different ETag, so it is sent in full
+    other = _get(site, "/js/app.js", **{"If-None-Match": etag})
+    assert other.status_code == 200
+
+
+def test_versioned_urls_are_immutable(site):
+    page = _get(site, "/")
+    assert page.headers["cache-control"] == REVALIDATE
+    script_url = re.search(r'src="(js/app\.js\?v=[0-9a-f]+)"', page.text).group(1)
+    assert re.search(r'href="tiny\.css\?v=[0-9a-f]+"', page.text)
+    # Links to other pages are left alone
+    assert 'href="index.html"' in page.text
+
+    assert _get(site, "/" + script_url).headers["cache-control"] == IMMUTABLE
+    assert _get(site, "/js/app.js?v=stale").headers["cache-control"] == REVALIDATE
+    assert _get(site, "/js/app.js").headers["cache-control"] == REVALIDATE
+
+
+def test_changed_file_gets_a_new_version(site, tmp_path):
+    old = _get(site, "/").text
+    (tmp_path / "js" / "app.js").write_text(SCRIPT + "// v2, a different size\n")
+    new = _get(site, "/").text
+    assert old != new
+    assert _get(site, "/js/app.js").text.endswith("// v2, a different size\n")
@@ -0,0 +1,162 @@
+"""
+Corpus tests for the salvaging step parser.
+
+Each case is an LLM answer we have seen rejected by the old strict
+"{i}." check, together with the steps we expect to recover from it.
+Run with: python -m pytest test_step_parser.py
+"""
+import pytest
+
+from backend.output_validator import is_valid_output, parse_steps, MIN_QUALITY, MAX_STEPS
+
+# (raw output, expected steps, usable without a retry)
+CORPUS = [
+    (
+        "1. Pick up clothes from the floor.\n2. Put them in the hamper.\n3. Clear the desk.",
+        ["Pick up clothes from the floor.", "Put them in the hamper.", "Clear the desk."],
+        True,
+    ),
+    (
+        "Here are your micro-steps:\n\n1. Open your laptop.\n2. Open the email app.\n3. Read the newest email.",
+        ["Open your laptop.", "Open the email app.", "Read the newest email."],
+        True,
+    ),
+    (
+        "1) Get your textbook.\n2) Open to chapter 3.\n3) Read the headings only.",
+        ["Get your textbook.", "Open to chapter 3.", "Read the headings only."],
+        True,
+    ),
+    (
+        "Step 1: Fill a bucket with warm water.\nStep 2: Add soap.\nStep 3: Wipe the counter.",
+        ["Fill a bucket with warm water.", "Add soap.", "Wipe the counter."],
+        True,
+    ),
+    (
+        "- Put on your shoes\n- Grab your keys\n- Walk to the door",
+        ["Put on your shoes", "Grab your keys", "Walk to the door"],
+        True,
+    ),
+    (
+        "• Find the form online\n• Fill in your name\n• Click submit",
+        ["Find the form online", "Fill in your name", "Click submit"],
+        True,
+    ),
+    (
+        "**1.** Gather dirty dishes.\n**2.** Rinse each plate.\n**3.** Load the dishwasher.",
+        ["Gather dirty dishes.", "Rinse each plate.", "Load the dishwasher."],
+        True,
+    ),
+    (
+        "1. Open the document.\n2. Read the first paragraph.\n\nYou've got this! Take it one step at a time.",
+        ["Open the document.", "Read the first paragraph."],
+        True,
+    ),
+    (
+        # One long line that splits cleanly at "then"
+        "1. Open your notes.\n2. Pick the first topic from the syllabus list, then write three key words about it.",
+        ["Open your notes.", "Pick the first topic from the syllabus list", "Write three key words about it."],
+        True,
+    ),
+    (
+        # One long line that can't be saved is dropped, the rest kept
+        "1. Open the inbox.\n"
+        "2. Carefully review every single message you have received over the last two weeks for urgent items.\n"
+        "3. Reply to one email.",
+        ["Open the inbox.", "Reply to one email."],
+        True,
+    ),
+    (
+        # Too many steps: trimmed to the anti-overwhelm limit
+        "\n".join(f"{i}. Do part {i}." for i in range(1, 9)),
+        [f"Do part {i}." for i in range(1, 7)],
+        True,
+    ),
+    (
+        # Numbering restarts / skips still parse
+        "1. Fill the kettle.\n3. Boil the water.\n2. Pour into the mug.",
+        ["Fill the kettle.", "Boil the water.", "Pour into the mug."],
+        True,
+    ),
+    (
+        # No markers at all: plain short lines become steps, with low quality
+        "Put on gloves\nSpray the sink\nScrub for one minute",
+        ["Put on gloves", "Spray the sink", "Scrub for one minute"],
+        True,
+    ),
+    (
+        "I'm sorry, but I can't help with that request right now because it is unclear.",
+        [],
+        False,
+    ),
+    (
+        # Short refusals and chatter are not one-step plans
+        "I cannot help with that request.",
+        [],
+        False,
+    ),
+    (
+        "Sure! Let me know if you need anything else.",
+        [],
+        False,
+    ),
+    (
+        "Sure, here is a plan.\nHope this helps!\nGood luck with your task.",
+        [],
+        False,
+    ),
+    (
+        "What task would you like to break down?",
+        [],
+        False,
+    ),
+    (
+        # A single plain line may be a step, but not enough to skip a retry
+        "Put on gloves",
+        ["Put on gloves"],
+        False,
+    ),
+    (
+        # Splitting leaves an empty piece (a lone quote) that must be dropped
+        '1. Open the book and read page one and then " ; take notes on the main idea of the chapter',
+        ["Open the book and read page one", "Take notes on the main idea of the chapter"],
+        True,
+    ),
+    (
+        "",
+        [],
+        False,
+    ),
+]
+
+
+@pytest.mark.parametrize("raw, expected, usable", CORPUS)
+def test_corpus(raw, expected, usable):
+    steps, quality = parse_steps(raw)
+    assert steps == expected
+    assert (quality >= MIN_QUALITY) == usable
+    assert len(steps) <= MAX_STEPS
+    assert all(len(step.split()) <= 12 for step in steps)
+
+
+def test_perfect_output_scores_full_quality():
+    _, quality = parse_steps("1. Open the app.\n2. Tap new task.")
+    assert quality == 1.0
+
+
+def test_repairs_lower_quality():
+    _, clean = parse_steps("1. Open the app.\n2. Tap new task.")
+    _, with_preamble = parse_steps("Sure! Here you go:\n1. Open the app.\n2. Tap new task.")
+    _, bulleted = parse_steps("- Open the app.\n- Tap new task.")
+    assert clean > with_preamble
+    assert clean > bulleted
+
+
+
+def test_is_valid_output_follows_the_parser():
+    assert is_valid_output("- Open the app.\n- Tap new task.")
+    assert not is_valid_output("Sorry, I can't help with that.")
+    assert not is_valid_output("")
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
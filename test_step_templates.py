@@ -0,0 +1,77 @@
+"""
+Tests for the offline template tier (backend/step_templates.py) and plan routing.
+Run with: python -m pytest test_step_templates.py
+"""
+from types import SimpleNamespace
+
+from backend.metrics import PLAN_TIER_ANSWERS
+from backend.planner import PlanGenerator, FALLBACK_STEPS
+from backend.step_templates import StepTemplates, object_phrase
+
+NEUTRAL = {"mood": "neutral", "instruction": ""}
+
+
+class CountingClient:
+    def __init__(self):
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        self.calls += 1
+        content = "1. Open a blank page\n2. Write the first line\n3. Save it"
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+def test_object_phrase():
+    assert object_phrase("Clean my desk") == ("desk", "your desk")
+    assert object_phrase("study for the chemistry exam tomorrow") == ("chemistry exam", "the chemistry exam")
+    assert object_phrase("Reply to John's email") == ("email", "John's email")
+    assert object_phrase("laundry") == (None, None)
+
+
+def test_match_and_fill():
+    templates = StepTemplates()
+    assert templates.match("wash the dishes")["name"] == "clean_dishes"
+    # Specific templates win ties with the generic one of their category
+    assert templates.match("clean my desk")["name"] == "clean_desk"
+    assert templates.match("write a poem") is None
+
+    steps = templates.generate("Study for the chemistry exam")
+    assert "Put your notes and textbook for the chemistry exam on the desk." in steps
+    assert templates.generate("laundry")[0] == "Gather the laundry into one basket."
+
+    stressed = templates.generate("clean my desk", "stressed")
+    assert stressed[0].startswith("Set a 5-minute timer") and len(stressed) == 5
+
+
+def test_generic_words_alone_do_not_match():
+    templates = StepTemplates()
+    for task in ["book a meeting room", "organize a birthday party", "prepare dinner", "learn guitar",
+                 "fix the kitchen sink", "reply to mom", "rent a car", "buy new clothes", "tidy up"]:
+        assert templates.match(task) is None, task
+    # Hints still count next to another hit
+    assert templates.match("clean my room")["name"] == "clean_space"
+    assert templates.match("pay the rent")["name"] == "admin_bills"
+    assert templates.match("reply to the landlord's email")["name"] == "admin_email"
+
+
+def test_routing_keeps_common_tasks_off_the_llm():
+    client = CountingClient()
+    planner = PlanGenerator(client, templates=StepTemplates())
+    before = PLAN_TIER_ANSWERS.value(tier="template")
+
+    result = planner.plan("clean my desk and write a poem")
+    assert client.calls == 1  # only the poem
+    assert PLAN_TIER_ANSWERS.value(tier="template") - before == 1
+    assert planner.routes_to_template("clean my desk") and not planner.routes_to_template("write a poem")
+    assert {item["task"].lower() for item in result["plan"]} == {"clean my desk", "write a poem"}
+
+    llm_first = PlanGenerator(client, templates=StepTemplates(), tiers=("cache", "llm", "template"))
+    assert llm_first.generate_steps("clean my desk", NEUTRAL)[0] == "Open a blank page"
+    assert not llm_first.routes_to_template("clean my desk")
+
+
+def test_without_api_key_templates_then_fallback():
+    planner = PlanGenerator(None, templates=StepTemplates(), tiers=("cache", "llm"))
+    assert planner.generate_steps("pay rent", NEUTRAL)[0] == "Find the rent and the amount due."
+    assert planner.generate_steps("write a poem", NEUTRAL) == list(FALLBACK_STEPS)